@@ -8,6 +8,7 @@ Licensed under GNU General Public License v3.0
 """
 import multiprocessing as mp
 import os
+import queue
 import sys
 import time
 from importlib.util import find_spec
@@ -17,7 +18,8 @@ import cv2
 import numpy as np
 import pandas as pd
 
-from utils.generic import VideoManager, GenericManager
+from utils.generic import VideoManager, GenericManager, MissingFrameError
+from utils.simulated import SimulatedCameraManager
 
 from utils.configloader import (
     RESOLUTION,
@@ -36,16 +38,61 @@ from utils.configloader import (
     CROP_X,
     CROP_Y,
     USE_DLSTREAM_POSTURE_DETECTION,
+    SHARED_MEMORY,
+    INFERENCE_WORKERS,
+    BATCH_CAMERAS,
+    ADMISSION_POLICY,
+    QUEUE_DEPTH,
+    ADMIT_EVERY,
+    TRACING,
+    TRACE_EVENTS,
+    DYNAMIC_CROP,
+    DYNAMIC_CROP_PADDING,
+    PREDICT_SKELETONS,
+    PREDICTION_PROCESS_NOISE,
+    PREDICTION_MEASUREMENT_NOISE,
+    PREDICTION_HORIZON,
+    REPLAY_LATENCY,
 )
+from utils.cropping import DynamicCropper
+from utils.predictor import SkeletonPredictor
+from utils.dispatch import (
+    ADMISSION_POLICIES,
+    ReorderBuffer,
+    count_skipped,
+    pass_to_worker,
+)
+from utils.framebuffer import (
+    FrameRingBuffer,
+    shared_memory_available,
+    write_frame,
+    read_frame,
+    frame_pool,
+)
+from utils.worker import (
+    BEAT_INTERVAL,
+    HEARTBEAT_TIMEOUT,
+    Heartbeat,
+    run_worker,
+    stop_worker,
+)
+from utils.tracing import start_tracing, stop_tracing, trace_stage, trace_span
 from utils.plotter import plot_bodyparts, plot_metadata_frame
+from utils.poseframe import PoseFrame
+from utils.postprocessing import StageTimings
 from utils.poser import (
     load_deeplabcut,
     load_dpk,
     load_dlc_live,
     load_sleap,
+    load_onnx,
+    load_replay,
+    get_onnx_pose,
     get_pose,
-    calculate_skeletons,
-    find_local_peaks_new,
+    build_pipeline,
+    count_expected_skeletons,
+    find_local_peaks_array,
+    peaks_array_to_dict,
     get_ma_pose,
 )
 
@@ -71,8 +118,21 @@ def create_video_files(directory, devices, resolution, framerate, codec):
     return files
 
 
+# videos report the position of a frame in the video instead of the time it was taken
+CAPTURE_TIME_COLUMN = (
+    ("Video time", "", "") if STREAMING_SOURCE == "video" else ("Capture time", "", "")
+)
+
+
 def create_row(
-    index, animal_skeletons, experiment_status, experiment_trial, start_time=None
+    index,
+    animal_skeletons,
+    experiment_status,
+    experiment_trial,
+    start_time=None,
+    dropped_frames=None,
+    skipped_frames=None,
+    capture_time=None,
 ):
     """
     Create a pd.Series for each frame from each camera with joints position
@@ -81,18 +141,34 @@ def create_row(
     :param index: frame index
     :param animal_skeletons: skeletons for that frame
     :param start_time: (optional) starting time point for Time column
+    :param dropped_frames: (optional) number of frames that were not analysed since the previous row
+    :param skipped_frames: (optional) number of frames that were not admitted to analysis on purpose
+        since the previous row (every_k), they are not counted as dropped
+    :param capture_time: (optional) time the frame was taken (time.time()), written to the "Capture time" column
+        for cameras and to the "Video time" column for videos, where it is the position in the video
     """
-    row_dict = {}
     # creating joints columns
-    for num, animal in enumerate(animal_skeletons):
-        for joint, value in animal.items():
-            (
-                row_dict[("Animal{}".format(num + 1), joint, "x")],
-                row_dict[("Animal{}".format(num + 1), joint, "y")],
-            ) = value
+    if isinstance(animal_skeletons, PoseFrame):
+        row_dict = animal_skeletons.to_row()
+    else:
+        row_dict = {}
+        for num, animal in enumerate(animal_skeletons):
+            for joint, value in animal.items():
+                (
+                    row_dict[("Animal{}".format(num + 1), joint, "x")],
+                    row_dict[("Animal{}".format(num + 1), joint, "y")],
+                ) = value
     # optional time column
     if start_time is not None:
         row_dict[("Time", "", "")] = round(time.time() - start_time, 3)
+    # optional column with the gap in frame indices before this frame
+    if dropped_frames is not None:
+        row_dict[("Dropped", "", "")] = dropped_frames
+    if skipped_frames is not None:
+        row_dict[("Skipped", "", "")] = skipped_frames
+    # optional column with the time the frame was taken by the camera or its position in the video
+    if capture_time is not None:
+        row_dict[CAPTURE_TIME_COLUMN] = round(capture_time, 6)
     # experiment columns
     row_dict[("Experiment", "Status", "")] = experiment_status
     if experiment_trial is None and experiment_status:
@@ -146,11 +222,17 @@ class DeepLabStream:
         }  # dictionary for creating row of data for each frame
         self._data_output = {}  # dictionary for storing rows for dataframes
         self._stored_frames = {}  # dictionary for storing frames
+        self._current_frames = None  # color frames of the latest frameset, used for predicted skeletons
+        self._plot_frames = {}  # latest plotted frame of each camera, its buffer is reused for the next one
+        self._capture_times = {}  # time each camera took the latest frameset
         self._dlc_running = False  # has DeepLabCut started?
         self._experiment_running = False  # has experiment started?
         self._recording_running = False  # has recording started?
         self._video_files = None
         self._multiprocessing = None  # variable for multiprocessing tools
+        self._batch_worker = None  # process analysing all cameras together, if enabled
+        self._worker_status = {}  # whether the pose estimation of each camera responded at the last check
+        self._last_worker_check = 0.0
         self._experiment = self.set_up_experiment()
         self.frame_index = 0
         self._fps_counter = []
@@ -209,13 +291,17 @@ class DeepLabStream:
                 generic_manager = GenericManager()
                 return generic_manager
 
-        MANAGER_SOURCE = {"video": VideoManager, "camera": select_camera_manager}
+        MANAGER_SOURCE = {
+            "video": VideoManager,
+            "camera": select_camera_manager,
+            "simulation": SimulatedCameraManager,
+        }
 
         # loading WebCam manager, if installed
-        if find_spec("pyzmq") is not None:
+        if find_spec("zmq") is not None:
             from utils.webcam import WebCamManager
 
-            MANAGER_SOURCE["ipwebcam"] = WebCamManager()
+            MANAGER_SOURCE["ipwebcam"] = WebCamManager
 
         # initialize selected manager
         camera_manager = MANAGER_SOURCE.get(STREAMING_SOURCE)()
@@ -224,7 +310,7 @@ class DeepLabStream:
         else:
             raise ValueError(
                 f"Streaming source {STREAMING_SOURCE} is not a valid option. \n"
-                f'Please choose from "video", "camera" or "ipwebcam". Make sure that if you are using "ipwebcam" you installed the additional dependencies.'
+                f'Please choose from "video", "camera", "simulation" or "ipwebcam". Make sure that if you are using "ipwebcam" you installed the additional dependencies.'
             )
 
     @property
@@ -287,6 +373,13 @@ class DeepLabStream:
     def stop_cameras(self):
         print("Stopping all cameras")
         self._camera_manager.stop()
+        allocations = frame_pool.get_statistics()
+        if allocations["frames"]:
+            print(
+                "Frame buffers: {mean:.0f} bytes allocated per frame on average, {max} at most".format(
+                    **allocations
+                )
+            )
 
     #######################
     # video outputting part
@@ -316,131 +409,345 @@ class DeepLabStream:
         :param index: int frame number
         """
         for camera in frames:
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            # puts the frame index in the top-left corner
-            cv2.putText(frames[camera], str(index), (1, 15), font, 0.5, (0, 0, 255))
-            self._video_files[camera].write(frames[camera])
+            with trace_stage("record", camera=camera, frame=index):
+                font = cv2.FONT_HERSHEY_SIMPLEX
+                # puts the frame index in the top-left corner
+                cv2.putText(frames[camera], str(index), (1, 15), font, 0.5, (0, 0, 255))
+                self._video_files[camera].write(frames[camera])
 
     ######################
     # setting up DLC usage
     ######################
     @staticmethod
-    def get_pose_mp(input_q, output_q):
+    def create_pose_estimator(batch_size: int = 1):
         """
-        Process to be used for each camera/DLC stream of analysis
-        Designed to be run in an infinite loop
-        :param input_q: index and corresponding frame
-        :param output_q: index and corresponding analysis
+        Loading the pose estimation model selected by MODEL_ORIGIN
+        Has to be called inside the process that runs the analysis
+        :param batch_size: number of frames that are analysed together
+        :return: function that takes a list of frames and returns a list with the pose estimation of each frame
         """
 
         if MODEL_ORIGIN in ("DLC", "MADLC"):
             config, sess, inputs, outputs = load_deeplabcut()
-            while True:
-                if input_q.full():
-                    index, frame = input_q.get()
-                    start_time = time.time()
-                    if MODEL_ORIGIN == "DLC":
-                        scmap, locref, pose = get_pose(
-                            frame, config, sess, inputs, outputs
+
+            def analyse(frame):
+                if MODEL_ORIGIN == "DLC":
+                    scmap, locref, pose = get_pose(frame, config, sess, inputs, outputs)
+                    if USE_DLSTREAM_POSTURE_DETECTION:
+                        """ This is a legacy function that was used in earlier versions"""
+                        peaks = find_local_peaks_array(
+                            scmap, locref, ANIMALS_NUMBER, config["stride"]
                         )
-                        if USE_DLSTREAM_POSTURE_DETECTION:
-                            """ This is a legacy function that was used in earlier versions"""
-                            peaks = find_local_peaks_new(
-                                scmap, locref, ANIMALS_NUMBER, config
-                            )
-                        # Use the line below to use raw DLC output rather then DLStream optimization
-                        else:
-                            peaks = pose
-                    if MODEL_ORIGIN == "MADLC":
-                        peaks = get_ma_pose(frame, config, sess, inputs, outputs)
-                    analysis_time = time.time() - start_time
-                    output_q.put((index, peaks, analysis_time))
+                        return peaks_array_to_dict(peaks, config["all_joints_names"])
+                    # Use the line below to use raw DLC output rather then DLStream optimization
+                    return pose
+                return get_ma_pose(frame, config, sess, inputs, outputs)
 
         elif MODEL_ORIGIN == "DLC-LIVE":
             dlc_live = load_dlc_live()
-            while True:
-                if input_q.full():
-                    index, frame = input_q.get()
-                    start_time = time.time()
-                    if not dlc_live.is_initialized:
-                        peaks = dlc_live.init_inference(frame)
-                    else:
-                        peaks = dlc_live.get_pose(frame)
-                    analysis_time = time.time() - start_time
-                    output_q.put((index, peaks, analysis_time))
+
+            def analyse(frame):
+                if not dlc_live.is_initialized:
+                    return dlc_live.init_inference(frame)
+                return dlc_live.get_pose(frame)
+
+        elif MODEL_ORIGIN == "ONNX":
+            session, config = load_onnx()
+
+            def analyse(frame):
+                return get_onnx_pose(frame, session, config)
+
+        elif MODEL_ORIGIN == "REPLAY":
+            pose_source = load_replay(DeepLabStream.get_frame_shape())
+
+            def analyse(frame):
+                # the frame is not used, sleeping instead to simulate the inference time
+                time.sleep(REPLAY_LATENCY)
+                return pose_source.next_pose()
 
         elif MODEL_ORIGIN == "DEEPPOSEKIT":
             predict_model = load_dpk()
-            while True:
-                if input_q.full():
-                    index, frame = input_q.get()
-                    start_time = time.time()
-                    frame = frame[..., 1][..., None]
-                    st_frame = np.stack([frame])
-                    prediction = predict_model.predict(
-                        st_frame, batch_size=1, verbose=True
-                    )
-                    peaks = prediction[0, :, :2]
-                    analysis_time = time.time() - start_time
-                    output_q.put((index, peaks, analysis_time))
+
+            def analyse_batch(frames):
+                st_frame = np.stack([frame[..., 1][..., None] for frame in frames])
+                prediction = predict_model.predict(
+                    st_frame, batch_size=len(frames), verbose=True
+                )
+                return [prediction[num, :, :2] for num in range(len(frames))]
+
+            return analyse_batch
 
         elif MODEL_ORIGIN == "SLEAP":
-            sleap_model = load_sleap()
-            while True:
-                if input_q.full():
-                    index, frame = input_q.get()
-                    start_time = time.time()
-                    # Make sure image is (1, height, width, channels) and uint8
-                    # (height, width) -> (height, width, 1)
-                    frame = np.expand_dims(frame, axis=-1) if frame.ndim == 2 else frame
-                    # (height, width, channels) -> (1, height, width, channels)
-                    frame = np.expand_dims(frame, axis=0) if frame.ndim == 3 else frame
-                    # predict_on_batch is MUCH faster as it does not retrace the model graph for same size inputs
-                    pred = sleap_model.predict_on_batch(frame)
-                    try:
-                        peaks = pred["instance_peaks"][0]  # (n_poses, n_nodes, 2)
-                    except KeyError:
-                        # necessary for old sleap versions where single_instance models have different key naming
-                        peaks = pred["peaks"]
-
-                    analysis_time = time.time() - start_time
-                    output_q.put((index, peaks, analysis_time))
+            sleap_model = load_sleap(batch_size)
+
+            def analyse_batch(frames):
+                # Make sure images are (n_frames, height, width, channels) and uint8
+                st_frame = np.stack(frames)
+                # (n_frames, height, width) -> (n_frames, height, width, 1)
+                st_frame = np.expand_dims(st_frame, axis=-1) if st_frame.ndim == 3 else st_frame
+                # predict_on_batch is MUCH faster as it does not retrace the model graph for same size inputs
+                pred = sleap_model.predict_on_batch(st_frame)
+                try:
+                    # (n_frames, n_poses, n_nodes, 2)
+                    return [pred["instance_peaks"][num] for num in range(len(frames))]
+                except KeyError:
+                    # necessary for old sleap versions where single_instance models have different key naming
+                    return [pred["peaks"][num : num + 1] for num in range(len(frames))]
+
+            return analyse_batch
+
         else:
             raise ValueError(f"Model origin {MODEL_ORIGIN} not available.")
 
+        # models without batch support analyse the frames one after another
+        return lambda frames: [analyse(frame) for frame in frames]
+
+    @staticmethod
+    def get_pose_mp(input_q, output_q, frame_buffer=None, heartbeat=None):
+        """
+        Process to be used for each camera/DLC stream of analysis
+        Designed to be run in an event-driven loop until it receives the stop signal
+        Skeletons are assembled and post-processed in the process as well, only the compact PoseFrame is passed back
+        :param input_q: index, corresponding frame reference and (x, y) offset of the frame in the full frame
+        :param output_q: index and corresponding PoseFrame, analysis time, start time of the analysis
+            and execution times of the post-processing steps
+        :param frame_buffer: shared memory FrameRingBuffer the frame references point to, frames are passed directly if None
+        :param heartbeat: Heartbeat that is updated while the process is running
+        """
+        if heartbeat is not None:
+            # loading the model can take longer than the heartbeat timeout
+            heartbeat.start()
+        analyse_batch = DeepLabStream.create_pose_estimator()
+        # stateful stages (tracking, smoothing) need all frames of the camera in order, they run in the main process
+        postprocessing, _ = build_pipeline(ANIMALS_NUMBER).split()
+        # skeletons of the last frame analysed by this process, used to assemble multiple animals
+        previous_skeletons = None
+
+        def analyse_frame(item):
+            nonlocal previous_skeletons
+            index, frame_ref, offset = item
+            frame = read_frame(frame_buffer, frame_ref)
+            start_time = time.time()
+            peaks = analyse_batch([frame])[0]
+            analysis_time = time.time() - start_time
+            skeletons = postprocessing(peaks, offset, previous_skeletons)
+            previous_skeletons = skeletons
+            output_q.put(
+                (
+                    index,
+                    skeletons,
+                    analysis_time,
+                    start_time,
+                    postprocessing.last_durations,
+                )
+            )
+
+        run_worker(input_q, analyse_frame, heartbeat)
+        # results that are not collected anymore should not keep the process from exiting
+        output_q.cancel_join_thread()
+
+    @staticmethod
+    def get_pose_batch_mp(input_q, output_qs, frame_buffers, heartbeat=None):
+        """
+        Process to analyse the frames of all cameras together with a single model
+        Designed to be run in an event-driven loop until it receives the stop signal
+        :param input_q: list of camera name, index and corresponding frame reference for each camera
+        :param output_qs: dictionary with the output queue of each camera
+        :param frame_buffers: dictionary with the shared memory FrameRingBuffer (or None) of each camera
+        :param heartbeat: Heartbeat that is updated while the process is running
+        """
+        if heartbeat is not None:
+            heartbeat.start()
+        analyse_batch = DeepLabStream.create_pose_estimator(batch_size=len(output_qs))
+        postprocessing = {
+            camera: build_pipeline(ANIMALS_NUMBER).split()[0] for camera in output_qs
+        }
+        previous_skeletons = dict.fromkeys(output_qs)
+
+        def analyse_frameset(frameset):
+            frames = [
+                read_frame(frame_buffers[camera], frame_ref)
+                for camera, index, frame_ref in frameset
+            ]
+            start_time = time.time()
+            batch_peaks = analyse_batch(frames)
+            analysis_time = time.time() - start_time
+            # scattering the results back to the cameras
+            for (camera, index, frame_ref), peaks in zip(frameset, batch_peaks):
+                skeletons = postprocessing[camera](
+                    peaks, previous_skeletons=previous_skeletons[camera]
+                )
+                previous_skeletons[camera] = skeletons
+                output_qs[camera].put(
+                    (
+                        index,
+                        skeletons,
+                        analysis_time,
+                        start_time,
+                        postprocessing[camera].last_durations,
+                    )
+                )
+
+        run_worker(input_q, analyse_frameset, heartbeat)
+        for output_q in output_qs.values():
+            output_q.cancel_join_thread()
+
+    @staticmethod
+    def get_frame_shape() -> tuple:
+        """
+        Shape of the color frames that are passed to analysis
+        """
+        if CROP:
+            return CROP_Y[1] - CROP_Y[0], CROP_X[1] - CROP_X[0], 3
+        width, height = RESOLUTION
+        return height, width, 3
+
     @staticmethod
-    def create_mp_tools(devices):
+    def get_queue_depth() -> int:
+        """
+        Number of frames that can wait in the input queue of a pose estimation process
+        """
+        if ADMISSION_POLICY == "queue":
+            return max(QUEUE_DEPTH, 1)
+        return 1
+
+    @staticmethod
+    def create_frame_buffer():
+        """
+        Creating shared frame buffer for one pose estimation process
+        Besides the queued frames and the one that is analysed, one slot is written while the main loop
+        waits for room in the queue, so no slot in use is ever overwritten
+        :return: FrameRingBuffer or None if frames are passed through the queues
+        """
+        if SHARED_MEMORY and shared_memory_available():
+            return FrameRingBuffer(
+                DeepLabStream.get_frame_shape(),
+                slots=DeepLabStream.get_queue_depth() + 2,
+            )
+        return None
+
+    @staticmethod
+    def create_mp_tools(devices, workers_per_device: int = INFERENCE_WORKERS):
         """
         Creating easy to use dictionaries for our multiprocessing needs
-        :param devices: list of cameras for each we should create a separate process
-        :return: dictionary with process and queues for each device
+        :param devices: list of cameras for each we should create separate processes
+        :param workers_per_device: number of pose estimation processes for each camera
+        :return: dictionary with worker processes, output queue, reorder buffer and frame counters for each device
+            each worker has its own input queue, shared frame buffer and heartbeat
         """
+        queue_depth = DeepLabStream.get_queue_depth()
         device_mps = {}
         for device in devices:
-            # creating queues
-            device_mps[device] = {"input": mp.Queue(1), "output": mp.Queue(1)}
-
-            # creating process
-            process = mp.Process(
-                target=DeepLabStream.get_pose_mp,
-                args=(device_mps[device]["input"], device_mps[device]["output"]),
-                name=device,
-            )
-            device_mps[device]["process"] = process
+            # all workers of one camera share the output queue, results are put back in order by the reorder buffer
+            device_mps[device] = {
+                "workers": [],
+                "output": mp.Queue(),
+                "reorder": ReorderBuffer(
+                    max_pending=2 * max(workers_per_device, 1) * (queue_depth + 1)
+                ),
+                "next_worker": 0,
+                # frames skipped on purpose (every_k) are counted apart from frames dropped because of back-pressure
+                "stats": dict(submitted=0, skipped=0, dropped=0, analysed=0),
+                "last_analysed": None,
+                # stateful part of the post-processing, the rest runs in the pose estimation processes
+                "postprocessing": build_pipeline(ANIMALS_NUMBER).split()[1],
+                "timings": StageTimings(),
+                "cropper": DynamicCropper(
+                    DeepLabStream.get_frame_shape(),
+                    DYNAMIC_CROP_PADDING,
+                    skeletons=count_expected_skeletons(),
+                )
+                if DYNAMIC_CROP and not BATCH_CAMERAS
+                else None,
+                "predictor": SkeletonPredictor(
+                    PREDICTION_PROCESS_NOISE,
+                    PREDICTION_MEASUREMENT_NOISE,
+                    PREDICTION_HORIZON,
+                )
+                if PREDICT_SKELETONS
+                else None,
+            }
+            for worker_num in range(workers_per_device):
+                frame_buffer = DeepLabStream.create_frame_buffer()
+                worker = {
+                    "input": mp.Queue(queue_depth),
+                    "frames": frame_buffer,
+                    "heartbeat": Heartbeat(),
+                }
+                # creating process
+                worker["process"] = mp.Process(
+                    target=DeepLabStream.get_pose_mp,
+                    args=(
+                        worker["input"],
+                        device_mps[device]["output"],
+                        frame_buffer,
+                        worker["heartbeat"],
+                    ),
+                    name="{}_{}".format(device, worker_num),
+                )
+                device_mps[device]["workers"].append(worker)
         return device_mps
 
+    @staticmethod
+    def create_batch_worker(device_mps: dict) -> dict:
+        """
+        Creating a single pose estimation process that analyses the frames of all cameras as one batch
+        :param device_mps: multiprocessing tools created by create_mp_tools, the results are put into their output queues
+        :return: worker dictionary with input queue, shared frame buffer for each camera, heartbeat and process
+        """
+        worker = {
+            "input": mp.Queue(DeepLabStream.get_queue_depth()),
+            "frames": {
+                device: DeepLabStream.create_frame_buffer() for device in device_mps
+            },
+            "heartbeat": Heartbeat(),
+        }
+        worker["process"] = mp.Process(
+            target=DeepLabStream.get_pose_batch_mp,
+            args=(
+                worker["input"],
+                {device: device_mps[device]["output"] for device in device_mps},
+                worker["frames"],
+                worker["heartbeat"],
+            ),
+            name="batch",
+        )
+        return worker
+
     def set_up_multiprocessing(self):
         """
         Creating multiprocessing tools
         """
-        self._multiprocessing = self.create_mp_tools(self.enabled_cameras)
+        if ADMISSION_POLICY not in ADMISSION_POLICIES:
+            raise ValueError(
+                f"Admission policy {ADMISSION_POLICY} not available, use one of {ADMISSION_POLICIES}."
+            )
+        # the post-processing is built in the pose estimation processes, configuration errors are raised here instead
+        build_pipeline(ANIMALS_NUMBER)
+        if DYNAMIC_CROP and BATCH_CAMERAS:
+            # crops of different cameras have different sizes and cannot be stacked into one batch
+            print("Dynamic cropping is not available with BATCH_CAMERAS. Analysing full frames.")
+        if BATCH_CAMERAS:
+            # one process for all cameras, so no processes are created per camera
+            self._multiprocessing = self.create_mp_tools(
+                self.enabled_cameras, workers_per_device=0
+            )
+            self._batch_worker = self.create_batch_worker(self._multiprocessing)
+        else:
+            self._multiprocessing = self.create_mp_tools(self.enabled_cameras)
 
     def start_dlc(self):
         """
-        Starting DLC in stand-alone process for each available camera
+        Starting DLC in stand-alone processes for each available camera
         """
         for camera in self.enabled_cameras:
-            self._multiprocessing[camera]["process"].start()
+            for worker in self._multiprocessing[camera]["workers"]:
+                worker["process"].start()
+        if self._batch_worker is not None:
+            self._batch_worker["process"].start()
+        if TRACING:
+            start_tracing(TRACE_EVENTS)
+        self._worker_status = {}
         self._dlc_running = True
 
     #####################
@@ -449,19 +756,40 @@ class DeepLabStream:
     def get_frames(self) -> tuple:
         """
         Get new frameset from each camera and make color frames and infrared frames useful
+        The frames of the previous frameset are given back to the frame pool,
+        frames that are still analysed are kept by store_frames()
         :return: color_frames, depth_maps, infrared_frames
         """
-        c_frames, d_maps, i_frames = self._camera_manager.get_frames()
+        if self._current_frames is not None:
+            for frame in self._current_frames.values():
+                frame_pool.release(frame)
+            self._current_frames = None
+        with trace_stage("capture", frame=self.frame_index):
+            c_frames, d_maps, i_frames = self._camera_manager.get_frames()
+        # managers without source timestamps are timed on arrival
+        receive_time = time.time()
+        capture_times = (
+            self._camera_manager.get_timestamps()
+            if hasattr(self._camera_manager, "get_timestamps")
+            else {}
+        )
+        self._capture_times = {
+            camera: capture_times.get(camera, receive_time) for camera in c_frames
+        }
         for camera in c_frames:
             c_frames[camera] = np.asanyarray(c_frames[camera])
             if CROP:
+                # view on the frame, the frame pool releases the whole frame with it
                 c_frames[camera] = c_frames[camera][
                     CROP_Y[0] : CROP_Y[1], CROP_X[0] : CROP_X[1]
-                ].copy()
+                ]
 
         for camera in i_frames:
             i_frames[camera] = np.asanyarray(i_frames[camera])
+        # bytes allocated in the frame path since the last frame
+        frame_pool.end_frame()
 
+        self._current_frames = c_frames
         return c_frames, d_maps, i_frames
 
     def input_frames_for_analysis(self, frames: tuple, index: int):
@@ -472,18 +800,182 @@ class DeepLabStream:
         """
         if self._dlc_running:
             c_frames, d_maps, i_frames = frames
-            for camera in self._multiprocessing:
-                if self._multiprocessing[camera]["input"].empty():
-                    # passes color frame to analysis
-                    frame = c_frames[camera]
-                    frame_time = time.time()
-                    self._multiprocessing[camera]["input"].put((index, frame))
-                    if d_maps:
-                        self.store_frames(
-                            camera, frame, d_maps[camera], frame_time, index
-                        )
+            frame_time = time.time()
+            if ADMISSION_POLICY == "every_k" and index % ADMIT_EVERY:
+                for camera in self._multiprocessing:
+                    self._multiprocessing[camera]["stats"]["skipped"] += 1
+                return
+            with trace_stage("enqueue", frame=index):
+                if self._batch_worker is not None:
+                    # the frames of all cameras are passed together
+                    if self.submit_frameset(c_frames, index):
+                        analysed_cameras = list(self._multiprocessing)
                     else:
-                        self.store_frames(camera, frame, None, frame_time, index)
+                        analysed_cameras = []
+                else:
+                    analysed_cameras = [
+                        camera
+                        for camera in self._multiprocessing
+                        if self.submit_frame(camera, c_frames[camera], index)
+                    ]
+
+            for camera in self._multiprocessing:
+                if camera not in analysed_cameras:
+                    self._multiprocessing[camera]["stats"]["dropped"] += 1
+                    continue
+                self._multiprocessing[camera]["stats"]["submitted"] += 1
+                self._multiprocessing[camera]["reorder"].expect(index)
+                if d_maps:
+                    self.store_frames(
+                        camera,
+                        c_frames[camera],
+                        d_maps[camera],
+                        frame_time,
+                        index,
+                        self._capture_times.get(camera),
+                    )
+                else:
+                    self.store_frames(
+                        camera,
+                        c_frames[camera],
+                        None,
+                        frame_time,
+                        index,
+                        self._capture_times.get(camera),
+                    )
+
+    def submit_frame(self, camera: str, frame, index: int) -> bool:
+        """
+        Passing a frame to one of the pose estimation processes of a camera according to ADMISSION_POLICY
+        :param camera: camera name
+        :param frame: color frame
+        :param index: index of the frameset
+        :return: True if the frame was passed to analysis, False if it was dropped
+        """
+        worker = self.get_idle_worker(camera)
+        if worker is None:
+            # all processes are busy, the policy decides what happens with the next one in line
+            worker = self.get_next_worker(camera)
+        cropper = self._multiprocessing[camera]["cropper"]
+        if cropper is not None:
+            # only the region around the animals is analysed
+            frame, offset = cropper.crop(frame)
+        else:
+            offset = (0, 0)
+
+        def make_item(replaced):
+            replaced_ref = replaced[1] if replaced is not None else None
+            return index, write_frame(worker["frames"], frame, replaced_ref), offset
+
+        passed, replaced = pass_to_worker(
+            worker,
+            make_item,
+            wait=ADMISSION_POLICY in ("queue", "every_k"),
+            replace=ADMISSION_POLICY == "latest",
+        )
+        if replaced is not None:
+            self.drop_frame(camera, replaced[0])
+        return passed
+
+    def submit_frameset(self, c_frames: dict, index: int) -> bool:
+        """
+        Passing the frames of all cameras to the batch process according to ADMISSION_POLICY
+        :param c_frames: color frames of each camera
+        :param index: index of the frameset
+        :return: True if the frameset was passed to analysis, False if it was dropped
+        """
+        worker = self._batch_worker
+
+        def make_item(replaced):
+            replaced_refs = (
+                {camera: frame_ref for camera, _, frame_ref in replaced}
+                if replaced is not None
+                else {}
+            )
+            return [
+                (
+                    camera,
+                    index,
+                    write_frame(
+                        worker["frames"][camera],
+                        c_frames[camera],
+                        replaced_refs.get(camera),
+                    ),
+                )
+                for camera in self._multiprocessing
+            ]
+
+        passed, replaced = pass_to_worker(
+            worker,
+            make_item,
+            wait=ADMISSION_POLICY in ("queue", "every_k"),
+            replace=ADMISSION_POLICY == "latest",
+        )
+        if replaced is not None:
+            for camera, replaced_index, _ in replaced:
+                self.drop_frame(camera, replaced_index)
+        return passed
+
+    def drop_frame(self, camera: str, index: int):
+        """
+        Forgetting a frame that was passed to analysis but replaced before it was analysed
+        :param camera: camera name
+        :param index: index of the replaced frame
+        """
+        self._multiprocessing[camera]["stats"]["dropped"] += 1
+        self._multiprocessing[camera]["reorder"].discard(index)
+        stored_frames = self._stored_frames.get(camera, {}).pop(index, None)
+        if stored_frames is not None:
+            frame_pool.release(stored_frames[0])
+
+    def get_idle_worker(self, camera: str):
+        """
+        Round-robin selection of the next pose estimation process of a camera that can take a new frame
+        :param camera: camera name
+        :return: worker dictionary or None if all workers are busy
+        """
+        workers = self._multiprocessing[camera]["workers"]
+        start = self._multiprocessing[camera]["next_worker"]
+        for offset in range(len(workers)):
+            worker_num = (start + offset) % len(workers)
+            if not workers[worker_num]["input"].full():
+                self._multiprocessing[camera]["next_worker"] = (worker_num + 1) % len(
+                    workers
+                )
+                return workers[worker_num]
+        return None
+
+    def get_next_worker(self, camera: str) -> dict:
+        """
+        Round-robin selection of the next pose estimation process of a camera, whether it is busy or not
+        :param camera: camera name
+        :return: worker dictionary
+        """
+        workers = self._multiprocessing[camera]["workers"]
+        worker_num = self._multiprocessing[camera]["next_worker"]
+        self._multiprocessing[camera]["next_worker"] = (worker_num + 1) % len(workers)
+        return workers[worker_num]
+
+    def collect_analysed_frames(self, camera: str) -> list:
+        """
+        Taking all finished analyses of a camera from its output queue
+        Frames whose results are considered lost are dropped
+        :param camera: camera name
+        :return: list of (index, (skeletons, analysis_time, analysis_start, durations)) in frame index order
+        """
+        reorder = self._multiprocessing[camera]["reorder"]
+        while True:
+            try:
+                analysed_index, *result = self._multiprocessing[camera][
+                    "output"
+                ].get_nowait()
+            except queue.Empty:
+                break
+            reorder.add(analysed_index, tuple(result))
+        ready, skipped = reorder.pop_ready()
+        for skipped_index in skipped:
+            self.drop_frame(camera, skipped_index)
+        return ready
 
     def get_analysed_frames(self) -> tuple:
         """
@@ -494,6 +986,7 @@ class DeepLabStream:
         Gathering data to a series
         """
         if self._dlc_running:
+            self.check_workers()
             analysed_frames = {}
             analysis_time = None
 
@@ -504,51 +997,114 @@ class DeepLabStream:
                 frame_width, frame_height = RESOLUTION
 
             for camera in self._multiprocessing:
-                if self._multiprocessing[camera]["output"].full():
+                # Getting the analysed data
+                for analysed_index, (
+                    skeletons,
+                    analysis_time,
+                    analysis_start,
+                    durations,
+                ) in self.collect_analysed_frames(camera):
+                    stored_frames = self.get_stored_frames(camera, analysed_index)
+                    if stored_frames is None:
+                        # the frame was dropped while it was analysed
+                        continue
+                    analysed_frame, depth_map, input_time, capture_time = stored_frames
                     if self._start_time is None:
                         self._start_time = time.time()  # getting the first frame here
-
-                    # Getting the analysed data
-                    analysed_index, peaks, analysis_time = self._multiprocessing[
-                        camera
-                    ]["output"].get()
-                    skeletons = calculate_skeletons(peaks, ANIMALS_NUMBER)
+                    self._multiprocessing[camera]["stats"]["analysed"] += 1
+                    last_analysed = self._multiprocessing[camera]["last_analysed"]
+                    dropped_frames = (
+                        analysed_index - last_analysed - 1
+                        if last_analysed is not None
+                        else 0
+                    )
+                    skipped_frames = None
+                    if ADMISSION_POLICY == "every_k":
+                        skipped_frames = (
+                            count_skipped(last_analysed, analysed_index, ADMIT_EVERY)
+                            if last_analysed is not None
+                            else 0
+                        )
+                        dropped_frames -= skipped_frames
+                    self._multiprocessing[camera]["last_analysed"] = analysed_index
+                    # the time the frame was taken is used by stateful stages and triggers
+                    skeletons.timestamp = capture_time
+
+                    # skeletons were assembled in the pose estimation process
+                    self._multiprocessing[camera]["timings"].update(durations)
+                    with trace_stage(
+                        "post-processing", camera=camera, frame=analysed_index
+                    ):
+                        postprocessing = self._multiprocessing[camera]["postprocessing"]
+                        if postprocessing is not None:
+                            skeletons = postprocessing.process(skeletons)
+                            self._multiprocessing[camera]["timings"].update(
+                                postprocessing.last_durations
+                            )
+                        cropper = self._multiprocessing[camera]["cropper"]
+                        if cropper is not None:
+                            cropper.update(skeletons)
+                    predictor = self._multiprocessing[camera]["predictor"]
+                    if predictor is not None:
+                        predictor.correct(skeletons, analysed_index)
                     print(
                         "", end="\r", flush=True
                     )  # this is the line you should not remove
-                    analysed_frame, depth_map, input_time = self.get_stored_frames(
-                        camera, analysed_index
+                    span_id = "{}:{}".format(camera, analysed_index)
+                    if capture_time is not None and STREAMING_SOURCE != "video":
+                        trace_span(
+                            "capture",
+                            span_id,
+                            capture_time,
+                            input_time,
+                            camera=camera,
+                            frame=analysed_index,
+                        )
+                    trace_span(
+                        "queued",
+                        span_id,
+                        input_time,
+                        analysis_start,
+                        camera=camera,
+                        frame=analysed_index,
+                    )
+                    trace_span(
+                        "inference",
+                        span_id,
+                        analysis_start,
+                        analysis_start + analysis_time,
+                        camera=camera,
+                        frame=analysed_index,
+                    )
+                    trace_span(
+                        "skeleton assembly",
+                        span_id,
+                        analysis_start + analysis_time,
+                        analysis_start + analysis_time + sum(durations.values()),
+                        camera=camera,
+                        frame=analysed_index,
                     )
-                    delay_time = time.time() - input_time
                     # Calculating FPS and plotting the data on frame
                     self.calculate_fps(analysis_time if analysis_time != 0 else 0.01)
                     frame_time = time.time() - self._start_time
-                    analysed_image = plot_metadata_frame(
-                        plot_bodyparts(analysed_frame, skeletons),
-                        frame_width,
-                        frame_height,
-                        self._fps,
-                        frame_time,
-                    )
+                    with trace_stage("plot", camera=camera, frame=analysed_index):
+                        analysed_image = plot_metadata_frame(
+                            plot_bodyparts(
+                                analysed_frame,
+                                skeletons,
+                                out=self.acquire_plot_frame(camera, analysed_frame),
+                            ),
+                            frame_width,
+                            frame_height,
+                            self._fps,
+                            frame_time,
+                            copy=False,
+                        )
+                    # the frame is copied into the plotted frame, so it is not needed anymore
+                    frame_pool.release(analysed_frame)
 
                     # Experiments
-                    if (
-                        self._experiment.experiment_finished
-                        and self._experiment_running
-                    ):
-                        self._experiment_running = False
-
-                    if (
-                        self._experiment_running
-                        and not self._experiment.experiment_finished
-                    ):
-                        if ANIMALS_NUMBER > 1 and not FLATTEN_MA and not PASS_SEPARATE:
-                            self._experiment.check_skeleton(analysed_image, skeletons)
-                        else:
-                            for skeleton in skeletons:
-                                self._experiment.check_skeleton(
-                                    analysed_image, skeleton
-                                )
+                    self.check_experiment(camera, analysed_image, skeletons, analysed_index)
 
                     # Gathering data as pd.Series for output
                     if self._data_output:
@@ -559,12 +1115,110 @@ class DeepLabStream:
                             self._experiment_running,
                             self._experiment.get_trial(),
                             self._start_time,
+                            dropped_frames,
+                            skipped_frames,
+                            capture_time,
                         )
 
+                    # time from passing the frame to analysis until its results were used
+                    trace_span(
+                        "latency",
+                        span_id,
+                        input_time,
+                        time.time(),
+                        camera=camera,
+                        frame=analysed_index,
+                    )
                     analysed_frames[camera] = analysed_image
+
+                if (
+                    camera not in analysed_frames
+                    and self._multiprocessing[camera]["predictor"] is not None
+                ):
+                    # no pose estimation arrived for this frame, using the predicted skeletons instead
+                    predicted_image = self.predict_current_frame(
+                        camera, frame_width, frame_height
+                    )
+                    if predicted_image is not None:
+                        analysed_frames[camera] = predicted_image
             return analysed_frames, analysis_time
 
-    def store_frames(self, camera: str, c_frame, d_map, frame_time: float, index: int):
+    def check_experiment(self, camera: str, image, skeletons: list, index: int):
+        """
+        Passing the skeletons of a frame to the running experiment
+        :param camera: camera name
+        :param image: frame with plotted skeletons
+        :param skeletons: list of skeletons
+        :param index: frame index
+        """
+        if self._experiment.experiment_finished and self._experiment_running:
+            self._experiment_running = False
+
+        if self._experiment_running and not self._experiment.experiment_finished:
+            if ANIMALS_NUMBER > 1 and not FLATTEN_MA and not PASS_SEPARATE:
+                with trace_stage("check_skeleton", camera=camera, frame=index):
+                    self._experiment.check_skeleton(image, skeletons)
+            else:
+                for skeleton in skeletons:
+                    with trace_stage("check_skeleton", camera=camera, frame=index):
+                        self._experiment.check_skeleton(image, skeleton)
+
+    def predict_current_frame(self, camera: str, frame_width: int, frame_height: int):
+        """
+        Predicting the skeletons of the latest frame from earlier pose estimations
+        The predicted skeletons are passed to the experiment, but not written to the data output
+        :param camera: camera name
+        :param frame_width: width of the plotted frame
+        :param frame_height: height of the plotted frame
+        :return: latest frame with predicted skeletons or None if there is no prediction
+        """
+        if self._start_time is None or self._current_frames is None:
+            return None
+        with trace_stage("prediction", camera=camera, frame=self.frame_index):
+            skeletons = self._multiprocessing[camera]["predictor"].predict(
+                self.frame_index
+            )
+        if not skeletons:
+            return None
+        skeletons.timestamp = self._capture_times.get(camera)
+        current_frame = self._current_frames[camera]
+        predicted_image = plot_metadata_frame(
+            plot_bodyparts(
+                current_frame,
+                skeletons,
+                out=self.acquire_plot_frame(camera, current_frame),
+            ),
+            frame_width,
+            frame_height,
+            self._fps,
+            time.time() - self._start_time,
+            copy=False,
+        )
+        self.check_experiment(camera, predicted_image, skeletons, self.frame_index)
+        return predicted_image
+
+    def acquire_plot_frame(self, camera: str, frame):
+        """
+        Buffer from the frame pool to plot on, the previously plotted frame of the camera is released
+        as it was already shown, recorded and passed to the experiment
+        :param camera: camera name
+        :param frame: frame that is plotted on
+        """
+        frame_pool.release(self._plot_frames.get(camera))
+        self._plot_frames[camera] = frame_pool.acquire(
+            (camera, "plot"), frame.shape, frame.dtype
+        )
+        return self._plot_frames[camera]
+
+    def store_frames(
+        self,
+        camera: str,
+        c_frame,
+        d_map,
+        frame_time: float,
+        index: int,
+        capture_time: float = None,
+    ):
         """
         Store frames currently sent for analysis in index based dictionary
         :param camera: camera name
@@ -572,23 +1226,27 @@ class DeepLabStream:
         :param d_map: depth map
         :param frame_time: inputting time of frameset
         :param index: index of frame that is currently analysed
+        :param capture_time: (optional) time the frame was taken by the camera
         """
+        # the frame stays in use until it was analysed or dropped
+        frame_pool.retain(c_frame)
         if camera in self._stored_frames.keys():
-            self._stored_frames[camera][index] = c_frame, d_map, frame_time
+            self._stored_frames[camera][index] = c_frame, d_map, frame_time, capture_time
 
         else:
             self._stored_frames[camera] = {}
-            self._stored_frames[camera][index] = c_frame, d_map, frame_time
+            self._stored_frames[camera][index] = c_frame, d_map, frame_time, capture_time
 
     def get_stored_frames(self, camera: str, index: int):
         """
         Retrieve frames currently sent for analysis, retrieved frames will be removed (popped) from the dictionary
+        The color frame has to be released to the frame pool once it is not needed anymore
         :param camera: camera name
         :param index: index of analysed frame
-        :return:
+        :return: tuple of color frame, depth map, input time and capture time
+            or None if the frame is not stored (anymore)
         """
-        c_frame, d_map, frame_time = self._stored_frames[camera].pop(index, None)
-        return c_frame, d_map, frame_time
+        return self._stored_frames.get(camera, {}).pop(index, None)
 
     def convert_depth_map_to_image(self, d_map):
         """
@@ -641,15 +1299,58 @@ class DeepLabStream:
     def stop_dlc(self):
         # cleaning up the dlc processes
         if self._dlc_running:
+            for camera, stats in self.get_frame_statistics().items():
+                print(
+                    "Frames of device {}: {submitted} submitted, {skipped} skipped, {dropped} dropped, "
+                    "{analysed} analysed".format(
+                        camera, **stats
+                    )
+                )
+            for camera, timings in self.get_postprocessing_timings().items():
+                if not timings:
+                    continue
+                print(
+                    "Post-processing of device {}: {}".format(
+                        camera,
+                        ", ".join(
+                            "{} {:.2f} ms".format(step, mean)
+                            for step, mean in timings.items()
+                        ),
+                    )
+                )
+            if self._batch_worker is not None:
+                stop_worker(
+                    self._batch_worker["process"], [self._batch_worker["input"]]
+                )
+                self._batch_worker["input"].close()
+                for frame_buffer in self._batch_worker["frames"].values():
+                    if frame_buffer is not None:
+                        frame_buffer.release()
+                self._batch_worker = None
             for camera in self._multiprocessing:
-                # finishing the process
-                self._multiprocessing[camera]["process"].terminate()
-                # closing all the Queues
-                self._multiprocessing[camera]["input"].close()
+                for worker in self._multiprocessing[camera]["workers"]:
+                    # finishing the process
+                    stop_worker(worker["process"], [worker["input"]])
+                    # closing all the Queues
+                    worker["input"].close()
+                    # freeing the shared frame buffer
+                    if worker["frames"] is not None:
+                        worker["frames"].release()
                 self._multiprocessing[camera]["output"].close()
             self._dlc_running = False
             self._multiprocessing = None
             self._start_time = None
+            # frames that were still in analysis
+            for stored_frames in self._stored_frames.values():
+                for c_frame, *_ in stored_frames.values():
+                    frame_pool.release(c_frame)
+            self._stored_frames = {}
+            if TRACING:
+                trace_file = (
+                    OUT_DIR + "/Trace" + "-" + time.strftime("%d%m%Y-%H%M%S") + ".json"
+                )
+                stop_tracing(trace_file)
+                print("Trace saved to {}".format(trace_file))
             # writing database
             if self._data_output:
                 self.create_dataframes()
@@ -661,10 +1362,28 @@ class DeepLabStream:
             self._experiment_running = False
             self._experiment = self.set_up_experiment()
 
+    def wait_for_analysis(self, timeout: float = 10.0):
+        """
+        Take the results of all frames that are still in analysis, so no frame is lost when the stream ends
+        e.g. at the end of a video in offline mode
+        :param timeout: maximum time in seconds to wait for the pose estimation processes
+        """
+        if not self._dlc_running:
+            return
+        end_time = time.time() + timeout
+        while time.time() < end_time and any(
+            len(mp_tools["reorder"]) for mp_tools in self._multiprocessing.values()
+        ):
+            self.get_analysed_frames()
+            time.sleep(0.001)
+
     def finish_streaming(self):
         """
         Clean up after ourselves
         """
+        if ADMISSION_POLICY == "queue":
+            # every admitted frame has to be analysed
+            self.wait_for_analysis()
         self.stop_experiment()
         self.stop_dlc()
         self.stop_recording()
@@ -688,6 +1407,9 @@ class DeepLabStream:
         experiment_status,
         experiment_trial,
         start_time=None,
+        dropped_frames=None,
+        skipped_frames=None,
+        capture_time=None,
     ):
         """
         Create a pd.Series for each frame from each camera with joints position and store it
@@ -697,9 +1419,19 @@ class DeepLabStream:
         :param index: frame index
         :param animal_skeletons: skeletons for that frame
         :param start_time: (optional) starting time point for Time column
+        :param dropped_frames: (optional) number of frames that were not analysed since the previous row
+        :param skipped_frames: (optional) number of frames that were not admitted to analysis on purpose
+        :param capture_time: (optional) time the frame was taken, position in the video for videos
         """
         row = create_row(
-            index, animal_skeletons, experiment_status, experiment_trial, start_time
+            index,
+            animal_skeletons,
+            experiment_status,
+            experiment_trial,
+            start_time,
+            dropped_frames,
+            skipped_frames,
+            capture_time,
         )
         self._data_output[camera].append(row)
 
@@ -741,6 +1473,82 @@ class DeepLabStream:
     def get_multiprocessing_tools(self):
         return self._multiprocessing
 
+    def get_frame_statistics(self) -> dict:
+        """
+        Counters of the frames each camera submitted to, skipped by the admission policy,
+        dropped from and received back from analysis
+        :return: dictionary with camera name and its counters
+        """
+        if self._multiprocessing is None:
+            return {}
+        return {
+            camera: dict(self._multiprocessing[camera]["stats"])
+            for camera in self._multiprocessing
+        }
+
+    def get_postprocessing_timings(self) -> dict:
+        """
+        Mean execution time of each post-processing step of each camera
+        :return: dictionary with camera name and its {step: mean time in ms}
+        """
+        if self._multiprocessing is None:
+            return {}
+        return {
+            camera: self._multiprocessing[camera]["timings"].get_means()
+            for camera in self._multiprocessing
+        }
+
+    @staticmethod
+    def is_worker_alive(worker: dict) -> bool:
+        """
+        Checks the process and the heartbeat of a pose estimation process
+        Processes that did not beat yet are still starting up and count as alive
+        """
+        if not worker["process"].is_alive():
+            return False
+        heartbeat = worker["heartbeat"]
+        return heartbeat.is_alive() or not heartbeat.started()
+
+    def get_worker_status(self) -> dict:
+        """
+        Checks the heartbeat of each pose estimation process
+        :return: dictionary with camera name and whether all of its processes are alive and responsive
+        """
+        if not self._dlc_running:
+            return {}
+        batch_alive = self._batch_worker is None or self.is_worker_alive(
+            self._batch_worker
+        )
+        return {
+            camera: batch_alive
+            and all(
+                self.is_worker_alive(worker)
+                for worker in self._multiprocessing[camera]["workers"]
+            )
+            for camera in self._multiprocessing
+        }
+
+    def check_workers(self):
+        """
+        Warns when the pose estimation processes of a camera stop responding and when they respond again
+        Checked at most once per heartbeat interval
+        """
+        now = time.time()
+        if now - self._last_worker_check < BEAT_INTERVAL:
+            return
+        self._last_worker_check = now
+        for camera, alive in self.get_worker_status().items():
+            if alive == self._worker_status.get(camera, True):
+                continue
+            self._worker_status[camera] = alive
+            if alive:
+                print(f"Pose estimation of device {camera} responds again.")
+            else:
+                print(
+                    f"Pose estimation of device {camera} did not respond for {HEARTBEAT_TIMEOUT} seconds. "
+                    "Its process might have crashed or frozen."
+                )
+
     def get_enabled_cameras(self):
         return self.enabled_cameras
 
@@ -856,7 +1664,18 @@ def start_deeplabstream(
 
     while True:
         loop_time = time.time()  # start of the loop
-        all_frames = stream_manager.get_frames()
+        try:
+            all_frames = stream_manager.get_frames()
+        except MissingFrameError as e:
+            # e.g. the end of the video, save what can be saved
+            print(*e.args, "\nShutting down DLStream and saving data...")
+            start_time = stream_manager.get_start_time()
+            stream_manager.finish_streaming()
+            stream_manager.stop_cameras()
+            if benchmark_enabled:
+                print("Benchmark statistics:")
+                show_benchmark_statistics()
+            break
         color_frames, depth_maps, infrared_frames = all_frames
         if recording_enabled:
             stream_manager.write_video(color_frames, stream_manager.frame_index)
@@ -884,7 +1703,8 @@ def start_deeplabstream(
             if res_frames:
                 if not got_first_analysed_frame and benchmark_enabled:
                     got_first_analysed_frame = True
-                show_stream(res_frames)
+                with trace_stage("display", frame=stream_manager.frame_index):
+                    show_stream(res_frames)
         else:
             show_stream(color_frames)
 
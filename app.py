@@ -12,6 +12,7 @@ import cv2
 
 from DeepLabStream import DeepLabStream, show_stream
 from utils.generic import MissingFrameError
+from utils.tracing import trace_stage
 from utils.configloader import MULTI_CAM, STREAMS, RECORD_EXP
 from utils.gui_image import QFrame, ImageWindow, emit_qframes
 
@@ -68,7 +69,8 @@ class AThread(QThread):
                 )
                 # streaming the stream
                 if res_frames:
-                    self._stream_frames(res_frames)
+                    with trace_stage("display", frame=stream_manager.frame_index):
+                        self._stream_frames(res_frames)
             else:
                 self._stream_frames(color_frames)
 
@@ -0,0 +1,86 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import os
+import json
+
+import tensorflow as tf
+import tf2onnx
+from ruamel.yaml import YAML
+
+
+def load_frozen_graph(model_dir):
+    """Load the frozen graph of an exported DLC model (as used by DLC-Live)"""
+    graph_files = sorted(file for file in os.listdir(model_dir) if file.endswith(".pb"))
+    if not graph_files:
+        raise FileNotFoundError(
+            f"No frozen graph found in {model_dir}. Export the model with deeplabcut.export_model first."
+        )
+    graph_def = tf.compat.v1.GraphDef()
+    with open(os.path.join(model_dir, graph_files[-1]), "rb") as f:
+        graph_def.ParseFromString(f.read())
+    return graph_def, os.path.splitext(graph_files[-1])[0]
+
+
+def get_output_nodes(graph_def):
+    """Find the output nodes the same way DLC-Live does"""
+    with tf.Graph().as_default() as graph:
+        tf.compat.v1.import_graph_def(graph_def, name="")
+    op_names = [op.name for op in graph.get_operations()]
+    if "concat_1" in op_names[-1]:
+        # model was exported with TFGPUinference, the graph already predicts the pose
+        return [op_names[-1]], True
+    # scoremap first, location refinement second
+    outputs = sorted(op_names[-2:], key=lambda name: "locref" in name)
+    return outputs, False
+
+
+def convert_model(model_dir, opset: int = 13):
+    """
+    Convert an exported DLC/DLC-Live model to ONNX
+    The .onnx file and a .json file with its pose configuration are written into the model folder,
+    use the folder as MODEL_PATH with MODEL_ORIGIN = ONNX
+    """
+    print("Loading model...")
+    with open(os.path.join(model_dir, "pose_cfg.yaml")) as f:
+        pose_cfg = YAML(typ="safe").load(f)
+    graph_def, filename = load_frozen_graph(model_dir)
+    outputs, pose_output = get_output_nodes(graph_def)
+
+    print("Converting model...")
+    output_path = os.path.join(model_dir, filename + ".onnx")
+    tf2onnx.convert.from_graph_def(
+        graph_def,
+        input_names=["Placeholder:0"],
+        output_names=[output + ":0" for output in outputs],
+        opset=opset,
+        output_path=output_path,
+    )
+
+    config = dict(
+        input="Placeholder:0",
+        outputs=[output + ":0" for output in outputs],
+        pose_output=pose_output,
+        # the sigmoid is not part of the graph if the raw prediction layer is the output
+        scoremap_logits=not pose_output and "Sigmoid" not in outputs[0],
+        location_refinement=bool(pose_cfg.get("location_refinement", True)),
+        locref_stdev=float(pose_cfg.get("locref_stdev", 7.2801)),
+        stride=int(pose_cfg.get("stride", 8)),
+        all_joints_names=list(pose_cfg.get("all_joints_names", [])),
+    )
+    with open(os.path.join(model_dir, filename + ".json"), "w") as f:
+        json.dump(config, f, indent=4)
+
+    print(f"Converted model {filename} to {output_path}")
+
+
+if __name__ == "__main__":
+
+    """Point this to the folder of an exported DLC model (the one you would use with DLC-Live)"""
+    path_to_model = "PATH_TO_EXPORTED_MODEL"
+    convert_model(path_to_model)
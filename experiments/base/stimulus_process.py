@@ -9,6 +9,8 @@ Licensed under GNU General Public License v3.0
 import time
 import multiprocessing as mp
 from experiments.utils.exp_setup import get_process_settings, setup_stimulation
+from utils.worker import Heartbeat, WorkerShutdown, receive, stop_worker
+from utils.tracing import trace_stage
 
 
 class Timer:
@@ -65,32 +67,48 @@ class Timer:
         return self._start_time
 
 
-def base_conditional_switch_protocol_run(condition_q: mp.Queue, stimulus_name):
+def base_conditional_switch_protocol_run(
+    condition_q: mp.Queue, stimulus_name, heartbeat: Heartbeat = None
+):
     condition = False
     stimulation = setup_stimulation(stimulus_name)
-    while True:
-        if condition_q.full():
-            condition = condition_q.get()
-        if condition:
-            stimulation.start()
-        else:
-            stimulation.stop()
+    try:
+        while True:
+            new_condition = receive(condition_q, heartbeat)
+            if new_condition is not None:
+                condition = new_condition
+            if condition:
+                stimulation.start()
+            else:
+                stimulation.stop()
+    except WorkerShutdown:
+        stimulation.stop()
 
 
-def base_conditional_supply_protocol_run(condition_q: mp.Queue, stimulus_name):
+def base_conditional_supply_protocol_run(
+    condition_q: mp.Queue, stimulus_name, heartbeat: Heartbeat = None
+):
     condition = False
     stimulation = setup_stimulation(stimulus_name)
-    while True:
-        if condition_q.full():
-            condition = condition_q.get()
-        if condition:
-            stimulation.stimulate()
-        else:
-            stimulation.remove()
+    try:
+        while True:
+            new_condition = receive(condition_q, heartbeat)
+            if new_condition is not None:
+                condition = new_condition
+            if condition:
+                stimulation.stimulate()
+            else:
+                stimulation.remove()
+    except WorkerShutdown:
+        stimulation.remove()
 
 
 def base_trial_protocol_run(
-    trial_q: mp.Queue, condition_q: mp.Queue, success_q: mp.Queue, stimulation_name
+    trial_q: mp.Queue,
+    condition_q: mp.Queue,
+    success_q: mp.Queue,
+    stimulation_name,
+    heartbeat: Heartbeat = None,
 ):
     """
     The function to use in ProtocolProcess class
@@ -100,49 +118,57 @@ def base_trial_protocol_run(
     :param success_q: the result of each protocol (outwards)
     :param condition_q: collects trigger results from trial trigger
     :param stimulus_name: exact name of stimulus function in base.stimulation.py
+    :param heartbeat: Heartbeat that is updated while the process is running
     """
     current_trial = None
     stimulation = setup_stimulation(stimulation_name)
     # starting the main loop without any protocol running
-    while True:
-        if trial_q.empty() and current_trial is None:
-            pass
-        elif trial_q.full():
-            current_trial = trial_q.get()
-            finished_trial = False
-            # starting timers
-            current_trial["stimulus_timer"].start()
-            current_trial["success_timer"].start()
-            print("Starting protocol {}".format(current_trial))
-            condition_list = []
+    try:
+        while True:
+            if current_trial is None:
+                # waiting for the next trial
+                new_trial = receive(trial_q, heartbeat)
+                if new_trial is not None:
+                    current_trial = new_trial
+                    finished_trial = False
+                    # starting timers
+                    current_trial["stimulus_timer"].start()
+                    current_trial["success_timer"].start()
+                    print("Starting protocol {}".format(current_trial))
+                    condition_list = []
             # this branch is for already running protocol
-        elif current_trial is not None:
-            # checking for stimulus timer and outputting correct image
-            if current_trial["stimulus_timer"].check_timer():
-                # if stimulus timer is running, show stimulus
-                stimulation.start()
             else:
-                # if the timer runs out, finish protocol and reset timer
-                stimulation.stop()
-                current_trial["stimulus_timer"].reset()
-                current_trial = None
-
-            # checking if any condition was passed
-            if condition_q.full():
-                stimulus_condition = condition_q.get()
-                # checking if timer for condition is running and condition=True
-                if current_trial["success_timer"].check_timer():
-                    condition_list.append(stimulus_condition)
-
-            # checking if the timer for condition has run out
-            if not current_trial["success_timer"].check_timer() and not finished_trial:
-                # resetting the timer
-                print("Timer for condition run out")
-                finished_trial = True
-                # outputting the result, whatever it is
-                success = current_trial["result_func"](condition_list)
-                success_q.put(success)
-                current_trial["success_timer"].reset()
+                # waiting for the next condition, waking up regularly to check the timers
+                stimulus_condition = receive(condition_q, heartbeat)
+                trial = current_trial
+                # checking for stimulus timer and outputting correct image
+                if trial["stimulus_timer"].check_timer():
+                    # if stimulus timer is running, show stimulus
+                    stimulation.start()
+                else:
+                    # if the timer runs out, finish protocol and reset timer
+                    stimulation.stop()
+                    trial["stimulus_timer"].reset()
+                    current_trial = None
+
+                # checking if any condition was passed
+                if stimulus_condition is not None:
+                    # checking if timer for condition is running and condition=True
+                    if trial["success_timer"].check_timer():
+                        condition_list.append(stimulus_condition)
+
+                # checking if the timer for condition has run out
+                if not trial["success_timer"].check_timer() and not finished_trial:
+                    # resetting the timer
+                    print("Timer for condition run out")
+                    finished_trial = True
+                    # outputting the result, whatever it is
+                    success = trial["result_func"](condition_list)
+                    success_q.put(success)
+                    trial["success_timer"].reset()
+    except WorkerShutdown:
+        stimulation.stop()
+        success_q.cancel_join_thread()
 
 
 class BaseProtocolProcess:
@@ -157,6 +183,7 @@ class BaseProtocolProcess:
         self._name = "BaseProtocolProcess"
         self._parameter_dict = dict(TYPE="str", STIMULATION="str")
         self._settings_dict = get_process_settings(self._name, self._parameter_dict)
+        self._heartbeat = Heartbeat()
 
         if self._settings_dict["TYPE"] == "trial":
             self._trial_queue = mp.Queue(1)
@@ -169,20 +196,29 @@ class BaseProtocolProcess:
                     self._condition_queue,
                     self._success_queue,
                     self._settings_dict["STIMULATION"],
+                    self._heartbeat,
                 ),
             )
         elif self._settings_dict["TYPE"] == "switch":
             self._condition_queue = mp.Queue(1)
             self._protocol_process = mp.Process(
                 target=base_conditional_switch_protocol_run,
-                args=(self._condition_queue, self._settings_dict["STIMULATION"]),
+                args=(
+                    self._condition_queue,
+                    self._settings_dict["STIMULATION"],
+                    self._heartbeat,
+                ),
             )
 
         elif self._settings_dict["TYPE"] == "supply":
             self._condition_queue = mp.Queue(1)
             self._protocol_process = mp.Process(
                 target=base_conditional_supply_protocol_run,
-                args=(self._condition_queue, self._settings_dict["STIMULATION"]),
+                args=(
+                    self._condition_queue,
+                    self._settings_dict["STIMULATION"],
+                    self._heartbeat,
+                ),
             )
 
         self._running = False
@@ -202,26 +238,36 @@ class BaseProtocolProcess:
             self._settings_dict["TYPE"] == "switch"
             or self._settings_dict["TYPE"] == "supply"
         ):
+            stop_worker(self._protocol_process, [self._condition_queue])
             self._condition_queue.close()
         elif self._settings_dict["TYPE"] == "trial":
+            stop_worker(
+                self._protocol_process, [self._trial_queue, self._condition_queue]
+            )
             self._trial_queue.close()
+            self._condition_queue.close()
             self._success_queue.close()
 
-        self._protocol_process.terminate()
-
     def get_status(self):
         """
         Getting current status of the running protocol
         """
         return self._running, self._current_trial
 
+    def is_alive(self) -> bool:
+        """
+        Checking the heartbeat of the protocol process
+        """
+        return self._heartbeat.is_alive()
+
     def put(self, input_p):
         """
         Passing the trial name to the process
         """
 
         if self._condition_queue.empty():
-            self._condition_queue.put(input_p)
+            with trace_stage("stimulus hand-off"):
+                self._condition_queue.put(input_p)
 
     def put_trial(self, trial: dict, trial_name):
         """
@@ -229,7 +275,8 @@ class BaseProtocolProcess:
         """
         if self._settings_dict["TYPE"] == "trial":
             if self._trial_queue.empty() and self._success_queue.empty():
-                self._trial_queue.put(trial)
+                with trace_stage("stimulus hand-off"):
+                    self._trial_queue.put(trial)
                 self._running = True
                 self._current_trial = trial_name
 
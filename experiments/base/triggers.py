@@ -5,13 +5,17 @@ University Bonn Medical Faculty, Germany
 https://github.com/SchwarzNeuroconLab/DeepLabStream
 Licensed under GNU General Public License v3.0
 """
+import numpy as np
+
 from experiments.utils.exp_setup import get_trigger_settings
 from utils.analysis import (
     angle_between_vectors,
-    calculate_distance,
+    calculate_elapsed_frames,
     EllipseROI,
     RectangleROI,
 )
+from utils.configloader import FRAMERATE
+from utils.poseframe import get_points
 
 """BaseTrigger class"""
 
@@ -544,6 +548,8 @@ class BaseHeaddirectionROITrigger(BaseTrigger):
 class BaseSpeedTrigger(BaseTrigger):
     """
     Trigger to check if animal is moving above a certain speed
+    Movements are scaled to one frame at FRAMERATE with the capture times of the skeletons,
+    so frames that were not analysed do not count as faster movement
     """
 
     def __init__(self):
@@ -602,23 +608,17 @@ class BaseSpeedTrigger(BaseTrigger):
             self._skeleton = skeleton
         else:
             if self._bodypart is "any":
-                for joint in skeleton:
-                    joint_travel = calculate_distance(
-                        skeleton[joint], self._skeleton[joint]
-                    )
-                    joint_moved.append(abs(joint_travel) >= self._threshold)
-
+                joints = list(skeleton)
             elif isinstance(self._bodypart, list):
-                for joint in self._bodypart:
-                    joint_travel = calculate_distance(
-                        skeleton[joint], self._skeleton[joint]
-                    )
-                    joint_moved.append(abs(joint_travel) >= self._threshold)
+                joints = self._bodypart
             else:
-                joint_travel = calculate_distance(
-                    skeleton[self._bodypart], self._skeleton[self._bodypart]
-                )
-                joint_moved.append(abs(joint_travel) >= self._threshold)
+                joints = [self._bodypart]
+            # distances of all joints at once, NaN coordinates never count as moved
+            joint_travel = np.linalg.norm(
+                get_points(skeleton, joints) - get_points(self._skeleton, joints),
+                axis=1,
+            ) / calculate_elapsed_frames(self._skeleton, skeleton, FRAMERATE)
+            joint_moved = list(np.abs(joint_travel) >= self._threshold)
 
             if all(joint_moved):
                 result = True
@@ -12,6 +12,7 @@ import pickle
 import numpy as np
 
 from utils.configloader import PATH_TO_CLASSIFIER, TIME_WINDOW, FRAMERATE
+from utils.worker import Heartbeat, run_worker, stop_worker
 from experiments.custom.featureextraction import (
     SimbaFeatureExtractor,
     SimbaFeatureExtractorStandard14bp,
@@ -134,101 +135,99 @@ class BsoidClassifier:
 """Feature Extraction and Classification in the same pool"""
 
 
-def example_feat_classifier_pool_run(input_q: mp.Queue, output_q: mp.Queue):
+def example_feat_classifier_pool_run(
+    input_q: mp.Queue, output_q: mp.Queue, heartbeat: Heartbeat = None
+):
     feature_extractor = SimbaFeatureExtractor(TIME_WINDOW)
     classifier = Classifier()  # initialize classifier
-    while True:
-        skel_time_window = None
-        feature_id = 0
-        if input_q.full():
-            skel_time_window, feature_id = input_q.get()
-        if skel_time_window is not None:
-            start_time = time.time()
-            features = feature_extractor.extract_features(skel_time_window)
-            last_prob = classifier.classify(features)
-            output_q.put((last_prob, feature_id))
-            end_time = time.time()
-            # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
-        else:
-            pass
 
+    def classify_time_window(item):
+        skel_time_window, feature_id = item
+        start_time = time.time()
+        features = feature_extractor.extract_features(skel_time_window)
+        last_prob = classifier.classify(features)
+        output_q.put((last_prob, feature_id))
+        end_time = time.time()
+        # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
+
+    run_worker(input_q, classify_time_window, heartbeat)
+    output_q.cancel_join_thread()
 
-def simba_feat_classifier_pool_run(input_q: mp.Queue, output_q: mp.Queue):
+
+def simba_feat_classifier_pool_run(
+    input_q: mp.Queue, output_q: mp.Queue, heartbeat: Heartbeat = None
+):
     #feature_extractor = SimbaFeatureExtractorStandard14bp(TIME_WINDOW)
     feature_extractor = SimbaFeatureExtractor(TIME_WINDOW)
     classifier = SiMBAClassifier()  # initialize classifier
     report = False
     ft_list = []
     clf_list = []
-    while True:
-        skel_time_window = None
-        feature_id = 0
-        if input_q.full():
-            skel_time_window, feature_id = input_q.get()
-        if skel_time_window is not None:
-            start_time_feat = time.time()
-            features = feature_extractor.extract_features(skel_time_window)
-            end_time_feat = time.time()
-            start_time_clf = time.time()
-            last_prob = classifier.classify(features)
-            end_time = time.time()
-            output_q.put((last_prob, feature_id))
-
-            if report:
-                feat_time = ((end_time_feat - start_time_feat) * 1000)
-                clf_time = ((end_time-start_time_clf)*1000)
-                print("Feature Extraction time: {:.2f} msec".format(feat_time))
-                print("Classification time: {:.2f} msec".format(clf_time))
-                print("Total time: {:.2f} msec".format((end_time-start_time_feat)*1000))
-                print("Current probability: {:.2f}".format(last_prob))
-                print("Feature ID: "+ str(feature_id))
-                #skip first 10 to ignore numba jit initial slowness in stats
-                if feature_id > 10:
-                    ft_list.append(feat_time)
-                    clf_list.append(clf_time)
-                    print("Avg. feature extraction time: {:.2f} +/- {:.2f} msec".format(np.mean(ft_list), np.std(ft_list)),
-                              "Avg. classification time: {:.2f} +/- {:.2f} msec".format(np.mean(clf_list), np.std(clf_list)),
-                          f"Classfication Cycles: {len(ft_list)}")
 
-        else:
-            pass
+    def classify_time_window(item):
+        skel_time_window, feature_id = item
+        start_time_feat = time.time()
+        features = feature_extractor.extract_features(skel_time_window)
+        end_time_feat = time.time()
+        start_time_clf = time.time()
+        last_prob = classifier.classify(features)
+        end_time = time.time()
+        output_q.put((last_prob, feature_id))
+
+        if report:
+            feat_time = ((end_time_feat - start_time_feat) * 1000)
+            clf_time = ((end_time-start_time_clf)*1000)
+            print("Feature Extraction time: {:.2f} msec".format(feat_time))
+            print("Classification time: {:.2f} msec".format(clf_time))
+            print("Total time: {:.2f} msec".format((end_time-start_time_feat)*1000))
+            print("Current probability: {:.2f}".format(last_prob))
+            print("Feature ID: "+ str(feature_id))
+            #skip first 10 to ignore numba jit initial slowness in stats
+            if feature_id > 10:
+                ft_list.append(feat_time)
+                clf_list.append(clf_time)
+                print("Avg. feature extraction time: {:.2f} +/- {:.2f} msec".format(np.mean(ft_list), np.std(ft_list)),
+                          "Avg. classification time: {:.2f} +/- {:.2f} msec".format(np.mean(clf_list), np.std(clf_list)),
+                      f"Classfication Cycles: {len(ft_list)}")
 
+    run_worker(input_q, classify_time_window, heartbeat)
+    output_q.cancel_join_thread()
 
-def bsoid_feat_classifier_pool_run(input_q: mp.Queue, output_q: mp.Queue):
+
+def bsoid_feat_classifier_pool_run(
+    input_q: mp.Queue, output_q: mp.Queue, heartbeat: Heartbeat = None
+):
     feature_extractor = BsoidFeatureExtractor()
     classifier = BsoidClassifier()  # initialize classifier
     report = False
     ft_list = []
     clf_list = []
 
-    while True:
-        skel_time_window = None
-        feature_id = 0
-        if input_q.full():
-            skel_time_window, feature_id = input_q.get()
-        if skel_time_window is not None:
-            start_time_feat = time.time()
-            features = feature_extractor.extract_features(skel_time_window)
-            end_time_feat = time.time()
-            start_time_clf = time.time()
-            last_prob = classifier.classify(features)
-            output_q.put((last_prob, feature_id))
-            end_time = time.time()
-            if report:
-                feat_time = ((end_time_feat - start_time_feat) * 1000)
-                clf_time = ((end_time-start_time_clf)*1000)
-                print("Feature Extraction time: {:.2f} msec".format(feat_time))
-                print("Classification time: {:.2f} msec".format(clf_time))
-                print("Total time: {:.2f} msec".format((end_time-start_time_feat)*1000))
-                print("Current motif: ", *last_prob)
-                print("Feature ID: "+ str(feature_id))
-                ft_list.append(feat_time)
-                clf_list.append(clf_time)
-                print("Avg. feature extraction time: {:.2f} +/- {:.2f} msec".format(np.mean(ft_list), np.std(ft_list)),
-                          "Avg. classification time: {:.2f} +/- {:.2f} msec".format(np.mean(clf_list), np.std(clf_list)),
-                      f"Classfication Cycles: {len(ft_list)}")
-        else:
-            pass
+    def classify_time_window(item):
+        skel_time_window, feature_id = item
+        start_time_feat = time.time()
+        features = feature_extractor.extract_features(skel_time_window)
+        end_time_feat = time.time()
+        start_time_clf = time.time()
+        last_prob = classifier.classify(features)
+        output_q.put((last_prob, feature_id))
+        end_time = time.time()
+        if report:
+            feat_time = ((end_time_feat - start_time_feat) * 1000)
+            clf_time = ((end_time-start_time_clf)*1000)
+            print("Feature Extraction time: {:.2f} msec".format(feat_time))
+            print("Classification time: {:.2f} msec".format(clf_time))
+            print("Total time: {:.2f} msec".format((end_time-start_time_feat)*1000))
+            print("Current motif: ", *last_prob)
+            print("Feature ID: "+ str(feature_id))
+            ft_list.append(feat_time)
+            clf_list.append(clf_time)
+            print("Avg. feature extraction time: {:.2f} +/- {:.2f} msec".format(np.mean(ft_list), np.std(ft_list)),
+                      "Avg. classification time: {:.2f} +/- {:.2f} msec".format(np.mean(clf_list), np.std(clf_list)),
+                  f"Classfication Cycles: {len(ft_list)}")
+
+    run_worker(input_q, classify_time_window, heartbeat)
+    output_q.cancel_join_thread()
 
 
 class FeatureExtractionClassifierProcessPool:
@@ -258,14 +257,16 @@ class FeatureExtractionClassifierProcessPool:
         for i in range(pool_size):
             input_queue = mp.Queue(1)
             output_queue = mp.Queue(1)
+            heartbeat = Heartbeat()
             classification_process = mp.Process(
-                target=process_func, args=(input_queue, output_queue)
+                target=process_func, args=(input_queue, output_queue, heartbeat)
             )
             process_pool.append(
                 dict(
                     process=classification_process,
                     input=input_queue,
                     output=output_queue,
+                    heartbeat=heartbeat,
                     running=False,
                 )
             )
@@ -284,9 +285,9 @@ class FeatureExtractionClassifierProcessPool:
         Ending all processes
         """
         for process in self._process_pool:
+            stop_worker(process["process"], [process["input"]])
             process["input"].close()
             process["output"].close()
-            process["process"].terminate()
 
     def get_status(self):
         """
@@ -388,56 +389,56 @@ class FeatBsoidProcessPool(FeatureExtractionClassifierProcessPool):
 
 
 def example_classifier_run(
-    input_classification_q: mp.Queue, output_classification_q: mp.Queue
+    input_classification_q: mp.Queue,
+    output_classification_q: mp.Queue,
+    heartbeat: Heartbeat = None,
 ):
     classifier = Classifier()  # initialize classifier
-    while True:
-        features = None
-        if input_classification_q.full():
-            features = input_classification_q.get()
-        if features is not None:
-            last_prob = classifier.classify(features)
-            output_classification_q.put(last_prob)
-        else:
-            pass
+
+    def classify_features(features):
+        last_prob = classifier.classify(features)
+        output_classification_q.put(last_prob)
+
+    run_worker(input_classification_q, classify_features, heartbeat)
+    output_classification_q.cancel_join_thread()
 
 
-def simba_classifier_run(input_q: mp.Queue, output_q: mp.Queue):
+def simba_classifier_run(
+    input_q: mp.Queue, output_q: mp.Queue, heartbeat: Heartbeat = None
+):
     classifier = SiMBAClassifier()  # initialize classifier
-    while True:
-        features = None
-        if input_q.full():
-            features = input_q.get()
-        if features is not None:
-            start_time = time.time()
-            last_prob = classifier.classify(features)
-            output_q.put((last_prob))
-            end_time = time.time()
-            # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
-        else:
-            pass
 
+    def classify_features(features):
+        start_time = time.time()
+        last_prob = classifier.classify(features)
+        output_q.put((last_prob))
+        end_time = time.time()
+        # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
+
+    run_worker(input_q, classify_features, heartbeat)
+    output_q.cancel_join_thread()
 
-def bsoid_classifier_run(input_q: mp.Queue, output_q: mp.Queue):
+
+def bsoid_classifier_run(
+    input_q: mp.Queue, output_q: mp.Queue, heartbeat: Heartbeat = None
+):
     #takes features from input and feeds them into classifier. Outputs classification
     classifier = BsoidClassifier()  # initialize classifier
-    while True:
-        features = None
-        if input_q.full():
-            features = input_q.get()
-        if features is not None:
-            start_time = time.time()
-            #last prob is a missleading name that comes from a binary classifier. B-SOID's output is a cluster id rather then the probability.
-            last_prob = classifier.classify(features)
-            output_q.put((last_prob))
-            end_time = time.time()
-            print(
-                "Classification time: {:.2f} msec".format(
-                    (end_time - start_time) * 1000
-                )
+
+    def classify_features(features):
+        start_time = time.time()
+        #last prob is a missleading name that comes from a binary classifier. B-SOID's output is a cluster id rather then the probability.
+        last_prob = classifier.classify(features)
+        output_q.put((last_prob))
+        end_time = time.time()
+        print(
+            "Classification time: {:.2f} msec".format(
+                (end_time - start_time) * 1000
             )
-        else:
-            pass
+        )
+
+    run_worker(input_q, classify_features, heartbeat)
+    output_q.cancel_join_thread()
 
 
 class ClassifierProcess:
@@ -452,10 +453,12 @@ class ClassifierProcess:
         """
         self.input_queue = mp.Queue(1)
         self.output_queue = mp.Queue(1)
+        self._heartbeat = Heartbeat()
         self._classification_process = None
         self._running = False
         self._classification_process = mp.Process(
-            target=example_classifier_run, args=(self.input_queue, self.output_queue)
+            target=example_classifier_run,
+            args=(self.input_queue, self.output_queue, self._heartbeat),
         )
 
     def start(self):
@@ -468,9 +471,9 @@ class ClassifierProcess:
         """
         Ending the process
         """
+        stop_worker(self._classification_process, [self.input_queue])
         self.input_queue.close()
         self.output_queue.close()
-        self._classification_process.terminate()
 
     def get_status(self):
         """
@@ -501,7 +504,8 @@ class SimbaClassifier_Process(ClassifierProcess):
         self.input_queue = mp.Queue(1)
         self.output_queue = mp.Queue(1)
         self._classification_process = mp.Process(
-            target=simba_classifier_run, args=(self.input_queue, self.output_queue)
+            target=simba_classifier_run,
+            args=(self.input_queue, self.output_queue, self._heartbeat),
         )
 
 
@@ -511,64 +515,64 @@ class BsoidClassifier_Process(ClassifierProcess):
         self.input_queue = mp.Queue(1)
         self.output_queue = mp.Queue(1)
         self._classification_process = mp.Process(
-            target=bsoid_classifier_run, args=(self.input_queue, self.output_queue)
+            target=bsoid_classifier_run,
+            args=(self.input_queue, self.output_queue, self._heartbeat),
         )
 
 
 """Processing pool for classification"""
 
 
-def example_classifier_pool_run(input_q: mp.Queue, output_q: mp.Queue):
+def example_classifier_pool_run(
+    input_q: mp.Queue, output_q: mp.Queue, heartbeat: Heartbeat = None
+):
     classifier = Classifier()  # initialize classifier
-    while True:
-        features = None
-        feature_id = 0
-        if input_q.full():
-            features, feature_id = input_q.get()
-        if features is not None:
-            start_time = time.time()
-            last_prob = classifier.classify(features)
-            output_q.put((last_prob, feature_id))
-            end_time = time.time()
-            # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
-        else:
-            pass
+
+    def classify_features(item):
+        features, feature_id = item
+        start_time = time.time()
+        last_prob = classifier.classify(features)
+        output_q.put((last_prob, feature_id))
+        end_time = time.time()
+        # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
+
+    run_worker(input_q, classify_features, heartbeat)
+    output_q.cancel_join_thread()
 
 
-def simba_classifier_pool_run(input_q: mp.Queue, output_q: mp.Queue):
+def simba_classifier_pool_run(
+    input_q: mp.Queue, output_q: mp.Queue, heartbeat: Heartbeat = None
+):
     classifier = SiMBAClassifier()  # initialize classifier
-    while True:
-        features = None
-        feature_id = 0
-        if input_q.full():
-            features, feature_id = input_q.get()
-        if features is not None:
-            start_time = time.time()
-            last_prob = classifier.classify(features)
-            output_q.put((last_prob, feature_id))
-            end_time = time.time()
-            # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
-        else:
-            pass
 
+    def classify_features(item):
+        features, feature_id = item
+        start_time = time.time()
+        last_prob = classifier.classify(features)
+        output_q.put((last_prob, feature_id))
+        end_time = time.time()
+        # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
 
-def bsoid_classifier_pool_run(input_q: mp.Queue, output_q: mp.Queue):
+    run_worker(input_q, classify_features, heartbeat)
+    output_q.cancel_join_thread()
+
+
+def bsoid_classifier_pool_run(
+    input_q: mp.Queue, output_q: mp.Queue, heartbeat: Heartbeat = None
+):
     classifier = BsoidClassifier()  # initialize classifier
-    while True:
-        features = None
-        feature_id = 0
-        if input_q.full():
-            features, feature_id = input_q.get()
-        if features is not None:
-            start_time = time.time()
-            last_prob = classifier.classify(features)
-            output_q.put((last_prob, feature_id))
-            end_time = time.time()
-            # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
-            # print("Feature ID: "+ feature_id)
 
-        else:
-            pass
+    def classify_features(item):
+        features, feature_id = item
+        start_time = time.time()
+        last_prob = classifier.classify(features)
+        output_q.put((last_prob, feature_id))
+        end_time = time.time()
+        # print("Classification time: {:.2f} msec".format((end_time-start_time)*1000))
+        # print("Feature ID: "+ feature_id)
+
+    run_worker(input_q, classify_features, heartbeat)
+    output_q.cancel_join_thread()
 
 
 class ClassifierProcessPool:
@@ -596,14 +600,16 @@ class ClassifierProcessPool:
         for i in range(pool_size):
             input_queue = mp.Queue(1)
             output_queue = mp.Queue(1)
+            heartbeat = Heartbeat()
             classification_process = mp.Process(
-                target=process_func, args=(input_queue, output_queue)
+                target=process_func, args=(input_queue, output_queue, heartbeat)
             )
             process_pool.append(
                 dict(
                     process=classification_process,
                     input=input_queue,
                     output=output_queue,
+                    heartbeat=heartbeat,
                     running=False,
                 )
             )
@@ -622,9 +628,9 @@ class ClassifierProcessPool:
         Ending all processes
         """
         for process in self._process_pool:
+            stop_worker(process["process"], [process["input"]])
             process["input"].close()
             process["output"].close()
-            process["process"].terminate()
 
     def get_status(self):
         """
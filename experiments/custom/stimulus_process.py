@@ -17,6 +17,8 @@ from experiments.custom.stimulation import (
     DigitalModDevice,
 )
 from experiments.utils.gpio_control import DigitalArduinoDevice
+from utils.worker import Heartbeat, WorkerShutdown, receive, stop_worker
+from utils.tracing import trace_stage
 import random
 
 
@@ -74,25 +76,29 @@ class Timer:
         return self._start_time
 
 
-def example_protocol_run(condition_q: mp.Queue):
+def example_protocol_run(condition_q: mp.Queue, heartbeat: Heartbeat = None):
     current_trial = None
     # dmod_device = DigitalModDevice('Dev1/PFI0')
     # led_machine = DigitalArduinoDevice("COM5")
-    while True:
-        # if no protocol is selected, running default picture (background)
-        if condition_q.full():
-            current_trial = condition_q.get()
-        if current_trial is not None:
-            show_visual_stim_img(type=current_trial, name="DlStream")
-            # dmod_device.toggle()
-            # led_machine.turn_on()
-        else:
-            show_visual_stim_img(name="DlStream")
-            # dmod_device.turn_off()
-            # led_machine.turn_off()
+    try:
+        while True:
+            # if no protocol is selected, running default picture (background)
+            new_trial = receive(condition_q, heartbeat)
+            if new_trial is not None:
+                current_trial = new_trial
+            if current_trial is not None:
+                show_visual_stim_img(type=current_trial, name="DlStream")
+                # dmod_device.toggle()
+                # led_machine.turn_on()
+            else:
+                show_visual_stim_img(name="DlStream")
+                # dmod_device.turn_off()
+                # led_machine.turn_off()
 
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+    except WorkerShutdown:
+        pass
 
 
 class ProtocolProcess:
@@ -107,6 +113,7 @@ class ProtocolProcess:
         self._trial_queue = mp.Queue(1)
         self._success_queue = mp.Queue(1)
         self._condition_queue = mp.Queue(1)
+        self._heartbeat = Heartbeat()
         self._protocol_process = None
         self._running = False
         self._current_trial = None
@@ -121,10 +128,18 @@ class ProtocolProcess:
         """
         Ending the process
         """
+        stop_worker(
+            self._protocol_process, [self._trial_queue, self._condition_queue]
+        )
         self._trial_queue.close()
         self._success_queue.close()
         self._condition_queue.close()
-        self._protocol_process.terminate()
+
+    def is_alive(self) -> bool:
+        """
+        Checking the heartbeat of the protocol process
+        """
+        return self._heartbeat.is_alive()
 
     def get_status(self):
         """
@@ -137,7 +152,8 @@ class ProtocolProcess:
         Passing the trial name to the process
         """
         if self._trial_queue.empty() and self._success_queue.empty():
-            self._trial_queue.put(trial)
+            with trace_stage("stimulus hand-off"):
+                self._trial_queue.put(trial)
             self._running = True
             self._current_trial = trial
 
@@ -146,7 +162,8 @@ class ProtocolProcess:
         Passing the condition to the process
         """
         if self._condition_queue.empty():
-            self._condition_queue.put(condition)
+            with trace_stage("stimulus hand-off"):
+                self._condition_queue.put(condition)
 
     def get_result(self) -> bool:
         """
@@ -168,7 +185,7 @@ class ExampleProtocolProcess(ProtocolProcess):
         """
         super().__init__()
         self._protocol_process = mp.Process(
-            target=example_protocol_run, args=(self._trial_queue,)
+            target=example_protocol_run, args=(self._trial_queue, self._heartbeat)
         )
 
 
@@ -290,7 +307,11 @@ def classic_protocol_run_old(
 
 
 def classic_protocol_run(
-    trial_q: mp.Queue, condition_q: mp.Queue, success_q: mp.Queue, trials: dict
+    trial_q: mp.Queue,
+    condition_q: mp.Queue,
+    success_q: mp.Queue,
+    trials: dict,
+    heartbeat: Heartbeat = None,
 ):
     """
     The function to use in ProtocolProcess class
@@ -300,115 +321,128 @@ def classic_protocol_run(
     :param condition_q: the condition (inwards)
     :param success_q: the result of each protocol (outwards)
     :param trials: dict of possible trials
+    :param heartbeat: Heartbeat that is updated while the process is running
     """
     # setting up different trials
     current_trial = None
     # starting the main loop without any protocol running
-    while True:
-        # if no protocol is selected, running default picture (background)
-        if trial_q.empty() and current_trial is None:
-            # print('No protocol running')
-            show_visual_stim_img(name="inside")
-        # if some protocol is passed, set up protocol timers and variables
-        elif trial_q.full():
-            current_trial = trial_q.get()
-            finished_trial = False
-            delivery = False
-            reward_del = False
-            # starting timers
-            stimulus_timer = trials[current_trial]["stimulus_timer"]
-            collection_timer = trials[current_trial]["collection_timer"]
-            success_timer = trials[current_trial]["success_timer"]
-            delivery_timer = Timer(3.5)
-            shock_timer = Timer(3.5)
-            # withdraw_timer = Timer(3.5)
-            print("Starting protocol {}".format(current_trial))
-            stimulus_timer.start()
-            success_timer.start()
-            condition_list = []
-            collection_list = []
-        # this branch is for already running protocol
-        elif current_trial is not None:
-            # checking for stimulus timer and outputting correct image
-            if stimulus_timer.check_timer():
-                # if stimulus timer is running, show stimulus
-                show_visual_stim_img(current_trial, name="inside")
-            else:
-                # if the timer runs out, finish protocol and reset timer
-                trials[current_trial]["stimulus_timer"].reset()
+    try:
+        while True:
+            # if no protocol is selected, running default picture (background)
+            if current_trial is None:
+                # print('No protocol running')
                 show_visual_stim_img(name="inside")
-            # checking if any condition was passed
-            if condition_q.full():
-                stimulus_condition = condition_q.get()
-                # checking if timer for condition is running and condition=True
-                if success_timer.check_timer():
-                    condition_list.append(stimulus_condition)
-                elif not success_timer.check_timer() and collection_timer.check_timer():
-                    collection_list.append(stimulus_condition)
-
-            # checking if the timer for condition has run out
-            if not success_timer.check_timer() and not finished_trial:
-
-                if not delivery:
-                    if current_trial is not None:
-                        print("Timer for condition ran out")
-                        print_check = True
-                        # check wether animal collected within success timer
-                        success = trials[current_trial]["result_func"](condition_list)
-                        trials[current_trial]["success_timer"].reset()
-
-                        print("Stimulation.")
-
-                        if current_trial == "Bluebar_whiteback":
-                            deliver_tone_shock()
-                            print("Aversive")
-                            shock_timer.start()
-                        elif current_trial == "Greenbar_whiteback":
-                            deliver_liqreward()
-                            delivery_timer.start()
-                            reward_del = True
-                            print("Reward")
-                        delivery = True
-                        collection_timer.start()
-                elif delivery:
-                    # resetting the timer
-                    if not collection_timer.check_timer():
-                        finished_trial = True
-                        # check whether animal collected at all
-                        collect = any(collection_list)
-                        if not collect and reward_del:
-                            # if the animal didnt go to collect reward, withdraw reward again.
-                            withdraw_liqreward()
-                            # withdraw_timer.start()
-                        trials[current_trial]["collection_timer"].reset()
-                        current_trial = None
-                        # put success in queue and finish trial
-                        success_q.put(success)
-
-            if (
-                not delivery_timer.check_timer()
-                and delivery_timer.get_start_time() is not None
-            ):
-                deliver_liqreward()
-                delivery_timer.reset()
-            if (
-                not shock_timer.check_timer()
-                and shock_timer.get_start_time() is not None
-            ):
-                deliver_tone_shock()
-                shock_timer.reset()
-
-            # if not withdraw_timer.check_timer() and withdraw_timer.get_start_time() is not None:
-            #     withdraw_liqreward(False)
-            #     withdraw_timer.reset()
-            #     delivery = False
-
-        # don't delete that
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
-
-
-def simple_protocol_run(trial_q: mp.Queue, success_q: mp.Queue, trials: dict):
+                new_trial = receive(trial_q, heartbeat)
+                # if some protocol is passed, set up protocol timers and variables
+                if new_trial is not None:
+                    current_trial = new_trial
+                    finished_trial = False
+                    delivery = False
+                    reward_del = False
+                    # starting timers
+                    stimulus_timer = trials[current_trial]["stimulus_timer"]
+                    collection_timer = trials[current_trial]["collection_timer"]
+                    success_timer = trials[current_trial]["success_timer"]
+                    delivery_timer = Timer(3.5)
+                    shock_timer = Timer(3.5)
+                    # withdraw_timer = Timer(3.5)
+                    print("Starting protocol {}".format(current_trial))
+                    stimulus_timer.start()
+                    success_timer.start()
+                    condition_list = []
+                    collection_list = []
+            # this branch is for already running protocol
+            else:
+                # waiting for the next condition, waking up regularly to check the timers
+                stimulus_condition = receive(condition_q, heartbeat)
+                # checking for stimulus timer and outputting correct image
+                if stimulus_timer.check_timer():
+                    # if stimulus timer is running, show stimulus
+                    show_visual_stim_img(current_trial, name="inside")
+                else:
+                    # if the timer runs out, finish protocol and reset timer
+                    trials[current_trial]["stimulus_timer"].reset()
+                    show_visual_stim_img(name="inside")
+                # checking if any condition was passed
+                if stimulus_condition is not None:
+                    # checking if timer for condition is running and condition=True
+                    if success_timer.check_timer():
+                        condition_list.append(stimulus_condition)
+                    elif (
+                        not success_timer.check_timer()
+                        and collection_timer.check_timer()
+                    ):
+                        collection_list.append(stimulus_condition)
+
+                # checking if the timer for condition has run out
+                if not success_timer.check_timer() and not finished_trial:
+
+                    if not delivery:
+                        if current_trial is not None:
+                            print("Timer for condition ran out")
+                            print_check = True
+                            # check wether animal collected within success timer
+                            success = trials[current_trial]["result_func"](
+                                condition_list
+                            )
+                            trials[current_trial]["success_timer"].reset()
+
+                            print("Stimulation.")
+
+                            if current_trial == "Bluebar_whiteback":
+                                deliver_tone_shock()
+                                print("Aversive")
+                                shock_timer.start()
+                            elif current_trial == "Greenbar_whiteback":
+                                deliver_liqreward()
+                                delivery_timer.start()
+                                reward_del = True
+                                print("Reward")
+                            delivery = True
+                            collection_timer.start()
+                    elif delivery:
+                        # resetting the timer
+                        if not collection_timer.check_timer():
+                            finished_trial = True
+                            # check whether animal collected at all
+                            collect = any(collection_list)
+                            if not collect and reward_del:
+                                # if the animal didnt go to collect reward, withdraw reward again.
+                                withdraw_liqreward()
+                                # withdraw_timer.start()
+                            trials[current_trial]["collection_timer"].reset()
+                            current_trial = None
+                            # put success in queue and finish trial
+                            success_q.put(success)
+
+                if (
+                    not delivery_timer.check_timer()
+                    and delivery_timer.get_start_time() is not None
+                ):
+                    deliver_liqreward()
+                    delivery_timer.reset()
+                if (
+                    not shock_timer.check_timer()
+                    and shock_timer.get_start_time() is not None
+                ):
+                    deliver_tone_shock()
+                    shock_timer.reset()
+
+                # if not withdraw_timer.check_timer() and withdraw_timer.get_start_time() is not None:
+                #     withdraw_liqreward(False)
+                #     withdraw_timer.reset()
+                #     delivery = False
+
+            # don't delete that
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+    except WorkerShutdown:
+        success_q.cancel_join_thread()
+
+
+def simple_protocol_run(
+    trial_q: mp.Queue, success_q: mp.Queue, trials: dict, heartbeat: Heartbeat = None
+):
     """
     The function to use in ProtocolProcess class
     Designed to be run continuously alongside the main loop
@@ -416,23 +450,21 @@ def simple_protocol_run(trial_q: mp.Queue, success_q: mp.Queue, trials: dict):
     :param trial_q: the protocol name (inwards)
     :param success_q: the result of each protocol (outwards)
     :param trials: dict of possible trials
+    :param heartbeat: Heartbeat that is updated while the process is running
     """
-    current_trial = None
     # starting the main loop without any protocol running
-    while True:
-        if trial_q.empty() and current_trial is None:
-            pass
-        elif trial_q.full():
-            current_trial = trial_q.get()
-            print(current_trial)
-            # this branch is for already running protocol
-        elif current_trial is not None:
-            print("Stimulating...")
-            current_trial = None
-            success_q.put(True)
-            deliver_liqreward()
-            time.sleep(3.5)
-            deliver_liqreward()
+    try:
+        while True:
+            current_trial = receive(trial_q, heartbeat)
+            if current_trial is not None:
+                print(current_trial)
+                print("Stimulating...")
+                success_q.put(True)
+                deliver_liqreward()
+                time.sleep(3.5)
+                deliver_liqreward()
+    except WorkerShutdown:
+        success_q.cancel_join_thread()
 
 
 class ClassicProtocolProcess:
@@ -447,6 +479,7 @@ class ClassicProtocolProcess:
         self._trial_queue = mp.Queue(1)
         self._success_queue = mp.Queue(1)
         self._condition_queue = mp.Queue(1)
+        self._heartbeat = Heartbeat()
         self._protocol_process = mp.Process(
             target=classic_protocol_run,
             args=(
@@ -454,6 +487,7 @@ class ClassicProtocolProcess:
                 self._condition_queue,
                 self._success_queue,
                 trials,
+                self._heartbeat,
             ),
         )
         self._running = False
@@ -469,10 +503,18 @@ class ClassicProtocolProcess:
         """
         Ending the process
         """
+        stop_worker(
+            self._protocol_process, [self._trial_queue, self._condition_queue]
+        )
         self._trial_queue.close()
         self._success_queue.close()
         self._condition_queue.close()
-        self._protocol_process.terminate()
+
+    def is_alive(self) -> bool:
+        """
+        Checking the heartbeat of the protocol process
+        """
+        return self._heartbeat.is_alive()
 
     def get_status(self):
         """
@@ -485,7 +527,8 @@ class ClassicProtocolProcess:
         Passing the trial name to the process
         """
         if self._trial_queue.empty() and self._success_queue.empty():
-            self._trial_queue.put(trial)
+            with trace_stage("stimulus hand-off"):
+                self._trial_queue.put(trial)
             self._running = True
             self._current_trial = trial
 
@@ -494,7 +537,8 @@ class ClassicProtocolProcess:
         Passing the condition to the process
         """
         if self._condition_queue.empty():
-            self._condition_queue.put(condition)
+            with trace_stage("stimulus hand-off"):
+                self._condition_queue.put(condition)
 
     def get_result(self) -> bool:
         """
@@ -517,5 +561,5 @@ class SimpleProtocolProcess(ClassicProtocolProcess):
         super().__init__(trials)
         self._protocol_process = mp.Process(
             target=simple_protocol_run,
-            args=(self._trial_queue, self._success_queue, trials),
+            args=(self._trial_queue, self._success_queue, trials, self._heartbeat),
         )
@@ -7,9 +7,11 @@ Licensed under GNU General Public License v3.0
 """
 
 from utils.poser import transform_2pose
+from utils.poseframe import get_points
 from utils.analysis import (
     angle_between_vectors,
     calculate_distance,
+    calculate_elapsed_frames,
     EllipseROI,
     RectangleROI,
 )
@@ -82,33 +84,19 @@ class SocialInteractionTrigger:
         Response body is used for plotting and outputting results to trials dataframes
         """
 
-        results = []
-        for active_bp in self._identification_dict["active"]["bp"]:
-            active_coords = skeletons[self._active_animal][active_bp]
-            for passive_bp in self._identification_dict["passive"]["bp"]:
-                passive_coords = skeletons[self._passive_animal][passive_bp]
-                temp_result = False
-                # calculate distance for all combinations if none of the coordinates are NaN
-                if not any(np.isnan([*active_coords, *passive_coords])):
-                    distance = calculate_distance(active_coords, passive_coords)
-                    if (
-                        distance >= self._threshold
-                        and self._interaction_type == "distance"
-                    ):
-                        temp_result = True
-                    elif (
-                        distance < self._threshold
-                        and self._interaction_type == "proximity"
-                    ):
-                        temp_result = True
-                    else:
-                        pass
-                else:
-                    pass
-
-                results.append(temp_result)
-
-        result = any(results)
+        active_points = get_points(skeletons[self._active_animal], self._active_bp)
+        passive_points = get_points(skeletons[self._passive_animal], self._passive_bp)
+        # distances for all combinations of active and passive bodyparts,
+        # combinations with NaN coordinates never pass the comparison
+        distances = np.linalg.norm(
+            active_points[:, np.newaxis] - passive_points[np.newaxis], axis=-1
+        )
+        if self._interaction_type == "distance":
+            result = bool((distances >= self._threshold).any())
+        elif self._interaction_type == "proximity":
+            result = bool((distances < self._threshold).any())
+        else:
+            result = False
 
         color = (0, 255, 0) if result else (0, 0, 255)
 
@@ -586,9 +574,10 @@ class FreezeTrigger:
             text = "..."
             self._skeleton = skeleton
         else:
+            # movement per frame at FRAMERATE, frames that were not analysed do not add speed
             joint_travel = calculate_distance(
                 skeleton[self._bodypart], self._skeleton[self._bodypart]
-            )
+            ) / calculate_elapsed_frames(self._skeleton, skeleton, FRAMERATE)
             self._timewindow.append(joint_travel)
             if len(self._timewindow) == self._timewindow_len:
                 joint_moved = np.sum(self._timewindow)
@@ -649,9 +638,10 @@ class SpeedTrigger:
             text = "..."
             self._skeleton = skeleton
         else:
+            # movement per frame at FRAMERATE, frames that were not analysed do not add speed
             joint_travel = calculate_distance(
                 skeleton[self._bodypart], self._skeleton[self._bodypart]
-            )
+            ) / calculate_elapsed_frames(self._skeleton, skeleton, FRAMERATE)
             self._timewindow.append(joint_travel)
             if len(self._timewindow) == self._timewindow_len:
                 joint_moved = np.sum(self._timewindow)
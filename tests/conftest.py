@@ -0,0 +1,13 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import os
+import sys
+
+# the tests import the modules of DLStream the same way the scripts in the repository root do
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,58 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import numpy as np
+
+from utils.cropping import DynamicCropper
+from utils.poseframe import PoseFrame
+
+BODYPARTS = ("nose", "tail")
+
+
+def make_pose_frame(*animals) -> PoseFrame:
+    return PoseFrame.from_pose(np.array(animals, dtype=float), BODYPARTS)
+
+
+def test_crop_box_around_all_animals():
+    cropper = DynamicCropper((480, 640), padding=10, skeletons=2)
+    cropper.update(make_pose_frame([(100, 100), (120, 110)], [(150, 200), (170, 220)]))
+    x_min, y_min, x_max, y_max = cropper.box
+    assert x_min <= 90 and y_min <= 90 and x_max >= 180 and y_max >= 230
+    assert (x_max - x_min) % 32 == 0 and (y_max - y_min) % 32 == 0
+
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cropped, offset = cropper.crop(frame)
+    assert offset == (x_min, y_min)
+    assert cropped.shape[:2] == (y_max - y_min, x_max - x_min)
+    assert np.shares_memory(cropped, frame)
+
+
+def test_missing_animal_resets_to_full_frame():
+    cropper = DynamicCropper((480, 640), padding=10, skeletons=2)
+    cropper.update(make_pose_frame([(100, 100), (120, 110)], [(150, 200), (170, 220)]))
+    assert cropper.box is not None
+    # the second animal was removed by HANDLE_MISSING = skip
+    cropper.update(make_pose_frame([(100, 100), (120, 110)]))
+    assert cropper.box is None
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cropped, offset = cropper.crop(frame)
+    assert cropped is frame and offset == (0, 0)
+
+
+def test_incomplete_skeleton_resets_to_full_frame():
+    cropper = DynamicCropper((480, 640), padding=10, skeletons=2)
+    cropper.update(make_pose_frame([(100, 100), (120, 110)], [(150, 200), (np.nan, np.nan)]))
+    assert cropper.box is None
+    cropper.update(PoseFrame.empty(BODYPARTS))
+    assert cropper.box is None
+
+
+def test_skeletons_spanning_the_frame_use_the_full_frame():
+    cropper = DynamicCropper((480, 640), padding=10)
+    cropper.update(make_pose_frame([(5, 5), (635, 475)]))
+    assert cropper.box is None
@@ -0,0 +1,54 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+from utils.dispatch import ReorderBuffer, count_skipped
+
+
+def test_results_are_released_in_order():
+    reorder = ReorderBuffer(max_pending=4)
+    for index in range(3):
+        reorder.expect(index)
+    reorder.add(1, "b")
+    reorder.add(2, "c")
+    assert reorder.pop_ready() == ([], [])
+    reorder.add(0, "a")
+    assert reorder.pop_ready() == ([(0, "a"), (1, "b"), (2, "c")], [])
+    assert len(reorder) == 0
+
+
+def test_lost_result_is_reported_as_skipped():
+    reorder = ReorderBuffer(max_pending=1)
+    for index in range(4):
+        reorder.expect(index)
+    reorder.add(1, "b")
+    assert reorder.pop_ready() == ([], [])
+    reorder.add(2, "c")
+    # more results are waiting than allowed, so frame 0 is given up
+    assert reorder.pop_ready() == ([(1, "b"), (2, "c")], [0])
+    # a late result of the skipped frame is ignored
+    reorder.add(0, "a")
+    reorder.add(3, "d")
+    assert reorder.pop_ready() == ([(3, "d")], [])
+
+
+def test_discarded_frame_is_not_waited_for():
+    reorder = ReorderBuffer(max_pending=4)
+    for index in range(2):
+        reorder.expect(index)
+    reorder.add(1, "b")
+    reorder.discard(0)
+    assert reorder.pop_ready() == ([(1, "b")], [])
+
+
+def test_count_skipped_separates_skipped_from_dropped_frames():
+    # every second frame is admitted, frames 1 and 3 are skipped on purpose
+    assert count_skipped(0, 2, 2) == 1
+    # frame 2 was admitted but lost, so only 1 and 3 are skipped
+    assert count_skipped(0, 4, 2) == 2
+    assert count_skipped(3, 6, 3) == 2
+    assert count_skipped(4, 5, 1) == 0
@@ -0,0 +1,144 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import numpy as np
+import pytest
+
+from utils.framebuffer import (
+    BufferPool,
+    FrameRingBuffer,
+    read_frame,
+    shared_memory_available,
+    write_frame,
+)
+
+SHAPE = (4, 6, 3)
+
+
+def test_buffer_is_reused_only_after_release():
+    pool = BufferPool()
+    first = pool.acquire("capture", SHAPE)
+    second = pool.acquire("capture", SHAPE)
+    assert second is not first
+    pool.release(first)
+    assert pool.acquire("capture", SHAPE) is first
+    assert pool.in_use() == 2
+
+
+def test_retained_buffer_needs_a_release_by_every_owner():
+    pool = BufferPool()
+    frame = pool.acquire("capture", SHAPE)
+    pool.retain(frame)
+    pool.release(frame)
+    assert pool.acquire("capture", SHAPE) is not frame
+    pool.release(frame)
+    assert pool.acquire("capture", SHAPE) is frame
+
+
+def test_view_releases_its_buffer():
+    pool = BufferPool()
+    frame = pool.acquire("capture", SHAPE)
+    crop = frame[1:3, 2:5]
+    pool.retain(crop)
+    pool.release(frame)
+    pool.release(crop)
+    assert pool.acquire("capture", SHAPE) is frame
+
+
+def test_held_frame_is_not_overwritten():
+    pool = BufferPool()
+    held = pool.acquire("capture", SHAPE)
+    held[...] = 7
+    for _ in range(5):
+        frame = pool.acquire("capture", SHAPE)
+        frame[...] = 0
+        pool.release(frame)
+    assert (held == 7).all()
+
+
+def test_foreign_frames_and_extra_releases_are_ignored():
+    pool = BufferPool()
+    frame = pool.acquire("capture", SHAPE)
+    pool.release(np.zeros(SHAPE, dtype=np.uint8))
+    pool.release(None)
+    pool.retain(np.zeros(SHAPE, dtype=np.uint8))
+    assert pool.in_use() == 1
+    pool.release(frame)
+    pool.release(frame)
+    assert pool.in_use() == 0
+    assert pool.acquire("capture", SHAPE) is frame
+    assert pool.in_use() == 1
+
+
+def test_buffers_are_matched_by_key_shape_and_dtype():
+    pool = BufferPool()
+    frame = pool.acquire("capture", SHAPE)
+    pool.release(frame)
+    assert pool.acquire("plot", SHAPE) is not frame
+    assert pool.acquire("capture", (2, 2, 3)) is not frame
+    assert pool.acquire("capture", SHAPE, np.float32) is not frame
+    assert pool.acquire("capture", SHAPE) is frame
+
+
+def test_steady_state_allocates_nothing():
+    pool = BufferPool()
+    for _ in range(10):
+        frame = pool.acquire("capture", SHAPE)
+        plot = pool.acquire("plot", SHAPE)
+        pool.release(frame)
+        pool.release(plot)
+        pool.end_frame()
+    statistics = pool.get_statistics()
+    assert statistics["frames"] == 10
+    assert statistics["max"] == 2 * np.prod(SHAPE)
+    assert statistics["mean"] == 2 * np.prod(SHAPE) / 10
+
+
+def test_full_pool_allocates_unpooled_buffers():
+    pool = BufferPool(max_buffers=2)
+    frames = [pool.acquire("capture", SHAPE) for _ in range(3)]
+    assert pool.in_use() == 2
+    # the unpooled buffer is not given out again after its release
+    pool.release(frames[2])
+    assert pool.acquire("capture", SHAPE) is not frames[2]
+
+
+def test_free_buffers_of_another_shape_make_room():
+    pool = BufferPool(max_buffers=2)
+    for frame in [pool.acquire("capture", SHAPE) for _ in range(2)]:
+        pool.release(frame)
+    resized = pool.acquire("capture", (2, 2, 3))
+    pool.release(resized)
+    assert pool.acquire("capture", (2, 2, 3)) is resized
+
+
+def test_disabled_pool_always_allocates():
+    pool = BufferPool(reuse=False)
+    frame = pool.acquire("capture", SHAPE)
+    pool.release(frame)
+    assert pool.acquire("capture", SHAPE) is not frame
+    pool.end_frame()
+    assert pool.get_statistics()["max"] == 2 * np.prod(SHAPE)
+
+
+@pytest.mark.skipif(not shared_memory_available(), reason="requires shared memory")
+def test_ring_buffer_passes_frames_by_slot():
+    frame_buffer = FrameRingBuffer(SHAPE, slots=2)
+    try:
+        frames = [np.full(SHAPE, value, dtype=np.uint8) for value in (1, 2, 3)]
+        refs = [write_frame(frame_buffer, frame) for frame in frames[:2]]
+        assert refs == [0, 1]
+        assert (read_frame(frame_buffer, refs[1]) == 2).all()
+        # a frame that was never read gives its slot to the replacing frame
+        assert write_frame(frame_buffer, frames[2], replaced_ref=refs[0]) == 0
+        assert (read_frame(frame_buffer, 0) == 3).all()
+        # frames that do not fit are passed directly
+        other = np.zeros((2, 2, 3), dtype=np.uint8)
+        assert write_frame(frame_buffer, other) is other
+    finally:
+        frame_buffer.release()
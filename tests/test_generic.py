@@ -0,0 +1,158 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.framebuffer import FrameRingBuffer, read_frame
+from utils.generic import ThreadedCapture, decode_video
+
+VIDEO_FRAMES = 12
+
+
+class FakeCapture:
+    """
+    Stand-in for cv2.VideoCapture delivering numbered frames, each read waits until a frame is released
+    """
+
+    def __init__(self, frames: int = 100):
+        self._frames = frames
+        self._gate = threading.Semaphore(0)
+        self.read_count = 0
+
+    def release_frames(self, frames: int = 1):
+        for _ in range(frames):
+            self._gate.release()
+
+    def close(self):
+        # the next read fails, so the reading thread stops
+        self._frames = 0
+        self._gate.release()
+
+    def read(self):
+        self._gate.acquire()
+        if self.read_count >= self._frames:
+            return False, None
+        self.read_count += 1
+        return True, np.full((2, 2), self.read_count, dtype=np.uint8)
+
+
+@pytest.fixture
+def capture():
+    capture = FakeCapture()
+    yield capture
+    capture.close()
+
+
+def start_reader(capture, timeout: float = 1.0) -> ThreadedCapture:
+    reader = ThreadedCapture(capture, buffer_size=2, timeout=timeout)
+    reader.start()
+    return reader
+
+
+def frame_number(frame) -> int:
+    return int(frame[1][0, 0])
+
+
+def wait_for_grabbed(reader, frames: int):
+    while reader.get_statistics()["grabbed"] < frames:
+        time.sleep(0.001)
+
+
+def test_blocking_read_returns_each_frame_once(capture):
+    reader = start_reader(capture)
+    for expected in range(1, 4):
+        capture.release_frames()
+        frame = reader.read(block=True)
+        assert frame_number(frame) == expected
+    assert reader.get_statistics() == dict(grabbed=3, consumed=3)
+
+
+def test_newest_frame_is_returned_and_older_ones_are_dropped(capture):
+    reader = start_reader(capture)
+    capture.release_frames(5)
+    wait_for_grabbed(reader, 5)
+    assert frame_number(reader.read()) == 5
+    assert reader.get_statistics() == dict(grabbed=5, consumed=1)
+
+
+def test_non_blocking_read_repeats_the_newest_frame(capture):
+    reader = start_reader(capture)
+    capture.release_frames()
+    wait_for_grabbed(reader, 1)
+    first = reader.read(block=False)
+    second = reader.read(block=False)
+    assert frame_number(first) == frame_number(second) == 1
+    assert reader.get_statistics()["consumed"] == 1
+
+
+def test_blocking_read_times_out_without_new_frames(capture):
+    reader = start_reader(capture, timeout=0.05)
+    capture.release_frames()
+    assert frame_number(reader.read()) == 1
+    start = time.time()
+    assert reader.read(block=True) is None
+    assert time.time() - start >= 0.05
+
+
+def test_read_returns_none_when_the_camera_stops(capture):
+    reader = start_reader(capture)
+    capture.release_frames()
+    assert frame_number(reader.read()) == 1
+    capture.close()
+    assert reader.read(block=True) is None
+    reader.stop()
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    """
+    Short video in which frame n has the brightness 20 * n
+    """
+    path = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for frame_number in range(VIDEO_FRAMES):
+        writer.write(np.full((48, 64, 3), 20 * frame_number, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def collect_decoded(output_q, frame_buffer) -> list:
+    decoded = []
+    while True:
+        item = output_q.get_nowait()
+        if item is None:
+            return decoded
+        frame_ref, timestamp = item
+        decoded.append((read_frame(frame_buffer, frame_ref).copy(), timestamp))
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_decode_video_delivers_every_frame_in_order(video_path, shared):
+    frame_buffer = FrameRingBuffer((24, 32, 3), slots=VIDEO_FRAMES) if shared else None
+    output_q = queue.Queue()
+    try:
+        decode_video(video_path, (32, 24), output_q, frame_buffer)
+        decoded = collect_decoded(output_q, frame_buffer)
+    finally:
+        if frame_buffer is not None:
+            frame_buffer.release()
+
+    assert len(decoded) == VIDEO_FRAMES
+    for frame_number, (frame, timestamp) in enumerate(decoded):
+        assert frame.shape == (24, 32, 3)
+        assert abs(int(frame.mean()) - 20 * frame_number) <= 3
+        # position in the video at 10 fps
+        assert timestamp == pytest.approx((frame_number + 1) / 10, abs=0.11)
+    timestamps = [timestamp for _, timestamp in decoded]
+    assert timestamps == sorted(timestamps)
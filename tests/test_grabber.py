@@ -0,0 +1,148 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import queue
+import threading
+import time
+
+import pytest
+
+from utils.grabber import MultiDeviceGrabber
+
+
+class FakeDevice:
+    """
+    Grab function delivering the (timestamp, frame) tuples put into it, None stops the device
+    """
+
+    def __init__(self):
+        self.frames = queue.Queue()
+
+    def __call__(self) -> tuple:
+        frame = self.frames.get()
+        if frame is None:
+            raise RuntimeError("device stopped")
+        return frame
+
+
+@pytest.fixture
+def devices():
+    devices = {"A": FakeDevice(), "B": FakeDevice()}
+    yield devices
+    for device in devices.values():
+        device.frames.put(None)
+
+
+def start_grabber(devices, **kwargs) -> MultiDeviceGrabber:
+    grabber = MultiDeviceGrabber(devices, **kwargs)
+    grabber.start()
+    return grabber
+
+
+def send(grabber, devices, **frames):
+    """
+    Pass frames to the devices and wait until they were grabbed
+    :param frames: device name and list of (timestamp, frame)
+    """
+    expected = {
+        device: statistics["grabbed"] + len(frames.get(device, []))
+        for device, statistics in grabber.get_statistics()["devices"].items()
+    }
+    for device, device_frames in frames.items():
+        for frame in device_frames:
+            devices[device].frames.put(frame)
+    deadline = time.time() + 5
+    while any(
+        grabber.get_statistics()["devices"][device]["grabbed"] < count
+        for device, count in expected.items()
+    ):
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+
+def deliver_later(device, frame, delay: float = 0.1):
+    timer = threading.Timer(delay, device.frames.put, args=(frame,))
+    timer.start()
+
+
+def test_frames_closest_to_the_slowest_device_are_combined(devices):
+    grabber = start_grabber(devices, tolerance=0.01)
+    send(grabber, devices, A=[(0.0, "a0"), (0.033, "a1")], B=[(0.002, "b0")])
+    assert grabber.get_frameset() == {"A": (0.0, "a0"), "B": (0.002, "b0")}
+    assert grabber.last_skew == pytest.approx(0.002)
+
+    # a1 was not used yet and is combined with the next frame of B
+    send(grabber, devices, B=[(0.034, "b1")])
+    assert grabber.get_frameset() == {"A": (0.033, "a1"), "B": (0.034, "b1")}
+    statistics = grabber.get_statistics()
+    assert statistics["framesets"] == 2
+    assert statistics["misaligned"] == 0
+    assert statistics["devices"]["A"] == dict(grabbed=2, consumed=2)
+    assert statistics["max_skew"] == pytest.approx(2.0)
+    grabber.stop()
+
+
+def test_earliest_frame_is_dropped_once_if_frames_are_too_far_apart(devices):
+    grabber = start_grabber(devices, tolerance=0.01, timeout=2.0)
+    send(grabber, devices, A=[(0.0, "a0")], B=[(0.02, "b0")])
+    # the next frame of A, which fits to B, arrives while the grabber waits
+    deliver_later(devices["A"], (0.021, "a1"))
+    assert grabber.get_frameset() == {"A": (0.021, "a1"), "B": (0.02, "b0")}
+    assert grabber.get_statistics()["misaligned"] == 0
+    grabber.stop()
+
+
+def test_frameset_outside_the_tolerance_is_counted(devices):
+    grabber = start_grabber(devices, tolerance=0.01, timeout=2.0)
+    send(grabber, devices, A=[(0.0, "a0")], B=[(0.1, "b0")])
+    deliver_later(devices["A"], (0.05, "a1"))
+    frameset = grabber.get_frameset()
+    assert frameset == {"A": (0.05, "a1"), "B": (0.1, "b0")}
+    assert grabber.get_statistics()["misaligned"] == 1
+    assert grabber.last_skew == pytest.approx(0.05)
+    grabber.stop()
+
+
+def test_only_the_newest_frames_are_kept(devices):
+    grabber = start_grabber(devices, tolerance=0.01, buffer_size=1)
+    send(
+        grabber,
+        devices,
+        A=[(0.0, "a0"), (0.033, "a1"), (0.066, "a2")],
+        B=[(0.067, "b2")],
+    )
+    assert grabber.get_frameset() == {"A": (0.066, "a2"), "B": (0.067, "b2")}
+    grabber.stop()
+
+
+def test_failed_device_is_reported(devices):
+    grabber = start_grabber(devices, tolerance=0.01)
+    send(grabber, devices, A=[(0.0, "a0")])
+    devices["B"].frames.put(None)
+    assert grabber.get_frameset() is None
+    device, error = grabber.get_failure()
+    assert device == "B"
+    assert isinstance(error, RuntimeError)
+    grabber.stop()
+
+
+def test_missing_frames_time_out(devices):
+    grabber = start_grabber(devices, tolerance=0.01, timeout=0.05)
+    send(grabber, devices, A=[(0.0, "a0")])
+    assert grabber.get_frameset() is None
+    assert grabber.get_failure() is None
+    grabber.stop()
+
+
+def test_errors_after_stop_are_ignored(devices):
+    grabber = start_grabber(devices, tolerance=0.01)
+    grabber.stop()
+    for device in devices.values():
+        device.frames.put(None)
+    grabber.join()
+    assert grabber.get_failure() is None
@@ -0,0 +1,57 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import numpy as np
+
+from utils.poser import find_local_peaks_array
+
+
+def make_maps(height: int = 20, width: int = 20, joints: int = 2):
+    scoremap = np.zeros((height, width, joints), dtype=np.float32)
+    local_reference = np.zeros((height, width, joints, 2), dtype=np.float32)
+    return scoremap, local_reference
+
+
+def test_peaks_of_each_joint_sorted_by_score():
+    scoremap, local_reference = make_maps()
+    scoremap[2, 3, 0] = 0.6
+    scoremap[15, 12, 0] = 0.9
+    scoremap[10, 10, 1] = 0.8
+    peaks = find_local_peaks_array(scoremap, local_reference, animal_number=2, stride=8)
+    assert peaks.shape == (2, 2, 3)
+    # x, y on the image and score
+    np.testing.assert_allclose(peaks[0], [[100, 124, 0.9], [28, 20, 0.6]])
+    np.testing.assert_allclose(peaks[1, 0], [84, 84, 0.8])
+    # the second joint has only one peak
+    assert np.isnan(peaks[1, 1]).all()
+
+
+def test_flat_top_is_a_single_peak():
+    scoremap, local_reference = make_maps(joints=1)
+    scoremap[5:7, 8:10, 0] = 0.7
+    peaks = find_local_peaks_array(scoremap, local_reference, animal_number=3, stride=8)
+    found = peaks[0][~np.isnan(peaks[0, :, 2])]
+    assert len(found) == 1
+    # the first pixel of the flat top
+    np.testing.assert_allclose(found[0], [68, 44, 0.7])
+
+
+def test_separate_flat_tops_are_kept():
+    scoremap, local_reference = make_maps(joints=1)
+    scoremap[2:4, 2:4, 0] = 0.5
+    scoremap[14:16, 14:16, 0] = 0.5
+    peaks = find_local_peaks_array(scoremap, local_reference, animal_number=2, stride=8)
+    assert not np.isnan(peaks).any()
+    assert sorted(map(tuple, peaks[0, :, :2])) == [(20, 20), (116, 116)]
+
+
+def test_peaks_below_threshold_are_ignored():
+    scoremap, local_reference = make_maps(joints=1)
+    scoremap[4, 4, 0] = 0.05
+    peaks = find_local_peaks_array(scoremap, local_reference, animal_number=1, stride=8)
+    assert np.isnan(peaks).all()
@@ -0,0 +1,98 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import numpy as np
+import pytest
+
+from utils.poseframe import PoseFrame
+from utils.postprocessing import handle_missing
+
+BODYPARTS = ("nose", "neck", "tail")
+NAN = np.nan
+
+
+def make_pose_frame() -> PoseFrame:
+    """
+    Three animals, only the second one misses a coordinate
+    """
+    pose = np.array(
+        [
+            [(10, 11, 0.9), (12, 13, 0.9), (14, 15, 0.9)],
+            [(20, 21, 0.9), (NAN, 23, 0.1), (24, 25, 0.9)],
+            [(30, 31, 0.9), (32, 33, 0.9), (34, 35, 0.9)],
+        ]
+    )
+    return PoseFrame.from_pose(pose, BODYPARTS)
+
+
+def test_skip_removes_only_the_incomplete_skeleton():
+    pose_frame = make_pose_frame()
+    handled = handle_missing(pose_frame, "skip")
+    assert len(handled) == 2
+    assert handled[0]["nose"] == (10, 11)
+    assert handled[1]["nose"] == (30, 31)
+    assert np.array_equal(handled.data, pose_frame.data[[0, 2]])
+
+
+def test_skip_removes_consecutive_incomplete_skeletons():
+    # the old loop removed skeletons while iterating and missed the one after a removed skeleton
+    pose_frame = make_pose_frame().copy()
+    pose_frame.pose[2, 0] = NAN
+    handled = handle_missing(pose_frame, "skip")
+    assert len(handled) == 1
+    assert handled[0]["tail"] == (14, 15)
+
+
+def test_null_sets_only_missing_coordinates_to_zero():
+    pose_frame = make_pose_frame()
+    handled = handle_missing(pose_frame, "null")
+    assert len(handled) == 3
+    assert handled[1]["neck"] == (0.0, 23)
+    assert handled[1]["nose"] == (20, 21)
+    assert np.array_equal(handled.pose[[0, 2]], pose_frame.pose[[0, 2]])
+    assert np.array_equal(handled.likelihood, pose_frame.likelihood)
+
+
+def test_pass_keeps_missing_coordinates():
+    pose_frame = make_pose_frame()
+    handled = handle_missing(pose_frame, "pass")
+    assert handled == pose_frame
+    assert np.isnan(handled.pose[1, 1, 0])
+
+
+def test_reset_sets_only_the_incomplete_skeleton_to_nan():
+    pose_frame = make_pose_frame()
+    handled = handle_missing(pose_frame, "reset")
+    assert len(handled) == 3
+    assert np.isnan(handled.pose[1]).all()
+    assert np.array_equal(handled.pose[[0, 2]], pose_frame.pose[[0, 2]])
+
+
+@pytest.mark.parametrize("method", ["skip", "null", "pass", "reset"])
+def test_complete_frames_are_not_changed(method):
+    pose_frame = make_pose_frame().select([0, 2])
+    assert handle_missing(pose_frame, method) is pose_frame
+
+
+@pytest.mark.parametrize("method", ["skip", "null", "reset"])
+def test_input_is_not_changed(method):
+    pose_frame = make_pose_frame()
+    original = pose_frame.copy()
+    handle_missing(pose_frame, method)
+    assert pose_frame == original
+
+
+def test_unknown_method_removes_incomplete_skeletons():
+    handled = handle_missing(make_pose_frame(), "unknown")
+    assert [skeleton["nose"] for skeleton in handled] == [(10, 11), (30, 31)]
+
+
+def test_empty_frame():
+    pose_frame = PoseFrame.empty(BODYPARTS)
+    for method in ("skip", "null", "pass", "reset"):
+        assert len(handle_missing(pose_frame, method)) == 0
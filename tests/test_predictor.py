@@ -0,0 +1,44 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import math
+
+import pytest
+
+from utils.predictor import SkeletonPredictor
+
+NAN = float("nan")
+
+
+def test_constant_velocity_is_extrapolated():
+    predictor = SkeletonPredictor(process_noise=0.1, measurement_noise=0.1)
+    for index in range(10):
+        predictor.correct([{"nose": (10.0 + 2 * index, 50.0)}], index)
+    x, y = predictor.predict(12)[0]["nose"]
+    assert x == pytest.approx(34.0, abs=0.5)
+    assert y == pytest.approx(50.0, abs=0.5)
+
+
+def test_bodypart_missing_in_first_frame_is_not_predicted_at_origin():
+    predictor = SkeletonPredictor()
+    predictor.correct([{"nose": (10.0, 20.0), "tail": (NAN, NAN)}], 0)
+    predicted = predictor.predict(1)[0]
+    assert predicted["nose"] == pytest.approx((10.0, 20.0))
+    assert all(math.isnan(value) for value in predicted["tail"])
+
+    # the first measurement of the bodypart is taken as it is
+    predictor.correct([{"nose": (10.0, 20.0), "tail": (300.0, 400.0)}], 2)
+    assert predictor.predict(3)[0]["tail"] == pytest.approx((300.0, 400.0))
+
+
+def test_prediction_stops_after_horizon():
+    predictor = SkeletonPredictor(horizon=3)
+    predictor.correct([{"nose": (1.0, 2.0)}], 5)
+    assert len(predictor.predict(8)) == 1
+    assert len(predictor.predict(9)) == 0
+    assert len(predictor.predict(4)) == 0
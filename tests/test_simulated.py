@@ -0,0 +1,140 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from utils.generic import MissingFrameError
+from utils.simulated import MovingBlobs, SimulatedCamera, SimulatedCameraManager
+
+
+def test_blobs_depend_only_on_the_frame_number():
+    blobs = MovingBlobs((64, 48), blobs=3, seed=1, key="test blobs")
+    other = MovingBlobs((64, 48), blobs=3, seed=1, key="test other blobs")
+    assert np.array_equal(blobs.get_frame(5), other.get_frame(5))
+    assert not np.array_equal(blobs.get_frame(5).copy(), blobs.get_frame(6))
+
+
+def test_blobs_stay_inside_the_frame():
+    blobs = MovingBlobs((64, 48), blobs=5, seed=2)
+    for frame_number in range(0, 1000, 7):
+        positions = blobs.positions(frame_number)
+        assert positions.shape == (5, 2)
+        assert (positions >= 0).all()
+        assert (positions <= (64, 48)).all()
+
+
+class CountingSource:
+    """
+    Frame source returning the frame number instead of an image
+    """
+
+    def get_frame(self, frame_number: int) -> int:
+        return frame_number
+
+
+class SlowSource(CountingSource):
+    """
+    Frame source that takes a while to render each frame
+    """
+
+    def __init__(self, render_time: float):
+        self._render_time = render_time
+
+    def get_frame(self, frame_number: int) -> int:
+        time.sleep(self._render_time)
+        return frame_number
+
+
+@pytest.fixture
+def start_camera():
+    cameras = []
+
+    def start(*args, **kwargs) -> SimulatedCamera:
+        camera = SimulatedCamera(*args, **kwargs)
+        camera.start()
+        cameras.append(camera)
+        return camera
+
+    yield start
+    for camera in cameras:
+        camera.stop()
+
+
+def test_camera_delivers_frames_on_its_clock(start_camera):
+    camera = start_camera(CountingSource(), framerate=100)
+    readings = [camera.read() for _ in range(5)]
+    assert [frame for _, frame in readings] == [0, 1, 2, 3, 4]
+    timestamps = np.array([timestamp for timestamp, _ in readings])
+    assert np.allclose(np.diff(timestamps), 0.01)
+    statistics = camera.get_statistics()
+    assert statistics["consumed"] == 5
+    assert statistics["grabbed"] >= 5
+
+
+def test_camera_drops_frames_of_a_slow_reader(start_camera):
+    camera = start_camera(CountingSource(), framerate=100)
+    camera.read()
+    time.sleep(0.055)
+    timestamp, frame_number = camera.read()
+    # the newest frame that was taken until now is delivered, the frames before are dropped
+    assert frame_number >= 5
+    assert timestamp <= time.time()
+    statistics = camera.get_statistics()
+    assert statistics["consumed"] == 2
+    assert statistics["grabbed"] >= frame_number + 1
+
+
+def test_frames_are_rendered_in_the_background(start_camera):
+    camera = start_camera(SlowSource(0.05), framerate=10)
+    time.sleep(0.15)
+    # the frame was rendered while nobody was reading, so it is delivered without waiting for the rendering
+    start = time.time()
+    camera.read()
+    assert time.time() - start < 0.02
+
+
+def test_jitter_keeps_frames_in_order(start_camera):
+    camera = start_camera(CountingSource(), framerate=200, jitter=0.004, seed=3)
+    timestamps = [camera.read()[0] for _ in range(20)]
+    assert timestamps == sorted(timestamps)
+    assert not np.allclose(np.diff(timestamps), 0.005)
+
+
+def test_stopped_camera_raises_missing_frame(start_camera):
+    camera = start_camera(CountingSource(), framerate=100, timeout=0.1)
+    camera.read()
+    camera.stop()
+    with pytest.raises(MissingFrameError):
+        camera.read()
+
+
+def test_manager_delivers_frames_of_all_cameras(capsys):
+    manager = SimulatedCameraManager(cameras=2, pattern="blobs", jitter=0)
+    manager.enable_stream((64, 48), 100)
+    manager.enable_all_devices()
+    assert list(manager.get_enabled_devices()) == manager.get_connected_devices()
+
+    color_frames, depth_maps, infra_frames = manager.get_frames()
+    assert list(color_frames) == ["Simulated 0", "Simulated 1"]
+    assert all(frame.shape == (48, 64, 3) for frame in color_frames.values())
+    assert depth_maps == {} and infra_frames == {}
+    # the cameras use different seeds
+    assert not np.array_equal(color_frames["Simulated 0"], color_frames["Simulated 1"])
+    assert set(manager.get_timestamps()) == set(color_frames)
+
+    manager.stop()
+    assert "Capture of Simulated 0: " in capsys.readouterr().out
+    assert manager.get_enabled_devices() == {}
+
+
+def test_manager_rejects_unknown_patterns():
+    with pytest.raises(ValueError):
+        SimulatedCameraManager(pattern="noise")
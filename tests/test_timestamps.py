@@ -0,0 +1,90 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import pickle
+
+import numpy as np
+import pytest
+
+from utils.analysis import calculate_elapsed_frames
+from utils.grabber import DeviceClock
+from utils.poseframe import PoseFrame, get_timestamp
+from utils.postprocessing import FlattenAnimals, MissingHandler, Smoothing, SplitAnimals
+
+BODYPARTS = ("nose", "neck", "tail", "tailbase")
+
+
+def make_pose_frame(timestamp=None) -> PoseFrame:
+    return PoseFrame(np.zeros((1, 4, 3), dtype=np.float32), BODYPARTS, timestamp)
+
+
+def test_device_clock_keeps_the_camera_intervals():
+    clock = DeviceClock(ticks_per_second=1000)
+    # the first frame sets the offset between the clocks
+    assert clock.to_host(5000, 100.0) == 100.0
+    # later frames arrive with varying delay, but keep the interval of the camera clock
+    assert clock.to_host(5033, 100.045) == pytest.approx(100.033)
+    assert clock.to_host(5066, 100.070) == pytest.approx(100.066)
+
+
+def test_device_clock_resyncs_after_a_reset():
+    clock = DeviceClock(ticks_per_second=1e9, max_delay=1.0)
+    clock.to_host(50e9, 100.0)
+    # the camera clock restarted, the mapped time would be far in the past
+    assert clock.to_host(0.01e9, 100.5) == 100.5
+    assert clock.to_host(0.02e9, 100.52) == pytest.approx(100.51)
+
+
+def test_device_clock_never_maps_after_the_arrival():
+    clock = DeviceClock(ticks_per_second=1000)
+    clock.to_host(0, 100.0)
+    # the camera clock runs faster than the host clock
+    assert clock.to_host(200, 100.1) == 100.1
+
+
+def test_timestamp_is_kept_through_pickling_and_copies():
+    pose_frame = make_pose_frame(12.5)
+    assert pickle.loads(pickle.dumps(pose_frame)).timestamp == 12.5
+    assert pose_frame.copy().timestamp == 12.5
+    assert pose_frame.select([0]).timestamp == 12.5
+    assert pose_frame[0].timestamp == 12.5
+    assert pose_frame[:1].timestamp == 12.5
+    assert [skeleton.timestamp for skeleton in pose_frame] == [12.5]
+
+
+@pytest.mark.parametrize(
+    "stage", [SplitAnimals(2), FlattenAnimals(), MissingHandler("null"), Smoothing(0.5)]
+)
+def test_timestamp_is_kept_by_the_postprocessing(stage):
+    pose_frame = make_pose_frame(12.5)
+    pose_frame.pose[0, 0] = np.nan
+    assert stage(pose_frame).timestamp == 12.5
+
+
+def test_get_timestamp_of_legacy_skeletons():
+    assert get_timestamp({"nose": (1, 2)}) is None
+    assert get_timestamp(make_pose_frame(3.0)[0]) == 3.0
+
+
+def test_elapsed_frames_from_capture_times():
+    previous, current = make_pose_frame(10.0)[0], make_pose_frame(10.1)[0]
+    assert calculate_elapsed_frames(previous, current, 30) == pytest.approx(3.0)
+    # positions in a video work the same way
+    assert calculate_elapsed_frames(
+        make_pose_frame(0.5), make_pose_frame(0.6), 10
+    ) == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize(
+    "previous_time, current_time", [(None, 10.1), (10.0, None), (10.1, 10.0), (5.0, 0.0)]
+)
+def test_elapsed_frames_fall_back_to_one(previous_time, current_time):
+    previous = make_pose_frame(previous_time)[0]
+    current = make_pose_frame(current_time)[0]
+    assert calculate_elapsed_frames(previous, current, 30) == 1.0
+    assert calculate_elapsed_frames({"nose": (1, 2)}, current, 30) == 1.0
@@ -0,0 +1,38 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import json
+
+from utils.tracing import FrameTracer
+
+
+def test_old_events_are_dropped_but_tracks_stay_named(tmp_path):
+    tracer = FrameTracer(max_events=4)
+    for index in range(10):
+        tracer.add_stage("capture", index, index + 0.5, frame=index)
+    tracer.add_span("inference", "camera:9", 9.0, 9.4)
+    assert tracer.dropped == 8
+    assert len(tracer) == 2 + 4
+
+    path = tmp_path / "trace.json"
+    tracer.save(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    track_names = [event["args"]["name"] for event in events if event["ph"] == "M"]
+    assert track_names == ["main loop", "inference"]
+    stages = [event for event in events if event["ph"] == "X"]
+    assert [event["args"]["frame"] for event in stages] == [8, 9]
+    assert stages[-1]["ts"] == 9e6
+    assert stages[-1]["dur"] == 0.5e6
+
+
+def test_unbounded_tracer_keeps_all_events():
+    tracer = FrameTracer()
+    for index in range(100):
+        tracer.add_stage("capture", index, index + 0.5)
+    assert tracer.dropped == 0
+    assert len(tracer) == 101
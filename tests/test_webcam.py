@@ -0,0 +1,124 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import base64
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+zmq = pytest.importorskip("zmq")
+
+import utils.webcam as webcam
+from utils.configloader import PORT, RESOLUTION
+from utils.generic import MissingFrameError
+from utils.webcam import (
+    FRAME_HEADER,
+    WebCamManager,
+    detect_transport,
+    pack_frame,
+    unpack_frame,
+)
+
+
+def encode(value: int) -> np.ndarray:
+    _, jpeg = cv2.imencode(".jpg", np.full((48, 64, 3), value, dtype=np.uint8))
+    return jpeg
+
+
+def test_frame_header_round_trip():
+    jpeg = encode(100)
+    message = pack_frame(42, 1234.5678, jpeg)
+    assert len(message) == FRAME_HEADER.size + jpeg.size
+    frame_id, timestamp, received_jpeg = unpack_frame(message)
+    assert frame_id == 42
+    assert timestamp == 1234.5678
+    assert np.array_equal(received_jpeg, jpeg.reshape(-1))
+
+
+def test_transport_is_detected_from_the_message():
+    jpeg = encode(100)
+    assert detect_transport(pack_frame(0, time.time(), jpeg)) == "binary"
+    assert detect_transport(base64.b64encode(jpeg.tobytes())) == "base64"
+    assert detect_transport(b"") == "base64"
+
+
+@pytest.fixture
+def sender():
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    socket.connect("tcp://localhost:" + PORT)
+    yield socket
+    socket.close(linger=0)
+    context.term()
+
+
+def receive(manager, sender, message, timeout: float = 5.0):
+    """
+    Send a message until the manager received a frame, subscribers miss messages until they are connected
+    """
+    deadline = time.time() + timeout
+    while True:
+        sender.send(message)
+        try:
+            return manager.get_frames()
+        except MissingFrameError:
+            if time.time() > deadline:
+                raise
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(webcam, "WEBCAM_TIMEOUT", 0.1)
+    manager = WebCamManager()
+    yield manager
+    manager.stop()
+
+
+@pytest.mark.parametrize("transport", ["binary", "auto"])
+def test_binary_frames_are_received(manager, sender, monkeypatch, transport):
+    monkeypatch.setattr(webcam, "WEBCAM_TRANSPORT", transport)
+    manager.enable_stream(RESOLUTION, 30)
+    color_frames, _, _ = receive(manager, sender, pack_frame(1, 1000.0, encode(100)))
+    frame = color_frames["webcam"]
+    assert frame.shape == (RESOLUTION[1], RESOLUTION[0], 3)
+    assert abs(int(frame.mean()) - 100) <= 3
+    assert manager.get_timestamps() == {"webcam": 1000.0}
+
+
+def test_legacy_base64_frames_are_detected(manager, sender, monkeypatch):
+    monkeypatch.setattr(webcam, "WEBCAM_TRANSPORT", "auto")
+    manager.enable_stream(RESOLUTION, 30)
+    start = time.time()
+    color_frames, _, _ = receive(
+        manager, sender, base64.b64encode(encode(200).tobytes())
+    )
+    assert abs(int(color_frames["webcam"].mean()) - 200) <= 3
+    # legacy frames are timed on arrival
+    assert manager.get_timestamps()["webcam"] >= start
+
+
+def test_undecodable_messages_are_reported(manager, sender, monkeypatch):
+    monkeypatch.setattr(webcam, "WEBCAM_TRANSPORT", "binary")
+    manager.enable_stream(RESOLUTION, 30)
+    with pytest.raises(MissingFrameError, match="could not be decoded"):
+        receive(manager, sender, base64.b64encode(encode(200).tobytes()), timeout=1.0)
+
+
+def test_stream_can_be_restarted(manager, sender, monkeypatch):
+    monkeypatch.setattr(webcam, "WEBCAM_TRANSPORT", "auto")
+    manager.enable_stream(RESOLUTION, 30)
+    receive(manager, sender, pack_frame(5, 1.0, encode(50)))
+    manager.stop()
+
+    manager.enable_stream(RESOLUTION, 30)
+    # frame ids of the new session start over
+    receive(manager, sender, pack_frame(0, 2.0, encode(150)))
+    assert manager.get_timestamps() == {"webcam": 2.0}
+    assert manager.get_capture_statistics()["webcam"]["consumed"] == 1
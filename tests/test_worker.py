@@ -0,0 +1,65 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import multiprocessing as mp
+import time
+
+from utils.worker import Heartbeat, run_worker, stop_worker
+
+
+def busy_worker(heartbeat: Heartbeat, duration: float):
+    heartbeat.start(interval=0.05)
+    # e.g. loading a model, nothing is received from the queue in the meantime
+    time.sleep(duration)
+
+
+def echo_worker(input_q: mp.Queue, output_q: mp.Queue, heartbeat: Heartbeat):
+    run_worker(input_q, output_q.put, heartbeat)
+    output_q.cancel_join_thread()
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_heartbeat_never_started():
+    heartbeat = Heartbeat()
+    assert not heartbeat.started()
+    assert not heartbeat.is_alive()
+
+
+def test_busy_worker_keeps_beating():
+    heartbeat = Heartbeat()
+    process = mp.Process(target=busy_worker, args=(heartbeat, 1.0))
+    process.start()
+    try:
+        assert wait_for(heartbeat.started)
+        time.sleep(0.5)
+        assert heartbeat.is_alive(timeout=0.25)
+    finally:
+        process.join(5)
+    # nothing beats once the process is gone
+    time.sleep(0.3)
+    assert not heartbeat.is_alive(timeout=0.25)
+
+
+def test_worker_handles_items_until_stopped():
+    input_q, output_q, heartbeat = mp.Queue(), mp.Queue(), Heartbeat()
+    process = mp.Process(target=echo_worker, args=(input_q, output_q, heartbeat))
+    process.start()
+    for item in range(3):
+        input_q.put(item)
+    assert [output_q.get(timeout=5) for _ in range(3)] == [0, 1, 2]
+    assert heartbeat.is_alive()
+    stop_worker(process, [input_q])
+    assert process.exitcode == 0
@@ -14,6 +14,8 @@ import numpy as np
 import pandas as pd
 import math
 
+from utils.poseframe import get_timestamp
+
 
 class ROI:
     """
@@ -133,6 +135,19 @@ def calculate_distance(point1: tuple, point2: tuple) -> float:
     return distance
 
 
+def calculate_elapsed_frames(previous_skeleton, skeleton, framerate: float) -> float:
+    """
+    Number of frames at framerate between the capture of two skeletons, e.g. to scale movements when frames were dropped
+    Only the difference of the capture times is used, so camera times and positions in a video both work
+    Returns 1 if a capture time is unknown or the skeletons are not in order (e.g. a repeated video)
+    """
+    previous_time = get_timestamp(previous_skeleton)
+    current_time = get_timestamp(skeleton)
+    if previous_time is None or current_time is None or current_time <= previous_time:
+        return 1.0
+    return (current_time - previous_time) * framerate
+
+
 def calculate_distance_for_bodyparts(
     dataframe: pd.DataFrame, body_parts: Union[List[str], str]
 ) -> List[pd.Series]:
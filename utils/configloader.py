@@ -106,6 +106,19 @@ ANIMALS_NUMBER = (
 PASS_SEPARATE = adv_dsc_config["Streaming"].getboolean("PASS_SEPARATE")
 
 REPEAT_VIDEO = adv_dsc_config["Video"].getboolean("REPEAT_VIDEO")
+OFFLINE_VIDEO = adv_dsc_config["Video"].getboolean("OFFLINE_VIDEO", fallback=False)
+PREFETCH_FRAMES = adv_dsc_config["Video"].getint("PREFETCH_FRAMES", fallback=32)
+
+WEBCAM_TRANSPORT = adv_dsc_config["IPWEBCAM"].get("TRANSPORT", fallback="auto")
+WEBCAM_DECODE_THREADS = adv_dsc_config["IPWEBCAM"].getint("DECODE_THREADS", fallback=2)
+WEBCAM_CONFLATE = adv_dsc_config["IPWEBCAM"].getboolean("CONFLATE", fallback=True)
+WEBCAM_TIMEOUT = adv_dsc_config["IPWEBCAM"].getfloat("RECEIVE_TIMEOUT", fallback=5.0)
+
+SIMULATED_CAMERAS = adv_dsc_config["Simulation"].getint("SIMULATED_CAMERAS", fallback=1)
+SIMULATION_PATTERN = adv_dsc_config["Simulation"].get("SIMULATION_PATTERN", fallback="blobs")
+SIMULATION_BLOBS = adv_dsc_config["Simulation"].getint("SIMULATION_BLOBS", fallback=3)
+SIMULATION_CLIP_FRAMES = adv_dsc_config["Simulation"].getint("SIMULATION_CLIP_FRAMES", fallback=300)
+SIMULATION_JITTER = adv_dsc_config["Simulation"].getfloat("SIMULATION_JITTER", fallback=0.0)
 CROP = adv_dsc_config["Streaming"].getboolean("CROP")
 CROP_X = [
     int(str(part).strip())
@@ -115,6 +128,14 @@ CROP_Y = [
     int(str(part).strip())
     for part in adv_dsc_config["Streaming"].get("CROP_Y").split(",")
 ]
+DYNAMIC_CROP = adv_dsc_config["Streaming"].getboolean("DYNAMIC_CROP", fallback=False)
+DYNAMIC_CROP_PADDING = adv_dsc_config["Streaming"].getint("DYNAMIC_CROP_PADDING", fallback=50)
+THREADED_CAPTURE = adv_dsc_config["Streaming"].getboolean("THREADED_CAPTURE", fallback=False)
+CAPTURE_BUFFER = adv_dsc_config["Streaming"].getint("CAPTURE_BUFFER", fallback=2)
+CAPTURE_BLOCKING = adv_dsc_config["Streaming"].getboolean("CAPTURE_BLOCKING", fallback=True)
+FRAME_POOL = adv_dsc_config["Streaming"].getboolean("FRAME_POOL", fallback=False)
+PARALLEL_CAPTURE = adv_dsc_config["Streaming"].getboolean("PARALLEL_CAPTURE", fallback=False)
+ALIGNMENT_TOLERANCE = adv_dsc_config["Streaming"].getfloat("ALIGNMENT_TOLERANCE", fallback=10.0)
 
 USE_DLSTREAM_POSTURE_DETECTION = adv_dsc_config["Pose Estimation"].getboolean("USE_DLSTREAM_POSTURE_DETECTION")
 FLATTEN_MA = adv_dsc_config["Pose Estimation"].getboolean("FLATTEN_MA")
@@ -122,3 +143,29 @@ SPLIT_MA = adv_dsc_config["Pose Estimation"].getboolean("SPLIT_MA")
 HANDLE_MISSING = adv_dsc_config["Pose Estimation"].get("HANDLE_MISSING")
 FILTER_LIKELIHOOD = adv_dsc_config["Pose Estimation"].getboolean("FILTER_LIKELIHOOD")
 LIKELIHOOD_THRESHOLD = adv_dsc_config["Pose Estimation"].getfloat("LIKELIHOOD_THRESHOLD")
+ONNX_THREADS = adv_dsc_config["Pose Estimation"].getint("ONNX_THREADS", fallback=0)
+PREDICT_SKELETONS = adv_dsc_config["Pose Estimation"].getboolean("PREDICT_SKELETONS", fallback=False)
+PREDICTION_PROCESS_NOISE = adv_dsc_config["Pose Estimation"].getfloat("PREDICTION_PROCESS_NOISE", fallback=1.0)
+PREDICTION_MEASUREMENT_NOISE = adv_dsc_config["Pose Estimation"].getfloat("PREDICTION_MEASUREMENT_NOISE", fallback=2.0)
+PREDICTION_HORIZON = adv_dsc_config["Pose Estimation"].getint("PREDICTION_HORIZON", fallback=15)
+REPLAY_LATENCY = adv_dsc_config["Pose Estimation"].getfloat("REPLAY_LATENCY", fallback=0.02)
+SMOOTHING_FACTOR = adv_dsc_config["Pose Estimation"].getfloat("SMOOTHING_FACTOR", fallback=0.0)
+TRACK_IDENTITIES = adv_dsc_config["Pose Estimation"].getboolean("TRACK_IDENTITIES", fallback=False)
+TRACKING_MAX_DISTANCE = adv_dsc_config["Pose Estimation"].getfloat("TRACKING_MAX_DISTANCE", fallback=100.0)
+
+SHARED_MEMORY = adv_dsc_config["Multiprocessing"].getboolean("SHARED_MEMORY", fallback=True)
+INFERENCE_WORKERS = adv_dsc_config["Multiprocessing"].getint("INFERENCE_WORKERS", fallback=1)
+if INFERENCE_WORKERS < 1:
+    raise ValueError(f"INFERENCE_WORKERS has to be at least 1, got {INFERENCE_WORKERS}.")
+BATCH_CAMERAS = adv_dsc_config["Multiprocessing"].getboolean("BATCH_CAMERAS", fallback=False)
+ADMISSION_POLICY = adv_dsc_config["Multiprocessing"].get("ADMISSION_POLICY", fallback="skip")
+if OFFLINE_VIDEO and STREAMING_SOURCE == "video":
+    # offline analysis of videos has to be lossless
+    ADMISSION_POLICY = "queue"
+QUEUE_DEPTH = adv_dsc_config["Multiprocessing"].getint("QUEUE_DEPTH", fallback=4)
+ADMIT_EVERY = adv_dsc_config["Multiprocessing"].getint("ADMIT_EVERY", fallback=2)
+if ADMIT_EVERY < 1:
+    raise ValueError(f"ADMIT_EVERY has to be at least 1, got {ADMIT_EVERY}.")
+
+TRACING = adv_dsc_config["Tracing"].getboolean("TRACING", fallback=False)
+TRACE_EVENTS = adv_dsc_config["Tracing"].getint("TRACE_EVENTS", fallback=300000)
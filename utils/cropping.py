@@ -0,0 +1,81 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import numpy as np
+
+from utils.poseframe import PoseFrame
+
+
+class DynamicCropper:
+    """
+    Crops each frame of a camera to the region around the skeletons found in the previous analysed frame
+    Falls back to the full frame when not all animals were found completely (tracking is lost),
+    so a missing animal is not cropped out and can be found again
+    """
+
+    def __init__(
+        self, frame_shape: tuple, padding: int, step: int = 32, skeletons: int = 1
+    ):
+        """
+        :param frame_shape: shape of the full frames (height, width, ...)
+        :param padding: pixels added around the bounding box of the skeletons
+        :param step: crop width and height are rounded up to multiples of step,
+            so the model sees few different input sizes and the network stride fits
+        :param skeletons: number of skeletons expected when all animals were found
+        """
+        self._frame_height, self._frame_width = frame_shape[:2]
+        self._padding = padding
+        self._step = step
+        self._skeletons = skeletons
+        self._box = None
+
+    @property
+    def box(self):
+        """
+        Current crop box as (x_min, y_min, x_max, y_max) or None if full frames are analysed
+        """
+        return self._box
+
+    def crop(self, frame: np.ndarray) -> tuple:
+        """
+        Cut the current crop box out of the frame
+        :param frame: full frame
+        :return: cropped frame (view on the full frame) or full frame if tracking is lost
+            and the (x, y) offset of the crop, to map the results back to full frame coordinates
+        """
+        if self._box is None:
+            return frame, (0, 0)
+        x_min, y_min, x_max, y_max = self._box
+        return frame[y_min:y_max, x_min:x_max], (x_min, y_min)
+
+    def update(self, skeletons: list):
+        """
+        Set the crop box for the next frames from the skeletons in full frame coordinates
+        :param skeletons: list of skeletons of the last analysed frame
+        """
+        pose = PoseFrame.from_skeletons(skeletons).pose
+        if len(pose) != self._skeletons or np.isnan(pose).any():
+            # an animal or bodypart is missing and might be outside of the crop, search the full frame again
+            self._box = None
+            return
+        points = pose.reshape(-1, 2)
+
+        (x_min, y_min), (x_max, y_max) = points.min(axis=0), points.max(axis=0)
+        width = self._round_up(x_max - x_min + 2 * self._padding, self._frame_width)
+        height = self._round_up(y_max - y_min + 2 * self._padding, self._frame_height)
+        if width >= self._frame_width and height >= self._frame_height:
+            self._box = None
+            return
+
+        # centering the crop on the skeletons while keeping it inside the frame
+        x_start = int(np.clip((x_min + x_max - width) / 2, 0, self._frame_width - width))
+        y_start = int(np.clip((y_min + y_max - height) / 2, 0, self._frame_height - height))
+        self._box = (x_start, y_start, x_start + width, y_start + height)
+
+    def _round_up(self, size: float, limit: int) -> int:
+        return min(int(np.ceil(size / self._step)) * self._step, limit)
@@ -0,0 +1,116 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import queue
+from collections import deque
+
+# what happens to new frames while the pose estimation processes are busy, see advanced_settings.ini
+ADMISSION_POLICIES = ("skip", "latest", "queue", "every_k")
+
+
+class ReorderBuffer:
+    """
+    Releases analysis results in the order their frames were sent to analysis
+    Needed when several pose estimation processes work on the frames of one camera and finish out of order
+    """
+
+    def __init__(self, max_pending: int):
+        """
+        :param max_pending: number of results that may wait for a missing earlier result
+            if more results are waiting, the missing one is considered lost (e.g. its process died) and skipped
+        """
+        self._max_pending = max_pending
+        self._expected = deque()
+        self._expected_set = set()
+        self._results = {}
+
+    def expect(self, index: int):
+        """
+        Register a frame index that was sent to analysis
+        """
+        self._expected.append(index)
+        self._expected_set.add(index)
+
+    def add(self, index: int, result):
+        """
+        Store the analysis result for a frame index
+        Results for indices that were never registered or already skipped are ignored
+        """
+        if index in self._expected_set:
+            self._results[index] = result
+
+    def pop_ready(self) -> tuple:
+        """
+        Take all results that are ready to be released in order
+        :return: list of (index, result) tuples sorted by frame index
+            and list of indices that were skipped because their result is considered lost
+        """
+        ready = []
+        skipped = []
+        while self._expected:
+            head = self._expected[0]
+            if head in self._results:
+                ready.append((head, self._results.pop(head)))
+            elif len(self._results) <= self._max_pending:
+                # waiting for the earliest frame to finish
+                break
+            else:
+                skipped.append(head)
+            self._expected.popleft()
+            self._expected_set.discard(head)
+        return ready, skipped
+
+    def discard(self, index: int):
+        """
+        Stop waiting for a frame index, e.g. because the frame was replaced before it was analysed
+        """
+        if index in self._expected_set:
+            self._expected.remove(index)
+            self._expected_set.discard(index)
+            self._results.pop(index, None)
+
+    def __len__(self) -> int:
+        """
+        Number of frames that are still in analysis or waiting to be released
+        """
+        return len(self._expected)
+
+
+def count_skipped(previous_index: int, index: int, every: int) -> int:
+    """
+    Number of frames between two analysed frames that were not admitted on purpose by the every_k policy
+    :param previous_index: index of the previous analysed frame
+    :param index: index of the analysed frame
+    :param every: only frames with an index divisible by every are admitted
+    """
+    gap = index - previous_index - 1
+    admitted = (index - 1) // every - previous_index // every
+    return gap - admitted
+
+
+def pass_to_worker(worker: dict, make_item, wait: bool = False, replace: bool = False):
+    """
+    Passing an item to the input queue of a worker process according to an admission policy
+    :param worker: worker dictionary with its "input" queue
+    :param make_item: function creating the queue item, takes the pending item that is replaced (or None)
+    :param wait: wait until the queue has room instead of giving up
+    :param replace: take the pending item out of a full queue and put the new one instead
+    :return: tuple of whether the item was passed and the replaced item (or None)
+    """
+    input_q = worker["input"]
+    replaced = None
+    if input_q.full() and replace:
+        try:
+            replaced = input_q.get_nowait()
+        except queue.Empty:
+            # the worker took the pending item in the meantime or it is not flushed into the queue yet
+            pass
+    if input_q.full() and not wait:
+        return False, replaced
+    input_q.put(make_item(replaced))
+    return True, replaced
@@ -0,0 +1,270 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import threading
+
+import numpy as np
+
+from utils.configloader import FRAME_POOL
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # shared memory is only available from python 3.8 onwards, frames will be passed through the queues instead
+    shared_memory = None
+
+
+class FrameRingBuffer:
+    """
+    Ring buffer of preallocated frame slots in shared memory
+    The main process copies each frame into the next free slot and only passes the slot index to the worker process,
+    which reads the frame as a numpy view without any pickling
+    """
+
+    def __init__(self, shape: tuple, slots: int, dtype=np.uint8, name: str = None):
+        """
+        Creating a new shared memory block or attaching to an existing one
+        :param shape: shape of a single frame, e.g. (height, width, 3)
+        :param slots: number of frame slots in the ring
+            needs to be larger than the number of frames that can be in flight at the same time
+        :param dtype: data type of the frames
+        :param name: name of an existing shared memory block to attach to, creates a new block if None
+        """
+        self._shape = tuple(shape)
+        self._slots = slots
+        self._dtype = np.dtype(dtype)
+        self._owner = name is None
+        if self._owner:
+            size = int(np.prod(self._shape)) * self._dtype.itemsize * self._slots
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self._frames = np.ndarray(
+            (self._slots, *self._shape), dtype=self._dtype, buffer=self._shm.buf
+        )
+        self._next_slot = 0
+
+    def __reduce__(self):
+        """
+        Worker processes attach to the same shared memory block by name instead of receiving a copy
+        """
+        return (
+            self.__class__,
+            (self._shape, self._slots, self._dtype.str, self._shm.name),
+        )
+
+    @property
+    def shape(self) -> tuple:
+        return self._shape
+
+    def fits(self, frame: np.ndarray) -> bool:
+        """
+        Check if frame can be stored in a slot of this buffer
+        """
+        return frame.shape == self._shape and frame.dtype == self._dtype
+
+    def put(self, frame: np.ndarray, slot: int = None) -> int:
+        """
+        Copy frame into the next slot of the ring
+        :param frame: frame in the shape and dtype of the buffer
+        :param slot: (optional) overwrite this slot instead, e.g. of a frame that was replaced before it was read
+        :return: index of the slot the frame was written to
+        """
+        if slot is None:
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self._slots
+        np.copyto(self._frames[slot], frame)
+        return slot
+
+    def get(self, slot: int) -> np.ndarray:
+        """
+        Zero-copy view on the frame stored in slot
+        The view is only valid until the slot is overwritten, so copy it if it needs to be kept
+        """
+        return self._frames[slot]
+
+    def release(self):
+        """
+        Close the shared memory block and free it, if this buffer created it
+        """
+        # the numpy view needs to be dropped before the underlying buffer can be closed
+        self._frames = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class BufferPool:
+    """
+    Preallocated frame buffers that are reused for every frame instead of allocating new arrays
+    Buffers are given out with acquire() and passed as dst to OpenCV calls or filled with np.copyto.
+    Whoever acquires a buffer owns it until release() is called, further users can keep it with retain().
+    A buffer is only given out again after every owner released it, release() also accepts views on a buffer.
+    Frames that are not from the pool can be passed to retain() and release() as well, they are ignored
+    Buffers can be acquired and released from several threads (e.g. capture threads and the main loop)
+    Counts the bytes that still had to be allocated, to find avoidable allocations per frame
+    """
+
+    def __init__(self, reuse: bool = True, max_buffers: int = 32):
+        """
+        :param reuse: if False, every acquire() allocates a new array and is only counted
+        :param max_buffers: maximum number of buffers kept for each key,
+            if all of them are in use, new arrays are allocated without pooling them
+        """
+        self._reuse = reuse
+        self._max_buffers = max_buffers
+        self._buffers = {}
+        # number of owners of every pooled buffer by id of the buffer
+        self._owners = {}
+        self._lock = threading.Lock()
+        # bytes allocated since the last end_frame() and statistics over all frames
+        self._frame_bytes = 0
+        self._total_bytes = 0
+        self._max_frame_bytes = 0
+        self._frames = 0
+
+    def _get_free(self, buffers: list, shape: tuple, dtype) -> np.ndarray:
+        for buffer in buffers:
+            if not self._owners[id(buffer)]:
+                if buffer.shape == shape and buffer.dtype == dtype:
+                    return buffer
+        return None
+
+    def acquire(self, key, shape: tuple, dtype=np.uint8) -> np.ndarray:
+        """
+        Get a buffer that was released by all owners or allocate a new one
+        :param key: owner of the buffer, e.g. (camera, "capture")
+        :param shape: shape of the buffer
+        :param dtype: data type of the buffer
+        :return: np.array with undefined content, owned by the caller until it is released
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self._lock:
+            buffers = self._buffers.setdefault(key, [])
+            if self._reuse:
+                buffer = self._get_free(buffers, shape, dtype)
+                if buffer is not None:
+                    self._owners[id(buffer)] = 1
+                    return buffer
+            buffer = np.empty(shape, dtype=dtype)
+            self._frame_bytes += buffer.nbytes
+            if self._reuse:
+                if len(buffers) >= self._max_buffers:
+                    # dropping free buffers of another shape (e.g. after a change of resolution) to make room
+                    for old in buffers:
+                        if not self._owners[id(old)]:
+                            del self._owners[id(old)]
+                    buffers[:] = [old for old in buffers if id(old) in self._owners]
+                if len(buffers) < self._max_buffers:
+                    buffers.append(buffer)
+                    self._owners[id(buffer)] = 1
+            return buffer
+
+    @staticmethod
+    def _get_base(frame) -> np.ndarray:
+        """
+        Array owning the memory of a frame, e.g. the buffer a cropped view was taken from
+        """
+        while isinstance(frame, np.ndarray) and isinstance(frame.base, np.ndarray):
+            frame = frame.base
+        return frame
+
+    def retain(self, frame):
+        """
+        Keep the buffer of a frame from being given out again until release() is called once more
+        :param frame: buffer of the pool, view on it or any other frame (ignored)
+        """
+        buffer_id = id(self._get_base(frame))
+        with self._lock:
+            if buffer_id in self._owners:
+                self._owners[buffer_id] += 1
+
+    def release(self, frame):
+        """
+        Give back the buffer of a frame, it is reused once all owners released it
+        :param frame: buffer of the pool, view on it or any other frame (ignored)
+        """
+        buffer_id = id(self._get_base(frame))
+        with self._lock:
+            if self._owners.get(buffer_id):
+                self._owners[buffer_id] -= 1
+
+    def in_use(self) -> int:
+        """
+        Number of pooled buffers that were not released by all owners
+        """
+        with self._lock:
+            return sum(1 for owners in self._owners.values() if owners)
+
+    def record_allocation(self, nbytes: int):
+        """
+        Count an allocation in the frame path that was not made by the pool
+        """
+        with self._lock:
+            self._frame_bytes += nbytes
+
+    def end_frame(self) -> int:
+        """
+        Finish the allocation count of the current frame
+        :return: bytes allocated for the frame
+        """
+        with self._lock:
+            frame_bytes = self._frame_bytes
+            self._frame_bytes = 0
+        self._total_bytes += frame_bytes
+        self._max_frame_bytes = max(self._max_frame_bytes, frame_bytes)
+        self._frames += 1
+        return frame_bytes
+
+    def get_statistics(self) -> dict:
+        """
+        Bytes allocated per frame over all finished frames
+        :return: dictionary with number of frames, mean and maximum bytes per frame
+        """
+        return dict(
+            frames=self._frames,
+            mean=self._total_bytes / self._frames if self._frames else 0.0,
+            max=self._max_frame_bytes,
+        )
+
+
+# frame buffers shared by the camera managers, DLStream and plotting in the main process
+frame_pool = BufferPool(reuse=FRAME_POOL)
+
+
+def shared_memory_available() -> bool:
+    return shared_memory is not None
+
+
+def write_frame(frame_buffer, frame: np.ndarray, replaced_ref=None):
+    """
+    Store a frame for a worker process
+    Frames that do not fit into the buffer (or if there is no buffer) are passed as they are
+    :param frame_buffer: FrameRingBuffer or None
+    :param frame: frame to pass
+    :param replaced_ref: (optional) reference of a frame that was never read, its slot is reused
+    :return: frame reference to put into the queue, either a slot index or the frame itself
+    """
+    if frame_buffer is not None and frame_buffer.fits(frame):
+        if isinstance(replaced_ref, (int, np.integer)):
+            return frame_buffer.put(frame, slot=replaced_ref)
+        return frame_buffer.put(frame)
+    return frame
+
+
+def read_frame(frame_buffer, frame_ref) -> np.ndarray:
+    """
+    Resolve a frame reference created by write_frame()
+    :param frame_buffer: FrameRingBuffer or None
+    :param frame_ref: slot index or frame
+    :return: frame
+    """
+    if frame_buffer is not None and isinstance(frame_ref, (int, np.integer)):
+        return frame_buffer.get(frame_ref)
+    return frame_ref
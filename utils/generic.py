@@ -6,6 +6,10 @@ https://github.com/SchwarzNeuroconLab/DeepLabStream
 Licensed under GNU General Public License v3.0
 """
 import time
+import threading
+import multiprocessing as mp
+from collections import deque
+
 import cv2
 import numpy as np
 
@@ -15,6 +19,19 @@ from utils.configloader import (
     RESOLUTION,
     FRAMERATE,
     REPEAT_VIDEO,
+    THREADED_CAPTURE,
+    CAPTURE_BUFFER,
+    CAPTURE_BLOCKING,
+    OFFLINE_VIDEO,
+    PREFETCH_FRAMES,
+    SHARED_MEMORY,
+)
+from utils.framebuffer import (
+    FrameRingBuffer,
+    frame_pool,
+    shared_memory_available,
+    write_frame,
+    read_frame,
 )
 
 
@@ -23,6 +40,85 @@ class MissingFrameError(Exception):
     to stop dlstream gracefully"""
 
 
+class ThreadedCapture:
+    """
+    Reads an opencv capture in a background thread, so the main loop does not wait for the camera
+    The newest frames are kept with their timestamps in a small ring buffer, older ones are dropped,
+    which also keeps the driver buffer from filling up
+    """
+
+    def __init__(self, capture, buffer_size: int = 2, timeout: float = 5.0):
+        """
+        :param capture: opened cv2.VideoCapture
+        :param buffer_size: number of frames kept in the ring buffer
+        :param timeout: time in seconds to wait for a frame before the camera is considered lost
+        """
+        self._capture = capture
+        self._frames = deque(maxlen=max(buffer_size, 1))
+        self._timeout = timeout
+        self._condition = threading.Condition()
+        self._running = False
+        self._failed = False
+        self._thread = None
+        self._grabbed = 0
+        self._consumed = 0
+        # number of the last frame returned by read
+        self._last_read = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            ret, image = self._capture.read()
+            timestamp = time.time()
+            with self._condition:
+                if not ret:
+                    self._failed = True
+                    self._condition.notify_all()
+                    break
+                self._grabbed += 1
+                self._frames.append((self._grabbed, timestamp, image))
+                self._condition.notify_all()
+
+    def read(self, block: bool = True) -> tuple:
+        """
+        Newest frame of the ring buffer
+        :param block: if True, wait for a frame that was not returned before,
+            otherwise the newest frame is returned immediately, even if it was returned before
+        :return: (timestamp, frame) or None if the camera stopped delivering frames
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._failed
+                or (self._frames and (not block or self._frames[-1][0] > self._last_read)),
+                timeout=self._timeout,
+            ):
+                return None
+            if not self._frames or (block and self._frames[-1][0] <= self._last_read):
+                return None
+            number, timestamp, image = self._frames[-1]
+            if number > self._last_read:
+                self._consumed += 1
+                self._last_read = number
+            return timestamp, image
+
+    def get_statistics(self) -> dict:
+        """
+        Frames grabbed from the camera and consumed by read, the difference was dropped
+        """
+        with self._condition:
+            return dict(grabbed=self._grabbed, consumed=self._consumed)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=self._timeout)
+            self._thread = None
+
+
 class GenericManager:
     """
     Camera manager class for generic (not specified) cameras
@@ -37,6 +133,12 @@ class GenericManager:
         self._manager_name = "generic"
         self._enabled_devices = {}
         self._camera = None
+        # background reader of the camera, if THREADED_CAPTURE is used
+        self._reader = None
+        # shape of the captured frames, known after the first frame
+        self._frame_shape = None
+        # capture time of the last frames
+        self._timestamps = {}
         # Will be called when enabling stream! Important for restart of stream
         # self._camera = cv2.VideoCapture(int(self._source))
         self._camera_name = "Camera {}".format(self._source)
@@ -63,6 +165,28 @@ class GenericManager:
         self._camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
         self._camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
         self._camera.set(cv2.CAP_PROP_FPS, framerate)
+        if THREADED_CAPTURE:
+            self._reader = ThreadedCapture(self._camera, CAPTURE_BUFFER)
+            self._reader.start()
+
+    def read_frame(self) -> tuple:
+        """
+        Read the next frame of the capture into a reused buffer of the frame pool
+        :return: tuple of success and frame, the frame is owned by the caller (see BufferPool)
+        """
+        buffer = (
+            frame_pool.acquire((self._camera_name, "capture"), self._frame_shape)
+            if self._frame_shape is not None
+            else None
+        )
+        ret, image = self._camera.read(buffer)
+        if not ret or image is not buffer:
+            frame_pool.release(buffer)
+        if ret and image is not buffer:
+            # first frame or changed frame shape
+            frame_pool.record_allocation(image.nbytes)
+            self._frame_shape = image.shape
+        return ret, image
 
     def enable_device(self, *args):
         """
@@ -85,9 +209,16 @@ class GenericManager:
         color_frames = {}
         depth_maps = {}
         infra_frames = {}
-        ret, image = self._camera.read()
+        if self._reader is not None:
+            frame = self._reader.read(block=CAPTURE_BLOCKING)
+            ret, image = (True, frame[1]) if frame is not None else (False, None)
+            timestamp = frame[0] if frame is not None else None
+        else:
+            ret, image = self.read_frame()
+            timestamp = time.time()
         if ret:
             color_frames[self._camera_name] = image
+            self._timestamps = {self._camera_name: timestamp}
         else:
             raise MissingFrameError(
                 "No frame was received from the camera. Make sure that the camera is connected "
@@ -96,10 +227,34 @@ class GenericManager:
 
         return color_frames, depth_maps, infra_frames
 
+    def get_timestamps(self) -> dict:
+        """
+        Capture time of the frames of the last get_frames() call in seconds (time.time())
+        or the position in the video for videos
+        :return: dictionary {camera: timestamp}
+        """
+        return dict(self._timestamps)
+
+    def get_capture_statistics(self) -> dict:
+        """
+        Frames grabbed and consumed by the background reader of each camera (empty without THREADED_CAPTURE)
+        """
+        if self._reader is None:
+            return {}
+        return {self._camera_name: self._reader.get_statistics()}
+
     def stop(self):
         """
         Stops camera
         """
+        if self._reader is not None:
+            self._reader.stop()
+            print(
+                "Capture of {}: {grabbed} frames grabbed, {consumed} consumed".format(
+                    self._camera_name, **self._reader.get_statistics()
+                )
+            )
+            self._reader = None
         self._camera.release()
         self._enabled_devices = {}
 
@@ -107,6 +262,35 @@ class GenericManager:
         return self._manager_name
 
 
+def decode_video(path: str, resolution: tuple, output_q, frame_buffer=None):
+    """
+    Process decoding a video as fast as the output queue is emptied
+    :param path: path to the video
+    :param resolution: (width, height) the frames are resized to
+    :param output_q: bounded queue receiving the frame references with the position of the frame in the video
+        in seconds, None marks the end of the video
+    :param frame_buffer: shared memory FrameRingBuffer the frames are written to, frames are passed directly if None
+    """
+    capture = cv2.VideoCapture(path)
+    width, height = resolution
+    # frames are copied into the shared memory, so the same buffers are used for every frame
+    # without shared memory, the queue pickles the frames later and they need to stay untouched
+    reuse = frame_buffer is not None
+    raw = None
+    resized = np.empty((height, width, 3), dtype=np.uint8) if reuse else None
+    while True:
+        ret, raw = capture.read(raw if reuse else None)
+        if not ret:
+            break
+        image = raw
+        if image.shape[1::-1] != tuple(resolution):
+            image = cv2.resize(raw, resolution, dst=resized)
+        timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        output_q.put((write_frame(frame_buffer, image), timestamp))
+    capture.release()
+    output_q.put(None)
+
+
 class VideoManager(GenericManager):
 
     """
@@ -124,33 +308,132 @@ class VideoManager(GenericManager):
         self._camera_name = "Video"
         self.initial_wait = False
         self.last_frame_time = time.time()
+        # decoding process, queue and frame buffer of the offline mode
+        self._decoder = None
+        self._frames_count = 0
+        self._first_frame_time = None
+        self._last_decoded_time = None
 
     def enable_stream(self, resolution, framerate, *args):
         """
         Enable one stream with given parameters
         (hopefully)
         """
+        if OFFLINE_VIDEO:
+            self.start_decoder()
+            return
         # set video to first frame
         self._camera = cv2.VideoCapture(VIDEO_SOURCE)
         self._camera.set(cv2.CAP_PROP_POS_FRAMES, 0)
 
+    def start_decoder(self):
+        """
+        Start decoding the video in a separate process, PREFETCH_FRAMES frames are decoded in advance
+        """
+        width, height = RESOLUTION
+        # besides the queued frames, one is read by the main loop and one is written by the decoder
+        frame_buffer = (
+            FrameRingBuffer((height, width, 3), slots=PREFETCH_FRAMES + 2)
+            if SHARED_MEMORY and shared_memory_available()
+            else None
+        )
+        frame_q = mp.Queue(maxsize=PREFETCH_FRAMES)
+        process = mp.Process(
+            target=decode_video,
+            args=(VIDEO_SOURCE, RESOLUTION, frame_q, frame_buffer),
+            daemon=True,
+        )
+        process.start()
+        self._decoder = dict(process=process, queue=frame_q, frames=frame_buffer)
+        self._frames_count = 0
+        self._first_frame_time = None
+        self._last_decoded_time = None
+
+    def get_decoded_frames(self) -> tuple:
+        """
+        Next frame of the decoding process without waiting for FRAMERATE
+        :return: tuple of three dictionaries: color, depth, infrared
+        """
+        item = self._decoder["queue"].get()
+        if item is None:
+            raise MissingFrameError("The video reached the end.")
+        frame_ref, timestamp = item
+        self._last_decoded_time = time.time()
+        if self._first_frame_time is None:
+            self._first_frame_time = self._last_decoded_time
+        self._frames_count += 1
+        frame = read_frame(self._decoder["frames"], frame_ref)
+        if self._decoder["frames"] is not None:
+            # the slot is written again by the decoder, so the frame is copied
+            image = frame_pool.acquire((self._camera_name, "capture"), frame.shape)
+            np.copyto(image, frame)
+        else:
+            image = frame
+        self._timestamps = {self._camera_name: timestamp}
+        return {self._camera_name: image}, {}, {}
+
+    def get_throughput(self) -> float:
+        """
+        Frames per second delivered in the offline mode
+        """
+        if self._first_frame_time is None or self._frames_count < 2:
+            return 0.0
+        return (self._frames_count - 1) / (
+            self._last_decoded_time - self._first_frame_time
+        )
+
+    def stop(self):
+        """
+        Stops video and the decoding process
+        """
+        if self._decoder is None:
+            super().stop()
+            return
+        print(
+            "Read {} frames of the video at {:.1f} frames per second".format(
+                self._frames_count, self.get_throughput()
+            )
+        )
+        self._decoder["process"].terminate()
+        self._decoder["process"].join()
+        self._decoder["queue"].close()
+        if self._decoder["frames"] is not None:
+            self._decoder["frames"].release()
+        self._decoder = None
+        self._enabled_devices = {}
+
     def get_frames(self) -> tuple:
         """
         Collect frames for camera and outputs it in 'color' dictionary
         ***depth and infrared are not used here***
         :return: tuple of three dictionaries: color, depth, infrared
         """
+        if self._decoder is not None:
+            return self.get_decoded_frames()
 
         color_frames = {}
         depth_maps = {}
         infra_frames = {}
-        ret, image = self._camera.read()
+        ret, image = self.read_frame()
         self.last_frame_time = time.time()
         if ret:
+            # position in the video instead of the time the frame was read
+            self._timestamps = {
+                self._camera_name: self._camera.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            }
             if not self.initial_wait:
                 cv2.waitKey(1000)
                 self.initial_wait = True
-            image = cv2.resize(image, RESOLUTION)
+            if image.shape[1::-1] != tuple(RESOLUTION):
+                resized = cv2.resize(
+                    image,
+                    RESOLUTION,
+                    dst=frame_pool.acquire(
+                        (self._camera_name, "resize"), (RESOLUTION[1], RESOLUTION[0], 3)
+                    ),
+                )
+                frame_pool.release(image)
+                image = resized
             color_frames[self._camera_name] = image
             running_time = time.time() - self.last_frame_time
             if running_time <= 1 / FRAMERATE:
@@ -0,0 +1,226 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class DeviceClock:
+    """
+    Maps the timestamps of a camera clock to the clock of DLStream (time.time())
+    The offset between both clocks is taken from the first frame, so the intervals between frames
+    come from the camera. The offset is taken again, if the mapped time is later than the arrival of the frame
+    or more than max_delay before it, e.g. after the camera clock was reset
+    """
+
+    def __init__(self, ticks_per_second: float = 1e9, max_delay: float = 1.0):
+        """
+        :param ticks_per_second: frequency of the camera clock
+        :param max_delay: maximum time in seconds between taking a frame and its arrival
+        """
+        self._seconds_per_tick = 1 / ticks_per_second
+        self._max_delay = max_delay
+        self._offset = None
+
+    def to_host(self, device_timestamp: float, arrival_time: float) -> float:
+        """
+        :param device_timestamp: timestamp of the frame in ticks of the camera clock
+        :param arrival_time: time.time() when the frame arrived
+        :return: time the frame was taken in the clock of DLStream
+        """
+        seconds = device_timestamp * self._seconds_per_tick
+        if self._offset is not None:
+            timestamp = seconds + self._offset
+            if arrival_time - self._max_delay <= timestamp <= arrival_time:
+                return timestamp
+        self._offset = arrival_time - seconds
+        return arrival_time
+
+
+class MultiDeviceGrabber:
+    """
+    Grabs several cameras at the same time, each in its own thread, instead of one after another
+    The newest frames of each camera are kept with their timestamps and combined into framesets
+    of frames that were taken at (almost) the same time
+    """
+
+    def __init__(
+        self,
+        grab_functions: dict,
+        tolerance: float = 0.01,
+        buffer_size: int = 3,
+        timeout: float = 5.0,
+    ):
+        """
+        :param grab_functions: dictionary {device: function} with a function for each device
+            that blocks until the next frame arrived and returns (timestamp, frame)
+        :param tolerance: maximum time difference in seconds between the frames of one frameset
+        :param buffer_size: number of frames kept for each device to choose from
+        :param timeout: time in seconds to wait for a frameset before the cameras are considered lost
+        """
+        self._grab_functions = grab_functions
+        self._tolerance = tolerance
+        self._timeout = timeout
+        self._frames = {
+            device: deque(maxlen=max(buffer_size, 1)) for device in grab_functions
+        }
+        self._condition = threading.Condition()
+        self._running = False
+        self._failed = None
+        self._threads = []
+        # number of the last grabbed and the last used frame of each device
+        self._grabbed = dict.fromkeys(grab_functions, 0)
+        self._last_used = dict.fromkeys(grab_functions, 0)
+        self._consumed = dict.fromkeys(grab_functions, 0)
+        # skew statistics over all framesets
+        self._framesets = 0
+        self._misaligned = 0
+        self._total_skew = 0.0
+        self._max_skew = 0.0
+        self.last_skew = 0.0
+
+    def start(self):
+        self._running = True
+        for device, grab in self._grab_functions.items():
+            thread = threading.Thread(
+                target=self._run,
+                args=(device, grab),
+                name="grabber {}".format(device),
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self, device, grab):
+        while self._running:
+            try:
+                timestamp, frame = grab()
+            except Exception as e:
+                # errors after stop() are expected, e.g. because the camera stopped grabbing
+                with self._condition:
+                    if self._running:
+                        self._failed = device, e
+                    self._condition.notify_all()
+                break
+            with self._condition:
+                self._grabbed[device] += 1
+                self._frames[device].append((self._grabbed[device], timestamp, frame))
+                self._condition.notify_all()
+
+    def _has_new_frames(self) -> bool:
+        return self._failed is not None or all(
+            frames and frames[-1][0] > self._last_used[device]
+            for device, frames in self._frames.items()
+        )
+
+    def _align(self) -> tuple:
+        """
+        Pick the frame of each device closest to the newest frame of the device that is behind the most
+        :return: dictionary {device: (number, timestamp, frame)} and the skew of the frameset in seconds
+        """
+        reference = min(frames[-1][1] for frames in self._frames.values())
+        frameset = {}
+        for device, frames in self._frames.items():
+            candidates = [entry for entry in frames if entry[0] > self._last_used[device]]
+            frameset[device] = min(candidates, key=lambda entry: abs(entry[1] - reference))
+        timestamps = [timestamp for _, timestamp, _ in frameset.values()]
+        return frameset, max(timestamps) - min(timestamps)
+
+    def get_frameset(self) -> dict:
+        """
+        Wait for a new frame of every device and combine them by timestamp
+        If the frames are further apart than the tolerance, the earliest frame is dropped once
+        and replaced by the next frame of that device
+        :return: dictionary {device: (timestamp, frame)} or None if a device failed or timed out
+        """
+        with self._condition:
+            for attempt in range(2):
+                if (
+                    not self._condition.wait_for(self._has_new_frames, timeout=self._timeout)
+                    or self._failed is not None
+                ):
+                    return None
+                frameset, skew = self._align()
+                if skew <= self._tolerance:
+                    break
+                if attempt == 0:
+                    earliest = min(frameset, key=lambda device: frameset[device][1])
+                    self._last_used[earliest] = frameset[earliest][0]
+            else:
+                self._misaligned += 1
+
+            for device, (number, _, _) in frameset.items():
+                self._last_used[device] = number
+                self._consumed[device] += 1
+            self._framesets += 1
+            self._total_skew += skew
+            self._max_skew = max(self._max_skew, skew)
+            self.last_skew = skew
+            return {
+                device: (timestamp, frame)
+                for device, (_, timestamp, frame) in frameset.items()
+            }
+
+    def get_failure(self) -> tuple:
+        """
+        Device and exception that stopped grabbing, None if all devices are running
+        """
+        return self._failed
+
+    def get_statistics(self) -> dict:
+        """
+        Frames grabbed and consumed for each device and the skew between the frames of the framesets in ms
+        """
+        with self._condition:
+            return dict(
+                devices={
+                    device: dict(
+                        grabbed=self._grabbed[device], consumed=self._consumed[device]
+                    )
+                    for device in self._grab_functions
+                },
+                framesets=self._framesets,
+                misaligned=self._misaligned,
+                mean_skew=self._total_skew / self._framesets * 1000
+                if self._framesets
+                else 0.0,
+                max_skew=self._max_skew * 1000,
+            )
+
+    def print_statistics(self):
+        statistics = self.get_statistics()
+        for device, device_statistics in statistics["devices"].items():
+            print(
+                "Capture of {}: {grabbed} frames grabbed, {consumed} consumed".format(
+                    device, **device_statistics
+                )
+            )
+        if len(statistics["devices"]) > 1:
+            print(
+                "Inter-camera skew: {mean_skew:.2f} ms on average, {max_skew:.2f} ms at most, "
+                "{misaligned} of {framesets} framesets outside the tolerance".format(
+                    **statistics
+                )
+            )
+
+    def stop(self):
+        """
+        Stop the grabbing threads, call before stopping the cameras so errors of stopped cameras are ignored
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+    def join(self):
+        """
+        Wait for the grabbing threads, call after stopping the cameras so blocking grabs return
+        """
+        for thread in self._threads:
+            thread.join(timeout=self._timeout)
+        self._threads = []
@@ -9,6 +9,8 @@ Licensed under GNU General Public License v3.0
 import cv2
 import numpy as np
 
+from utils.poseframe import get_points
+
 
 def plot_dots(image, coordinates, color, cond=False):
     """
@@ -21,12 +23,17 @@ def plot_dots(image, coordinates, color, cond=False):
     return image
 
 
-def plot_bodyparts(image, skeletons):
+def plot_bodyparts(image, skeletons, out=None):
     """
     Takes the image and skeletons list to plot them
+    :param out: (optional) preallocated array in the shape of image the result is written to
     :return: resulting image
     """
-    res_image = image.copy()
+    if out is None:
+        res_image = image.copy()
+    else:
+        res_image = out
+        np.copyto(res_image, image)
     # predefined colors list
     colors_list = [
         (0, 0, 255),
@@ -58,27 +65,22 @@ def plot_bodyparts(image, skeletons):
     # color = (255, 0, 0)
 
     for num, animal in enumerate(skeletons):
-        bodyparts = animal.keys()
-        bp_count = len(bodyparts)
-        # colors = dict(zip(bodyparts, colors_list[:bp_count]))
-        for part in animal:
-            # check for NaNs and skip
-            if not any(np.isnan(animal[part])):
-                plot_dots(res_image, tuple(map(int, animal[part])), colors_list[num])
-                # plot_dots(res_image, tuple(animal[part]), colors[part])
-            else:
-                pass
+        points = get_points(animal, animal.keys())
+        # check for NaNs and skip
+        for point in points[~np.isnan(points).any(axis=1)]:
+            plot_dots(res_image, tuple(map(int, point)), colors_list[num])
     return res_image
 
 
 def plot_metadata_frame(
-    image, frame_width, frame_height, current_fps, current_elapsed_time
+    image, frame_width, frame_height, current_fps, current_elapsed_time, copy=True
 ):
     """
     Takes the image and plots metadata
+    :param copy: if False, the metadata is plotted on image itself, e.g. if it is already a copy
     :return: resulting image
     """
-    res_image = image.copy()
+    res_image = image.copy() if copy else image
     font = cv2.FONT_HERSHEY_PLAIN
 
     cv2.putText(
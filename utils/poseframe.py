@@ -0,0 +1,267 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+
+import numpy as np
+
+
+class SkeletonError(Exception):
+    """Custom expection to be raised when issues with the skeleton is not received"""
+
+
+@lru_cache(maxsize=None)
+def bodypart_index(bodyparts: tuple) -> dict:
+    """
+    Name to index map of a bodypart layout, shared by all skeletons with the same bodyparts
+    :param bodyparts: tuple of bodypart names
+    :return: dictionary {bodypart: index}
+    """
+    return {bp: num for num, bp in enumerate(bodyparts)}
+
+
+@lru_cache(maxsize=None)
+def _row_columns(layout: tuple) -> tuple:
+    """
+    DataOutput columns ("AnimalN", bodypart, "x"/"y") of a PoseFrame layout in the order of its array
+    """
+    return tuple(
+        (f"Animal{num + 1}", bp, coordinate)
+        for num, bodyparts in enumerate(layout)
+        for bp in bodyparts
+        for coordinate in ("x", "y")
+    )
+
+
+class SkeletonView(Mapping):
+    """
+    dict-compatible view on one animal of a PoseFrame in style {bp1: (x, y), bp2: (x2, y2) ...}
+    Reading and setting bodyparts works on the array of the PoseFrame, no copy is made
+    """
+
+    __slots__ = ("_data", "_bodyparts", "_index", "timestamp")
+
+    def __init__(self, data: np.ndarray, bodyparts: tuple, timestamp: float = None):
+        """
+        :param data: array of the animal in shape (bodyparts, 3) with [X, Y, Likelihood]
+        :param bodyparts: tuple of bodypart names
+        :param timestamp: (optional) capture time of the frame in seconds, see PoseFrame
+        """
+        self._data = data
+        self._bodyparts = bodyparts
+        self._index = bodypart_index(bodyparts)
+        self.timestamp = timestamp
+
+    def __getitem__(self, bodypart) -> tuple:
+        return tuple(self._data[self._index[bodypart], :2].tolist())
+
+    def __setitem__(self, bodypart, coordinates):
+        self._data[self._index[bodypart], :2] = coordinates
+
+    def __iter__(self):
+        return iter(self._bodyparts)
+
+    def __len__(self) -> int:
+        return len(self._bodyparts)
+
+    def __contains__(self, bodypart) -> bool:
+        return bodypart in self._index
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def copy(self) -> dict:
+        """Copy as plain skeleton dictionary, like dict.copy() of a legacy skeleton"""
+        return dict(self)
+
+    @property
+    def bodyparts(self) -> tuple:
+        return self._bodyparts
+
+    @property
+    def pose(self) -> np.ndarray:
+        """(X, Y) of all bodyparts as view in shape (bodyparts, 2)"""
+        return self._data[:, :2]
+
+    @property
+    def likelihood(self) -> np.ndarray:
+        """Likelihood of all bodyparts, NaN if the pose estimation did not provide it"""
+        return self._data[:, 2]
+
+    def points(self, bodyparts) -> np.ndarray:
+        """
+        (X, Y) of the selected bodyparts
+        :param bodyparts: list of bodypart names
+        :return: np.array in shape (len(bodyparts), 2)
+        """
+        return self._data[[self._index[bp] for bp in bodyparts], :2]
+
+
+class PoseFrame(Sequence):
+    """
+    Skeletons of all animals in one frame, backed by a single float32 array in shape (animals, bodyparts, 3)
+    with [X, Y, Likelihood] for each bodypart
+    Behaves like the legacy list of skeleton dictionaries: indexing and iterating return SkeletonViews
+    """
+
+    def __init__(self, data: np.ndarray, bodyparts: tuple, timestamp: float = None):
+        """
+        :param data: array in shape (animals, bodyparts, 3), converted to float32 if necessary
+        :param bodyparts: tuple of bodypart names shared by all animals
+            or tuple with one tuple of bodypart names per animal (e.g. split skeletons)
+        :param timestamp: (optional) capture time of the frame in seconds, as given by the camera manager:
+            time.time() when a camera took the frame, but the position in the video for videos.
+            Only differences between timestamps of one source are meaningful, do not compare them with time.time()
+        """
+        self.timestamp = timestamp
+        self._data = np.asarray(data, dtype=np.float32)
+        if self._data.ndim != 3 or self._data.shape[2] != 3:
+            raise ValueError(
+                f"PoseFrame data has to be in shape (animals, bodyparts, 3), not {self._data.shape}."
+            )
+        bodyparts = tuple(bodyparts)
+        if bodyparts and not isinstance(bodyparts[0], str):
+            self._layout = tuple(tuple(animal) for animal in bodyparts)
+        else:
+            self._layout = (bodyparts,) * len(self._data)
+        if len(self._layout) != len(self._data) or any(
+            len(animal) != self._data.shape[1] for animal in self._layout
+        ):
+            raise ValueError(
+                f"Bodyparts do not fit PoseFrame data in shape {self._data.shape}."
+            )
+
+    @classmethod
+    def from_skeletons(cls, skeletons) -> "PoseFrame":
+        """
+        Create a PoseFrame from legacy skeletons without likelihood
+        :param skeletons: list of skeleton dictionaries {bp1: (x, y), bp2: (x2, y2) ...}
+        """
+        if isinstance(skeletons, PoseFrame):
+            return skeletons
+        if not skeletons:
+            return cls.empty()
+        layout = tuple(tuple(skeleton.keys()) for skeleton in skeletons)
+        sizes = {len(bodyparts) for bodyparts in layout}
+        if len(sizes) > 1:
+            raise ValueError("Skeletons with different numbers of bodyparts can not share a PoseFrame.")
+        data = np.full((len(skeletons), sizes.pop(), 3), np.nan, dtype=np.float32)
+        data[:, :, :2] = [list(skeleton.values()) for skeleton in skeletons]
+        if all(bodyparts == layout[0] for bodyparts in layout):
+            return cls(data, layout[0])
+        return cls(data, layout)
+
+    @classmethod
+    def from_pose(cls, pose: np.ndarray, bodyparts: tuple) -> "PoseFrame":
+        """
+        Create a PoseFrame from pose estimation output
+        :param pose: np.array in shape (bodyparts, 2 or 3) for one animal or (animals, bodyparts, 2 or 3)
+        :param bodyparts: tuple of bodypart names
+        """
+        pose = np.asarray(pose, dtype=np.float32)
+        if pose.ndim == 2:
+            pose = pose[np.newaxis]
+        data = np.full((*pose.shape[:2], 3), np.nan, dtype=np.float32)
+        data[:, :, : pose.shape[2]] = pose[:, :, :3]
+        return cls(data, bodyparts)
+
+    @classmethod
+    def empty(cls, bodyparts: tuple = ()) -> "PoseFrame":
+        """PoseFrame without any animal"""
+        return cls(np.empty((0, len(bodyparts), 3), dtype=np.float32), bodyparts)
+
+    @property
+    def data(self) -> np.ndarray:
+        """Underlying array in shape (animals, bodyparts, 3)"""
+        return self._data
+
+    @property
+    def pose(self) -> np.ndarray:
+        """(X, Y) of all animals as view in shape (animals, bodyparts, 2)"""
+        return self._data[:, :, :2]
+
+    @property
+    def likelihood(self) -> np.ndarray:
+        """Likelihood of all animals in shape (animals, bodyparts), NaN if not provided"""
+        return self._data[:, :, 2]
+
+    @property
+    def layout(self) -> tuple:
+        """Tuple with the bodypart names of each animal"""
+        return self._layout
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return PoseFrame(self._data[item], self._layout[item], self.timestamp)
+        return SkeletonView(self._data[item], self._layout[item], self.timestamp)
+
+    def __iter__(self):
+        for data, bodyparts in zip(self._data, self._layout):
+            yield SkeletonView(data, bodyparts, self.timestamp)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PoseFrame):
+            return self._layout == other._layout and np.array_equal(
+                self._data, other._data, equal_nan=True
+            )
+        if isinstance(other, list):
+            return [dict(skeleton) for skeleton in self] == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PoseFrame({[dict(skeleton) for skeleton in self]})"
+
+    def __reduce__(self):
+        return PoseFrame, (self._data, self._layout, self.timestamp)
+
+    def copy(self) -> "PoseFrame":
+        return PoseFrame(self._data.copy(), self._layout, self.timestamp)
+
+    def select(self, animals) -> "PoseFrame":
+        """
+        PoseFrame with a subset of the animals
+        :param animals: boolean mask or indices of the animals to keep
+        """
+        indices = np.arange(len(self))[animals]
+        return PoseFrame(
+            self._data[indices],
+            tuple(self._layout[num] for num in indices),
+            self.timestamp,
+        )
+
+    def to_skeletons(self) -> list:
+        """Legacy list of skeleton dictionaries"""
+        return [dict(skeleton) for skeleton in self]
+
+    def to_row(self) -> dict:
+        """
+        Coordinates as DataOutput columns {("AnimalN", bodypart, "x"/"y"): value}
+        """
+        return dict(zip(_row_columns(self._layout), self.pose.reshape(-1).tolist()))
+
+
+def get_points(skeleton, bodyparts) -> np.ndarray:
+    """
+    (X, Y) of the selected bodyparts of a skeleton as np.array in shape (len(bodyparts), 2)
+    Works with SkeletonViews as well as legacy skeleton dictionaries
+    """
+    if isinstance(skeleton, SkeletonView):
+        return skeleton.points(bodyparts)
+    return np.array([skeleton[bp] for bp in bodyparts], dtype=float).reshape(-1, 2)
+
+
+def get_timestamp(skeletons) -> float:
+    """
+    Capture time of the frame the skeletons were found in, relative to its source (see PoseFrame)
+    Works with PoseFrames and SkeletonViews, None for legacy skeletons or if the time is unknown
+    """
+    return getattr(skeletons, "timestamp", None)
@@ -8,16 +8,30 @@ Licensed under GNU General Public License v3.0
 
 import sys
 import os
+import json
 import importlib.util
-from itertools import product, combinations
+from functools import lru_cache, partial
+from itertools import combinations
 
 import numpy as np
 from skimage.feature import peak_local_max
 from scipy.ndimage.measurements import label, maximum_position
 from scipy.ndimage.morphology import generate_binary_structure, binary_erosion
 from scipy.ndimage.filters import maximum_filter
+from scipy.optimize import linear_sum_assignment
+
+from utils.poseframe import PoseFrame, SkeletonView, SkeletonError
+from utils.postprocessing import (
+    PoseProcessingPipeline,
+    LikelihoodFilter,
+    SplitAnimals,
+    FlattenAnimals,
+    MissingHandler,
+    Smoothing,
+    handle_missing,
+)
+from utils.tracking import IdentityTracker
 
-from utils.analysis import calculate_distance
 from utils.configloader import (
     MODEL_ORIGIN,
     MODEL_NAME,
@@ -30,6 +44,10 @@ from utils.configloader import (
     FILTER_LIKELIHOOD,
     LIKELIHOOD_THRESHOLD,
     USE_DLSTREAM_POSTURE_DETECTION,
+    ONNX_THREADS,
+    SMOOTHING_FACTOR,
+    TRACK_IDENTITIES,
+    TRACKING_MAX_DISTANCE,
 )
 
 # suppressing unnecessary warnings
@@ -76,9 +94,15 @@ elif MODEL_ORIGIN == "SLEAP":
     from sleap import load_model
     from utils.configloader import MODEL_PATH
 
+elif MODEL_ORIGIN == "ONNX":
+    import onnxruntime
+
+elif MODEL_ORIGIN == "REPLAY":
+    from utils.replay import PoseReplay, RandomWalkPoses
 
-class SkeletonError(Exception):
-    """Custom expection to be raised when issues with the skeleton is not received"""
+
+# combinations of peaks up to this number are compared exhaustively in calculate_dlstream_skeletons
+EXHAUSTIVE_CLUSTER_LIMIT = 4096
 
 
 def load_deeplabcut():
@@ -180,6 +204,75 @@ def find_local_peaks_new(
     return all_peaks
 
 
+def find_local_peaks_array(
+    scoremap: np.ndarray,
+    local_reference: np.ndarray,
+    animal_number: int,
+    stride: int,
+    threshold: float = 0.1,
+    min_distance: int = 4,
+) -> np.ndarray:
+    """
+    Finding the local peaks of all joints on the scoremap at once
+    :param scoremap: scmap from get_pose function in shape (height, width, joints)
+    :param local_reference: locref from get_pose function in shape (height, width, joints, 2)
+    :param animal_number: number of peaks to find for each joint
+    :param stride: stride of the network from the DeepLabCut config
+    :param threshold: minimal score of a peak
+    :param min_distance: minimal distance between two peaks of a joint on the scoremap
+
+    :returns np.array of shape (joints, animal_number, 3) with x, y and score of the peaks of each joint
+        sorted by score, NaN if less peaks were found
+    """
+    height, width, joints_number = scoremap.shape
+    # maximum filter only over the spatial axes, so the joints do not influence each other
+    size = 2 * min_distance + 1
+    max_filtered = maximum_filter(scoremap, size=(size, size, 1), mode="constant")
+    is_peak = (scoremap == max_filtered) & (scoremap >= threshold)
+    # a flat top passes the comparison at each of its pixels, only its first pixel is kept as the peak
+    pixel_order = np.arange(height * width).reshape(height, width, 1)
+    priority = np.where(is_peak, -pixel_order, -height * width)
+    first_peak = maximum_filter(
+        priority, size=(size, size, 1), mode="constant", cval=-height * width
+    )
+    is_peak &= priority == first_peak
+    scores = np.where(is_peak, scoremap, -np.inf).reshape(-1, joints_number)
+
+    # best peaks of each joint
+    peaks_number = min(animal_number, scores.shape[0])
+    top = np.argpartition(-scores, peaks_number - 1, axis=0)[:peaks_number]
+    top_scores = np.take_along_axis(scores, top, axis=0)
+    order = np.argsort(-top_scores, axis=0, kind="stable")
+    top = np.take_along_axis(top, order, axis=0)
+    top_scores = np.take_along_axis(top_scores, order, axis=0)
+
+    # using scoremap peaks to get the coordinates on original image
+    y, x = np.unravel_index(top, (height, width))
+    offsets = local_reference[y, x, np.arange(joints_number)]
+    coordinates = np.floor(np.stack((x, y), axis=-1) * stride + 0.5 * stride + offsets)
+    peaks = np.concatenate((coordinates, top_scores[..., np.newaxis]), axis=-1)
+    peaks[~np.isfinite(top_scores)] = np.nan
+    return peaks.transpose(1, 0, 2)
+
+
+def peaks_array_to_dict(peaks: np.ndarray, joint_names: list) -> dict:
+    """
+    Converting the peaks from find_local_peaks_array to the format of find_local_peaks_new
+    :param peaks: np.array of shape (joints, animals, 3)
+    :param joint_names: names of the joints
+
+    :returns all_joints dictionary with coordinates as list of tuples for each joint
+    """
+    all_peaks = {}
+    for joint, joint_peaks in zip(joint_names, peaks):
+        all_peaks[joint] = [
+            [tuple(peak[:2].astype(int)), joint]
+            for peak in joint_peaks
+            if not np.isnan(peak[2])
+        ]
+    return all_peaks
+
+
 def filter_pose_by_likelihood(pose, threshold: float = 0.1):
     """
        Filters pose estimation by likelihood threshold. Estimates below threshold are set to NaN and handled downstream
@@ -190,7 +283,7 @@ def filter_pose_by_likelihood(pose, threshold: float = 0.1):
                             likelihood will be set to 2 in case of filtered bodyparts
     """
     filtered_pose = pose.copy()
-    if MODEL_ORIGIN == 'DLC':
+    if MODEL_ORIGIN in ('DLC', 'ONNX'):
         """ DLC pose output is an np.array with [bp*[X,Y, Likelihood]]"""
         for num, bp in enumerate(filtered_pose):
             if bp[2] < threshold:
@@ -201,84 +294,148 @@ def filter_pose_by_likelihood(pose, threshold: float = 0.1):
     return filtered_pose
 
 
-def calculate_dlstream_skeletons(peaks: dict, animals_number: int) -> list:
+def calculate_dlstream_skeletons(
+    peaks: dict, animals_number: int, previous_skeletons: list = None
+) -> list:
     """
     Creating skeletons from given peaks
     There could be no more skeletons than animals_number
     Only unique skeletons output
+    Small sets of peaks are compared exhaustively (all combinations of one peak per joint),
+    larger sets are assembled joint by joint by optimal assignment to the animals
+    :param peaks: dictionary with a list of [coordinates, joint] for each joint from find_local_peaks_new
+    :param animals_number: maximum number of skeletons
+    :param previous_skeletons: (optional) skeletons of the previous frame, used to keep the animals apart
+    """
+    joints = list(peaks.keys())
+    coordinates = [
+        np.array([dot[0] for dot in peaks[joint]], dtype=float).reshape(-1, 2)
+        for joint in joints
+    ]
+    peak_counts = [len(joint_coordinates) for joint_coordinates in coordinates]
+    if 0 in peak_counts:
+        # no complete skeleton can be built if a joint was not found at all
+        return []
+    if np.prod(peak_counts, dtype=float) <= EXHAUSTIVE_CLUSTER_LIMIT:
+        return assemble_exhaustive(peaks, coordinates, animals_number)
+    return assemble_by_assignment(peaks, coordinates, animals_number, previous_skeletons)
+
+
+def assemble_exhaustive(peaks: dict, coordinates: list, animals_number: int) -> list:
     """
-    # creating a cartesian product out of all joints
-    # this product contains all possible variations (dots clusters) of all joints groups
-    cartesian_p = product(*peaks.values(), repeat=1)
-
-    def calculate_closest_distances(dots_cluster: list) -> float:
-        """
-        Calculating a sum of all distances between all dots in a cluster
-        """
-        # extracting dots coordinates from given list
-        dots_coordinates = (dot[0] for dot in dots_cluster)
-        # calculating sum of each dots cluster
-        product_sum = sum(
-            calculate_distance(*c) for c in combinations(dots_coordinates, 2)
+    Building all possible clusters of one peak per joint, sorting them by the sum of all distances between their dots
+    and taking the best clusters that share no dot with a better one
+    :param peaks: dictionary with a list of [coordinates, joint] for each joint
+    :param coordinates: list with the peak coordinates of each joint as np.array of shape (peaks, 2)
+    :param animals_number: maximum number of skeletons
+    """
+    joints = list(peaks.keys())
+    # indices of the peaks of every cluster in the same order as itertools.product
+    clusters = np.stack(
+        np.meshgrid(*[np.arange(len(c)) for c in coordinates], indexing="ij"), axis=-1
+    ).reshape(-1, len(joints))
+    points = np.stack(
+        [coordinates[num][clusters[:, num]] for num in range(len(joints))], axis=1
+    )
+
+    # summing up the distances of all dot pairs in a cluster, pair by pair to get the same costs and order as before
+    distances = np.zeros(len(clusters))
+    for first, second in combinations(range(len(joints)), 2):
+        distances += np.sqrt(
+            ((points[:, first] - points[:, second]) ** 2).sum(axis=1)
         )
-        return product_sum
+    sorted_clusters = np.argsort(distances, kind="stable")
 
-    # sorting groups by their sum
-    sorted_product = sorted(
-        cartesian_p, key=lambda c: calculate_closest_distances(c), reverse=False
-    )
+    # a cluster is unique if none of its dots is part of an already chosen cluster
+    top_clusters = [sorted_clusters[0]]
+    for cluster in sorted_clusters[1:]:
+        if len(top_clusters) == animals_number:
+            break
+        if not np.all(points[top_clusters] == points[cluster], axis=-1).any():
+            top_clusters.append(cluster)
 
-    # creating skeletons from top dots cluster
-    def compare_clusters(unique_clusters: list, new_cluster: tuple) -> bool:
-        """
-        Compare some new cluster against every existing unique cluster to find if it is unique
-        :param unique_clusters: list of existing unique cluster
-        :param new_cluster: cluster with same dots
-        :return: if new cluster is unique
-        """
-        # compare each element of tuple for uniqueness
-        # finding unique combinations of joints within all possible combinations
-        compare = lambda cl1, cl2: not any([(s1 == s2) for s1, s2 in zip(cl1, cl2)])
-        # create a uniqueness check list
-        # so if a list consists at least one False then new_cluster is not unique
-        comparison = [compare(u_cluster, new_cluster) for u_cluster in unique_clusters]
-        return all(comparison)
-
-    def create_animal_skeleton(dots_cluster: tuple) -> dict:
-        """
-        Creating a easy to read skeleton from dots cluster
-        Format for each joint:
-        {'joint_name': (x,y)}
-        """
-        skeleton = {}
-        for dot in dots_cluster:
-            skeleton[dot[-1]] = dot[0]
-        return skeleton
-
-    top_unique_clusters = []
-    animal_skeletons = []
+    return [
+        {joint: peaks[joint][clusters[cluster, num]][0] for num, joint in enumerate(joints)}
+        for cluster in top_clusters
+    ]
 
-    if sorted_product:
-        # add first cluster in our sorted list
-        top_unique_clusters.append(sorted_product[0])
-        for cluster in sorted_product[1:]:
-            # check if cluster is unique and we have a room for it
-            if (
-                compare_clusters(top_unique_clusters, cluster)
-                and len(top_unique_clusters) < animals_number
-            ):
-                top_unique_clusters.append(cluster)
-            # there couldn't be more clusters then animal_number limit
-            elif len(top_unique_clusters) == animals_number:
-                break
-
-    # creating a skeleton out of each cluster in our top clusters list
-    for unique_cluster in top_unique_clusters:
-        animal_skeletons.append(create_animal_skeleton(unique_cluster))
 
+def assemble_by_assignment(
+    peaks: dict, coordinates: list, animals_number: int, previous_skeletons: list = None
+) -> list:
+    """
+    Assigning the peaks of each joint to the animals with the Hungarian method
+    Animals are seeded from the previous skeletons if there are animals_number of them,
+    otherwise from the joint with the most peaks
+    Joints that could not be assigned to an animal are set to NaN
+    :param peaks: dictionary with a list of [coordinates, joint] for each joint
+    :param coordinates: list with the peak coordinates of each joint as np.array of shape (peaks, 2)
+    :param animals_number: maximum number of skeletons
+    :param previous_skeletons: (optional) skeletons of the previous frame
+    """
+    joints = list(peaks.keys())
+    if previous_skeletons is not None and len(previous_skeletons) == animals_number:
+        # reference position of every joint of every animal, NaN if the joint was missing
+        references = np.array(
+            [
+                [skeleton.get(joint, (np.nan, np.nan)) for joint in joints]
+                for skeleton in previous_skeletons
+            ],
+            dtype=float,
+        )
+        joint_order = range(len(joints))
+    else:
+        seed_joint = int(np.argmax([min(len(c), animals_number) for c in coordinates]))
+        seeds = coordinates[seed_joint][:animals_number]
+        references = np.full((len(seeds), len(joints), 2), np.nan)
+        references[:, seed_joint] = seeds
+        joint_order = [seed_joint] + [
+            num for num in range(len(joints)) if num != seed_joint
+        ]
+
+    assigned = np.full(references.shape[:2], -1)
+    for num in joint_order:
+        # joints without reference are matched to the center of everything assigned to the animal so far
+        points = _assigned_points(assigned, coordinates)
+        assigned_number = (assigned >= 0).sum(axis=1)[:, np.newaxis]
+        centers = np.where(
+            assigned_number > 0,
+            np.nansum(points, axis=1) / np.maximum(assigned_number, 1),
+            np.nan,
+        )
+        reference = np.where(np.isnan(references[:, num]), centers, references[:, num])
+        cost = np.sqrt(
+            ((reference[:, np.newaxis] - coordinates[num][np.newaxis]) ** 2).sum(axis=-1)
+        )
+        # animals without any reference can take any peak that is left
+        cost = np.where(np.isnan(cost), 1e6, cost)
+        animals, joint_peaks = linear_sum_assignment(cost)
+        assigned[animals, num] = joint_peaks
+
+    animal_skeletons = []
+    for animal in assigned:
+        if (animal < 0).all():
+            continue
+        animal_skeletons.append(
+            {
+                joint: peaks[joint][animal[num]][0] if animal[num] >= 0 else (np.nan, np.nan)
+                for num, joint in enumerate(joints)
+            }
+        )
     return animal_skeletons
 
 
+def _assigned_points(assigned: np.ndarray, coordinates: list) -> np.ndarray:
+    """
+    Coordinates of the assigned peaks in shape (animals, joints, 2), NaN for unassigned joints
+    """
+    points = np.full((*assigned.shape, 2), np.nan)
+    for num, joint_coordinates in enumerate(coordinates):
+        valid = assigned[:, num] >= 0
+        points[valid, num] = joint_coordinates[assigned[valid, num]]
+    return points
+
+
 # maDLC
 def get_ma_pose(image, config, session, inputs, outputs):
     """
@@ -305,6 +462,60 @@ def get_ma_pose(image, config, session, inputs, outputs):
     return pose
 
 
+@lru_cache(maxsize=None)
+def get_ma_bodypart_names(count: int) -> tuple:
+    """maDLC bodyparts are autonamed in style bp1, bp2 ..."""
+    return tuple(f"bp{num + 1}" for num in range(count))
+
+
+def calculate_ma_pose(
+    pose: dict, animals_number: int, threshold: float = 0.1
+) -> np.ndarray:
+    """
+    Converts the maDLC detections into a pose array with a fixed number of animals
+    The detections of all bodyparts are padded into one array, filtered by confidence with a mask
+    and the animals_number most confident detections of each bodypart are selected at once
+    :param pose: maDLC output with the coordinates and confidences of all detections of each bodypart
+    :param animals_number: number of animals
+    :param threshold: minimum confidence of a detection
+    :return: np.array in shape (animals_number, bodyparts, 3) with [X, Y, Confidence],
+        bodyparts with less detections than animals are NaN for the remaining animals
+    """
+    coordinates = pose["coordinates"][0]
+    confidences = pose["confidence"]
+    counts = np.array([len(bp) for bp in coordinates], dtype=int)
+    bodyparts_number = len(counts)
+    width = max(int(counts.max(initial=0)), animals_number)
+
+    # padding the detections into (bodyparts, width) arrays
+    padded_coordinates = np.full((bodyparts_number, width, 2), np.nan)
+    padded_confidences = np.full((bodyparts_number, width), -np.inf)
+    if counts.sum():
+        rows = np.repeat(np.arange(bodyparts_number), counts)
+        columns = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        padded_coordinates[rows, columns] = np.concatenate(
+            [np.reshape(bp, (-1, 2)) for bp in coordinates if len(bp)]
+        )
+        padded_confidences[rows, columns] = np.concatenate(
+            [np.reshape(confidences[num], -1) for num in np.flatnonzero(counts)]
+        )
+    padded_confidences[padded_confidences < threshold] = -np.inf
+
+    # most confident detections first
+    order = np.argsort(-padded_confidences, axis=1, kind="stable")[:, :animals_number]
+    selected_confidences = np.take_along_axis(padded_confidences, order, axis=1)
+    selected_coordinates = np.take_along_axis(
+        padded_coordinates, order[..., np.newaxis], axis=1
+    )
+    rejected = np.isneginf(selected_confidences)
+    selected_coordinates[rejected] = np.nan
+    selected_confidences[rejected] = np.nan
+    ma_pose = np.concatenate(
+        (selected_coordinates, selected_confidences[..., np.newaxis]), axis=2
+    )
+    return ma_pose.transpose(1, 0, 2)
+
+
 def calculate_ma_skeletons(
     pose: dict, animals_number: int, threshold: float = 0.1
 ) -> list:
@@ -313,54 +524,10 @@ def calculate_ma_skeletons(
     There could be no more skeletons than animals_number
     Only unique skeletons output
     """
-
-    def filter_mapredictions(pose):
-        detection = []
-        conf = np.array(pose["confidence"])
-        coords = np.array(pose["coordinates"])
-        for num, bp in enumerate(pose["coordinates"][0]):
-            if len(bp) > 0:
-                conf_bp = conf[num].flatten()
-                fltred_bp = bp[conf_bp >= threshold, :]
-                # todo: add function to only take top k-highest poses with k = animal number
-                detection.append(fltred_bp)
-            else:
-                detection.append(np.array([]))
-        return detection
-
-    def extract_to_animal_skeleton(coords):
-        """
-        Creating a easy to read skeleton from dots cluster
-        Format for each joint:
-        {'joint_name': (x,y)}
-        """
-        bodyparts = np.array(coords)
-        skeletons = {}
-        for bp in range(len(bodyparts)):
-            for animal_num in range(animals_number):
-                if "Mouse" + str(animal_num + 1) not in skeletons.keys():
-                    skeletons["Mouse" + str(animal_num + 1)] = {}
-                if len(bodyparts[bp]) >= animals_number:
-                    skeletons["Mouse" + str(animal_num + 1)][
-                        "bp" + str(bp + 1)
-                    ] = bodyparts[bp][animal_num].astype(float)
-                else:
-                    if animal_num < len(bodyparts[bp]):
-                        skeletons["Mouse" + str(animal_num + 1)][
-                            "bp" + str(bp + 1)
-                        ] = bodyparts[bp][animal_num].astype(float)
-                    else:
-                        skeletons["Mouse" + str(animal_num + 1)][
-                            "bp" + str(bp + 1)
-                        ] = np.array([np.NaN, np.NaN])
-
-        return skeletons
-
-    detections = filter_mapredictions(pose)
-    animal_skeletons = extract_to_animal_skeleton(detections)
-    animal_skeletons = list(animal_skeletons.values())
-
-    return animal_skeletons
+    ma_pose = calculate_ma_pose(pose, animals_number, threshold)
+    return PoseFrame.from_pose(
+        ma_pose, get_ma_bodypart_names(ma_pose.shape[1])
+    ).to_skeletons()
 
 
 # DLC LIVE & DeepPoseKit
@@ -373,12 +540,97 @@ def load_dlc_live():
     return DLCLive(MODEL_PATH)
 
 
-def load_sleap():
-    model = load_model(MODEL_PATH, batch_size=1)
+def load_sleap(batch_size: int = 1):
+    model = load_model(MODEL_PATH, batch_size=batch_size)
     model.inference_model
     return model.inference_model
 
 
+# ONNX
+def load_onnx():
+    """
+    Loads a DLC model converted with convert_model.py into an onnxruntime session on the CPU
+    MODEL_PATH is the folder with the .onnx file and the .json file with its pose configuration
+
+    :return: tuple of onnxruntime session and pose configuration
+    """
+    onnx_files = sorted(file for file in os.listdir(MODEL_PATH) if file.endswith(".onnx"))
+    if not onnx_files:
+        raise FileNotFoundError(f"No .onnx model found in {MODEL_PATH}.")
+    model_file = os.path.join(MODEL_PATH, onnx_files[-1])
+    with open(os.path.splitext(model_file)[0] + ".json") as config_file:
+        config = json.load(config_file)
+
+    options = onnxruntime.SessionOptions()
+    if ONNX_THREADS > 0:
+        options.intra_op_num_threads = ONNX_THREADS
+    session = onnxruntime.InferenceSession(
+        model_file, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+    return session, config
+
+
+# REPLAY
+def load_replay(frame_shape: tuple):
+    """
+    Loads the pose source used instead of a model
+    MODEL_PATH is either a DataOutput csv file written by DeepLabStream or "synthetic" for random poses
+    :param frame_shape: shape of the analysed frames, synthetic animals stay inside them
+    :return: pose source with next_pose() method
+    """
+    if MODEL_PATH.lower() == "synthetic":
+        return RandomWalkPoses(ANIMALS_NUMBER, ALL_BODYPARTS, frame_shape, seed=0)
+    return PoseReplay(MODEL_PATH)
+
+
+def argmax_pose_predict(scoremap: np.ndarray, local_reference, stride: int) -> np.ndarray:
+    """
+    Most probable position of each joint, same as the DLC single animal prediction
+    :param scoremap: scoremap in shape (height, width, joints)
+    :param local_reference: location refinement in shape (height, width, joints, 2) or None
+    :param stride: stride of the network
+    :return: pose as np.array with [bp*[X, Y, Likelihood]]
+    """
+    height, width, joints_number = scoremap.shape
+    flat_scoremap = scoremap.reshape(-1, joints_number)
+    max_positions = np.argmax(flat_scoremap, axis=0)
+    joints = np.arange(joints_number)
+    y, x = np.unravel_index(max_positions, (height, width))
+    positions = np.stack((x, y), axis=1) * stride + 0.5 * stride
+    if local_reference is not None:
+        # location refinement is stored as x, y offset for each joint
+        positions = positions + local_reference[y, x, joints]
+    likelihood = flat_scoremap[max_positions, joints]
+    return np.column_stack((positions, likelihood))
+
+
+def get_onnx_pose(image, session, config: dict) -> np.ndarray:
+    """
+    Gets pose from an ONNX DLC model using given image
+    :param image: frame which would be analyzed
+    :param session, config: onnxruntime session and pose configuration from load_onnx()
+
+    :return: pose as np.array with [bp*[X, Y, Likelihood]]
+    """
+    inputs = {config["input"]: np.expand_dims(image, axis=0).astype(np.float32)}
+    outputs = session.run(config["outputs"], inputs)
+    if config["pose_output"]:
+        # model was exported with the pose prediction included in the graph
+        return np.reshape(outputs[0], (-1, 3))
+
+    scoremap = np.squeeze(outputs[0], axis=0)
+    if config["scoremap_logits"]:
+        scoremap = 1 / (1 + np.exp(-scoremap))
+    local_reference = None
+    if config["location_refinement"]:
+        local_reference = np.squeeze(outputs[1], axis=0)
+        local_reference = (
+            np.reshape(local_reference, (*local_reference.shape[:2], -1, 2))
+            * config["locref_stdev"]
+        )
+    return argmax_pose_predict(scoremap, local_reference, config["stride"])
+
+
 def flatten_maDLC_skeletons(skeletons):
     """Flattens maDLC multi skeletons into one skeleton to simulate dlc output
     where animals are not identical e.g. for animals with different fur colors (SIMBA)"""
@@ -412,33 +664,36 @@ def split_flat_skeleton(skeletons):
     return split_skeletons
 
 
+@lru_cache(maxsize=None)
+def get_bodypart_names(count: int) -> tuple:
+    """
+    Names of the bodyparts of a pose with count bodyparts.
+    If ALL_BODYPARTS is not sufficient, the bodyparts are autonamed in style bp0, bp1 ...
+    """
+    if count <= len(ALL_BODYPARTS):
+        return tuple(ALL_BODYPARTS[:count])
+    return tuple(f"bp{num}" for num in range(count))
+
+
 def transform_2skeleton(pose):
     """
     Transforms pose estimation into DLStream style "skeleton" posture.
     If ALL_BODYPARTS is not sufficient, it will autoname the bodyparts in style bp0, bp1 ...
     """
-    try:
-        skeleton = dict()
-        counter = 0
-        for bp in pose:
-            skeleton[ALL_BODYPARTS[counter]] = tuple(np.array(bp[0:2], dtype=float))
-            counter += 1
-    except IndexError:
-        skeleton = dict()
-        counter = 0
-        for bp in pose:
-            skeleton[f"bp{counter}"] = tuple(np.array(bp[0:2], dtype=float))
-            counter += 1
-
-    return skeleton
+    return {
+        name: tuple(np.array(bp[0:2], dtype=float))
+        for name, bp in zip(get_bodypart_names(len(pose)), pose)
+    }
 
 
 def transform_2pose(skeleton):
+    if isinstance(skeleton, SkeletonView):
+        return skeleton.pose.astype(float)
     pose = np.array([*skeleton.values()])
     return pose
 
 
-def handle_missing_bp(animal_skeletons: list):
+def handle_missing_bp(animal_skeletons) -> PoseFrame:
     """handles missing bodyparts (NaN values) by selected method in advanced_settings.ini
     If HANDLE_MISSING is skip: the complete skeleton is removed (default);
     If HANDLE_MISSING is null: the missing coordinate is set to 0.0, not recommended for experiments
@@ -450,38 +705,11 @@ def handle_missing_bp(animal_skeletons: list):
 
     Missing skeletons will not be passed to the trigger, while resetting coordinates might lead to false results returned
     by triggers.
+    All animals are handled at once with masks over the pose array, the input is not changed.
 
-
-    :param: animal_skeletons: list of skeletons returned by calculate skeleton
-    :return animal_skeleton with handled missing values"""
-
-    for skeleton in animal_skeletons:
-        for bodypart, coordinates in skeleton.items():
-            np_coords = np.array((coordinates))
-            if any(np.isnan(np_coords)):
-                if HANDLE_MISSING == "pass":
-                    # do nothing
-                    pass
-                elif HANDLE_MISSING == "skip":
-                    # remove the whole skeleton
-                    animal_skeletons.remove(skeleton)
-                    break
-                elif HANDLE_MISSING == "null":
-                    # remove replace coordinates with 0,0
-                    new_coordinates = np.nan_to_num(np_coords, copy=True)
-                    skeleton[bodypart] = tuple(new_coordinates)
-                elif HANDLE_MISSING == "reset":
-                    # reset complete skeleton to NaN, NaN
-                    reset_skeleton = {bp: (np.NaN, np.NaN) for bp in skeleton}
-                    animal_skeletons = [
-                        reset_skeleton if i == skeleton else i for i in animal_skeletons
-                    ]
-                    break
-                else:
-                    animal_skeletons.remove(skeleton)
-                    break
-
-    return animal_skeletons
+    :param: animal_skeletons: PoseFrame (or list of skeletons) returned by calculate skeleton
+    :return PoseFrame with handled missing values"""
+    return handle_missing(PoseFrame.from_skeletons(animal_skeletons), HANDLE_MISSING)
 
 
 def arrange_flatskeleton(skeleton, n_animals, n_bp_animal, switch_dict):
@@ -537,54 +765,135 @@ def calculate_sleap_skeletons(pose) -> list:
     return skeletons
 
 
-def calculate_skeletons(peaks: dict, animals_number: int) -> list:
+def assemble_dlstream_skeletons(
+    peaks: dict, previous_skeletons, animals_number: int
+) -> list:
+    return calculate_dlstream_skeletons(peaks, animals_number, previous_skeletons)
+
+
+def assemble_pose(pose, previous_skeletons=None) -> PoseFrame:
     """
-    Creating skeletons from given peaks
-    There could be no more skeletons than animals_number
-    Only unique skeletons output
-    adaptive to chosen model origin
+    PoseFrame of pose estimation output in shape (bodyparts, 2 or 3) or (animals, bodyparts, 2 or 3)
+    """
+    pose = np.asarray(pose)
+    return PoseFrame.from_pose(pose, get_bodypart_names(pose.shape[-2]))
+
+
+def assemble_ma_skeletons(
+    peaks: dict, previous_skeletons, animals_number: int
+) -> PoseFrame:
+    ma_pose = calculate_ma_pose(peaks, animals_number)
+    return PoseFrame.from_pose(ma_pose, get_ma_bodypart_names(ma_pose.shape[1]))
+
+
+def assemble_replay(peaks: list, previous_skeletons=None) -> PoseFrame:
+    # replayed poses are already skeletons in full frame coordinates
+    return PoseFrame.from_skeletons(peaks)
+
+
+def build_pipeline(
+    animals_number: int = ANIMALS_NUMBER, model_origin: str = MODEL_ORIGIN
+) -> PoseProcessingPipeline:
     """
-    if MODEL_ORIGIN == "DLC":
-        if USE_DLSTREAM_POSTURE_DETECTION:
-            animal_skeletons = calculate_dlstream_skeletons(peaks, animals_number)
+    Assemble the post-processing of the pose estimation once from the settings:
+    skeleton assembly, likelihood filter, identity tracking, split/flatten of animals, missing handling and smoothing
+    Every camera needs its own pipeline, because tracking and smoothing keep the previous frames
+    :param animals_number: number of animals
+    :param model_origin: origin of the pose estimation model
+    :return: PoseProcessingPipeline
+    """
+    stages = []
+    shift = True
+    if model_origin == "DLC" or model_origin == "ONNX":
+        if USE_DLSTREAM_POSTURE_DETECTION and model_origin == "DLC":
+            assemble = partial(assemble_dlstream_skeletons, animals_number=animals_number)
         else:
+            assemble = assemble_pose
             if FILTER_LIKELIHOOD:
-                peaks = filter_pose_by_likelihood(peaks, LIKELIHOOD_THRESHOLD)
-            animal_skeletons = calculate_skeletons_dlc_live(peaks)
-
+                stages.append(LikelihoodFilter(LIKELIHOOD_THRESHOLD))
         if animals_number != 1 and SPLIT_MA:
-            animal_skeletons = split_flat_skeleton(animal_skeletons)
-        else:
-            pass
+            stages.append(SplitAnimals(animals_number))
 
-    elif MODEL_ORIGIN == "MADLC":
-        animal_skeletons = calculate_ma_skeletons(peaks, animals_number)
+    elif model_origin == "MADLC":
+        assemble = partial(assemble_ma_skeletons, animals_number=animals_number)
+        if TRACK_IDENTITIES:
+            stages.append(IdentityTracker(animals_number, TRACKING_MAX_DISTANCE))
         if FLATTEN_MA:
-            animal_skeletons = flatten_maDLC_skeletons(animal_skeletons)
-        else:
-            pass
+            stages.append(FlattenAnimals())
 
-    elif MODEL_ORIGIN == "DLC-LIVE" or MODEL_ORIGIN == "DEEPPOSEKIT":
-        animal_skeletons = calculate_skeletons_dlc_live(peaks)
+    elif model_origin == "DLC-LIVE" or model_origin == "DEEPPOSEKIT":
+        assemble = assemble_pose
         if animals_number != 1 and not SPLIT_MA:
             raise SkeletonError(
                 "Multiple animals are currently not supported by DLC-LIVE."
                 " If you are using differently colored animals, please refer to the bodyparts directly (as a flattened skeleton) or use SPLIT_MA in the advanced settings."
             )
-        elif SPLIT_MA:
-            animal_skeletons = split_flat_skeleton(animal_skeletons)
-        else:
-            pass
+        elif animals_number != 1:
+            stages.append(SplitAnimals(animals_number))
 
-    elif MODEL_ORIGIN == "SLEAP":
-        animal_skeletons = calculate_sleap_skeletons(peaks)
+    elif model_origin == "REPLAY":
+        assemble = assemble_replay
+        shift = False
+
+    elif model_origin == "SLEAP":
+        assemble = assemble_pose
+        if TRACK_IDENTITIES:
+            stages.append(IdentityTracker(animals_number, TRACKING_MAX_DISTANCE))
         if FLATTEN_MA:
-            animal_skeletons = flatten_maDLC_skeletons(animal_skeletons)
+            stages.append(FlattenAnimals())
         elif animals_number != 1 and SPLIT_MA:
-            animal_skeletons = split_flat_skeleton(animal_skeletons)
-        else:
-            pass
+            stages.append(SplitAnimals(animals_number))
 
-    animal_skeletons = handle_missing_bp(animal_skeletons)
+    else:
+        raise ValueError(f"Pose estimation origin {model_origin} is not supported.")
 
-    return animal_skeletons
+    stages.append(MissingHandler(HANDLE_MISSING))
+    if SMOOTHING_FACTOR > 0:
+        stages.append(Smoothing(SMOOTHING_FACTOR))
+    return PoseProcessingPipeline(assemble, stages, shift)
+
+
+def count_expected_skeletons(
+    animals_number: int = ANIMALS_NUMBER, model_origin: str = MODEL_ORIGIN
+) -> int:
+    """
+    Number of skeletons the pipeline of build_pipeline returns when all animals were found
+    :param animals_number: number of animals
+    :param model_origin: origin of the pose estimation model
+    """
+    if animals_number == 1:
+        return 1
+    if model_origin == "DLC" or model_origin == "ONNX":
+        if USE_DLSTREAM_POSTURE_DETECTION and model_origin == "DLC":
+            return animals_number
+        # all animals are in one flat skeleton unless it is split
+        return animals_number if SPLIT_MA else 1
+    if model_origin == "MADLC" or model_origin == "SLEAP":
+        return 1 if FLATTEN_MA else animals_number
+    return animals_number
+
+
+# pipelines used by calculate_skeletons for each number of animals
+_pipelines = {}
+
+
+def calculate_skeletons(
+    peaks,
+    animals_number: int,
+    offset: tuple = (0, 0),
+    previous_skeletons: list = None,
+) -> PoseFrame:
+    """
+    Creating skeletons from given peaks
+    There could be no more skeletons than animals_number
+    Only unique skeletons output
+    adaptive to chosen model origin
+    Runs a shared pipeline from build_pipeline, use a pipeline for each camera instead when streaming multiple cameras
+    :param offset: (x, y) position of the analysed crop in the full frame, skeletons are mapped to the full frame
+    :param previous_skeletons: (optional) skeletons of the previous frame in full frame coordinates,
+        used to assemble multiple animals
+    :return: PoseFrame with the skeletons of all animals, behaves like a list of skeleton dictionaries
+    """
+    if animals_number not in _pipelines:
+        _pipelines[animals_number] = build_pipeline(animals_number)
+    return _pipelines[animals_number](peaks, offset, previous_skeletons)
@@ -0,0 +1,310 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import time
+
+import numpy as np
+
+from utils.poseframe import PoseFrame, SkeletonError
+
+
+def handle_missing(pose_frame: PoseFrame, method: str) -> PoseFrame:
+    """
+    Handle missing bodyparts (NaN values) of all animals at once with masks over the pose array
+    :param pose_frame: PoseFrame to handle, it is not changed
+    :param method: "skip" removes incomplete skeletons, "null" sets missing coordinates to 0.0,
+        "pass" leaves them NaN and "reset" sets incomplete skeletons to NaN completely.
+        Unknown methods remove incomplete skeletons
+    :return: PoseFrame with handled missing values
+    """
+    if method == "pass":
+        return pose_frame
+
+    missing = np.isnan(pose_frame.pose)
+    # skeletons with at least one missing coordinate
+    incomplete = missing.any(axis=(1, 2))
+    if not incomplete.any():
+        return pose_frame
+
+    if method == "null":
+        handled = pose_frame.copy()
+        handled.pose[missing] = 0.0
+        return handled
+    elif method == "reset":
+        handled = pose_frame.copy()
+        handled.pose[incomplete] = np.nan
+        return handled
+    else:
+        return pose_frame.select(~incomplete)
+
+
+class PoseStage:
+    """
+    Base class of the post-processing stages, each stage takes a PoseFrame and returns the processed PoseFrame
+    """
+
+    name = "stage"
+    # stages keeping state between frames need all frames of a camera in order
+    stateful = False
+
+    def __call__(self, pose_frame: PoseFrame) -> PoseFrame:
+        raise NotImplementedError
+
+    def reset(self):
+        """Forget any state kept between frames"""
+        pass
+
+
+class LikelihoodFilter(PoseStage):
+    """
+    Sets bodyparts below the likelihood threshold to NaN, their likelihood is set to 2 to mark them as filtered
+    Bodyparts without likelihood are kept
+    """
+
+    name = "likelihood filter"
+
+    def __init__(self, threshold: float):
+        self._threshold = threshold
+
+    def __call__(self, pose_frame: PoseFrame) -> PoseFrame:
+        below = pose_frame.likelihood < self._threshold
+        if not below.any():
+            return pose_frame
+        filtered = pose_frame.copy()
+        filtered.pose[below] = np.nan
+        filtered.likelihood[below] = 2.0
+        return filtered
+
+
+class SplitAnimals(PoseStage):
+    """
+    Splits a flat skeleton (multiple animals in a single skeleton) into separate skeletons
+    to simulate output where animals are identity tracked (e.g. SLEAP)
+    """
+
+    name = "split animals"
+
+    def __init__(self, animals_number: int):
+        self._animals_number = animals_number
+
+    def __call__(self, pose_frame: PoseFrame) -> PoseFrame:
+        if not len(pose_frame):
+            return pose_frame
+        flat_bodyparts = pose_frame.layout[0]
+        bp_per_animal, remainder = divmod(len(flat_bodyparts), self._animals_number)
+        if remainder > 0:
+            raise SkeletonError(
+                f"The number of body parts ({len(flat_bodyparts)}) cannot be split equally into {self._animals_number} animals."
+            )
+        layout = tuple(
+            flat_bodyparts[bp_per_animal * animal : bp_per_animal * (animal + 1)]
+            for animal in range(self._animals_number)
+        )
+        return PoseFrame(
+            pose_frame.data[0].reshape(self._animals_number, bp_per_animal, 3),
+            layout,
+            pose_frame.timestamp,
+        )
+
+
+class FlattenAnimals(PoseStage):
+    """
+    Flattens multiple skeletons into one skeleton to simulate DLC output where animals are not identical,
+    e.g. for animals with different fur colors (SIMBA). Bodyparts are named "<animal>_<bodypart>"
+    """
+
+    name = "flatten animals"
+
+    def __call__(self, pose_frame: PoseFrame) -> PoseFrame:
+        if not len(pose_frame):
+            return pose_frame
+        bodyparts = tuple(
+            f"{num}_{bp}"
+            for num, animal in enumerate(pose_frame.layout)
+            for bp in animal
+        )
+        return PoseFrame(
+            pose_frame.data.reshape(1, -1, 3), bodyparts, pose_frame.timestamp
+        )
+
+
+class MissingHandler(PoseStage):
+    """
+    Handles missing bodyparts with the given method, see handle_missing
+    """
+
+    name = "missing handling"
+
+    def __init__(self, method: str):
+        self._method = method
+
+    def __call__(self, pose_frame: PoseFrame) -> PoseFrame:
+        return handle_missing(pose_frame, self._method)
+
+
+class Smoothing(PoseStage):
+    """
+    Exponential smoothing of all coordinates with the previous frame
+    Starts over whenever the animals or bodyparts change, missing coordinates are not smoothed
+    """
+
+    name = "smoothing"
+    stateful = True
+
+    def __init__(self, factor: float):
+        """
+        :param factor: weight of the previous frame between 0 (no smoothing) and 1
+        """
+        self._factor = factor
+        self._previous = None
+
+    def __call__(self, pose_frame: PoseFrame) -> PoseFrame:
+        if self._previous is None or self._previous.layout != pose_frame.layout:
+            self._previous = pose_frame
+            return pose_frame
+        current = pose_frame.pose
+        previous = self._previous.pose
+        smoothed = pose_frame.copy()
+        smoothed.pose[...] = np.where(
+            np.isnan(previous),
+            current,
+            self._factor * previous + (1 - self._factor) * current,
+        )
+        self._previous = smoothed
+        return smoothed
+
+    def reset(self):
+        self._previous = None
+
+
+class StageTimings:
+    """
+    Accumulated execution times of post-processing steps, possibly measured in different processes
+    """
+
+    def __init__(self):
+        # total time in seconds and number of calls for each step
+        self._timings = {}
+
+    def add(self, name: str, seconds: float):
+        timing = self._timings.setdefault(name, [0.0, 0])
+        timing[0] += seconds
+        timing[1] += 1
+
+    def update(self, durations: dict):
+        """
+        Add the execution times of one frame
+        :param durations: dictionary {step: time in seconds}
+        """
+        for name, seconds in durations.items():
+            self.add(name, seconds)
+
+    def get_means(self) -> dict:
+        """
+        Mean execution time of every step in milliseconds
+        :return: dictionary {step: mean time}
+        """
+        return {
+            name: total / count * 1000 for name, (total, count) in self._timings.items()
+        }
+
+
+class PoseProcessingPipeline:
+    """
+    Ordered post-processing of the pose estimation, assembled once at startup
+    Creates the PoseFrame with the assembly function, moves it to full frame coordinates
+    and runs all stages one after another. The execution time of every step is recorded
+    """
+
+    def __init__(self, assemble, stages: list, shift: bool = True):
+        """
+        :param assemble: function (peaks, previous_skeletons) -> PoseFrame creating the skeletons
+            from the pose estimation output, None if the pipeline only processes PoseFrames
+        :param stages: list of PoseStages
+        :param shift: if False, the crop offset is ignored because the skeletons are already in full frame coordinates
+        """
+        self._assemble = assemble
+        self._stages = list(stages)
+        self._shift = shift
+        self.timings = StageTimings()
+        # execution time of every step for the last frame
+        self.last_durations = {}
+
+    @property
+    def stage_names(self) -> list:
+        return [stage.name for stage in self._stages]
+
+    def _record(self, name: str, start: float) -> float:
+        now = time.perf_counter()
+        self.last_durations[name] = now - start
+        self.timings.add(name, now - start)
+        return now
+
+    def __call__(
+        self, peaks, offset: tuple = (0, 0), previous_skeletons=None
+    ) -> PoseFrame:
+        """
+        Process the pose estimation output of one frame
+        :param peaks: output of the pose estimation
+        :param offset: (x, y) position of the analysed crop in the full frame
+        :param previous_skeletons: (optional) skeletons of the previous frame in full frame coordinates
+        :return: processed PoseFrame in full frame coordinates
+        """
+        self.last_durations = {}
+        shift = self._shift and offset != (0, 0)
+        start = time.perf_counter()
+        if shift and previous_skeletons:
+            previous_skeletons = PoseFrame.from_skeletons(previous_skeletons).copy()
+            previous_skeletons.pose[...] -= offset
+        pose_frame = PoseFrame.from_skeletons(self._assemble(peaks, previous_skeletons))
+        if shift:
+            # the assembled PoseFrame is new, so it can be moved in place
+            pose_frame.pose[...] += offset
+        self._record("assembly", start)
+        return self._run_stages(pose_frame)
+
+    def process(self, pose_frame: PoseFrame) -> PoseFrame:
+        """
+        Run the stages on an already assembled PoseFrame
+        :param pose_frame: PoseFrame in full frame coordinates
+        :return: processed PoseFrame
+        """
+        self.last_durations = {}
+        return self._run_stages(pose_frame)
+
+    def _run_stages(self, pose_frame: PoseFrame) -> PoseFrame:
+        start = time.perf_counter()
+        for stage in self._stages:
+            pose_frame = stage(pose_frame)
+            start = self._record(stage.name, start)
+        return pose_frame
+
+    def split(self) -> tuple:
+        """
+        Split the pipeline before the first stateful stage, so the stateless part can run in parallel processes
+        :return: pipeline with the assembly and stateless stages
+            and pipeline with the remaining stages (None if all stages are stateless)
+        """
+        for num, stage in enumerate(self._stages):
+            if stage.stateful:
+                return (
+                    PoseProcessingPipeline(self._assemble, self._stages[:num], self._shift),
+                    PoseProcessingPipeline(None, self._stages[num:]),
+                )
+        return self, None
+
+    def reset(self):
+        for stage in self._stages:
+            stage.reset()
+
+    def get_timings(self) -> dict:
+        """
+        Mean execution time of every step in milliseconds
+        :return: dictionary {step: mean time}
+        """
+        return self.timings.get_means()
@@ -0,0 +1,145 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import numpy as np
+
+from utils.poseframe import PoseFrame
+
+
+class SkeletonPredictor:
+    """
+    Constant velocity Kalman filter for every coordinate of every bodypart
+    Corrected with each skeleton coming from pose estimation and used to predict skeletons
+    for frames that were not analysed, so triggers can be checked at camera speed
+    All coordinates are filtered together as numpy arrays, x and y are treated as independent
+    """
+
+    def __init__(
+        self, process_noise: float = 1.0, measurement_noise: float = 2.0, horizon: int = 15
+    ):
+        """
+        :param process_noise: standard deviation of the change in velocity between two frames in pixels
+        :param measurement_noise: standard deviation of the pose estimation in pixels
+        :param horizon: maximum number of frames to predict since the last pose estimation
+        """
+        self._q = process_noise ** 2
+        self._r = measurement_noise ** 2
+        self._horizon = horizon
+        self._layout = None
+        self._index = None
+        self._position = None
+        self._velocity = None
+        # covariance of position and velocity for each coordinate
+        self._p_pos = None
+        self._p_cross = None
+        self._p_vel = None
+        # coordinates that were measured at least once since the last reset
+        self._seen = None
+
+    def _to_skeletons(self, coordinates: np.ndarray) -> PoseFrame:
+        # coordinates that were never measured are missing, not at (0, 0)
+        coordinates = np.where(self._seen, coordinates, np.nan)
+        return PoseFrame.from_pose(
+            coordinates.reshape(len(self._layout), -1, 2), self._layout
+        )
+
+    def _start(self, measurement: np.ndarray, first: np.ndarray):
+        """
+        Start the state of coordinates from their first measurement without velocity
+        :param measurement: all measured coordinates
+        :param first: mask of the coordinates to start
+        """
+        self._position[first] = measurement[first]
+        self._velocity[first] = 0.0
+        self._p_pos[first] = self._r
+        self._p_cross[first] = 0.0
+        self._p_vel[first] = 1e3
+        self._seen |= first
+
+    def reset(self, skeletons: list = None, index: int = None):
+        """
+        Forget the current state and start again from skeletons (if given) without velocity
+        """
+        if not skeletons:
+            self._layout = None
+            self._index = None
+            return
+        skeletons = PoseFrame.from_skeletons(skeletons)
+        measurement = skeletons.pose.reshape(-1).astype(float)
+        valid = ~np.isnan(measurement)
+        self._layout = skeletons.layout
+        self._index = index
+        self._position = np.zeros_like(measurement)
+        self._velocity = np.zeros_like(measurement)
+        self._p_pos = np.zeros_like(measurement)
+        self._p_cross = np.zeros_like(measurement)
+        self._p_vel = np.zeros_like(measurement)
+        self._seen = np.zeros(measurement.shape, dtype=bool)
+        self._start(measurement, valid)
+
+    def _predict_state(self, frames: int):
+        """
+        Kalman prediction step by a number of frames
+        """
+        dt = float(frames)
+        self._position = self._position + self._velocity * dt
+        self._p_pos = (
+            self._p_pos
+            + 2 * dt * self._p_cross
+            + dt ** 2 * self._p_vel
+            + self._q * dt ** 3 / 3
+        )
+        self._p_cross = self._p_cross + dt * self._p_vel + self._q * dt ** 2 / 2
+        self._p_vel = self._p_vel + self._q * dt
+
+    def correct(self, skeletons: list, index: int):
+        """
+        Update the state with the skeletons from pose estimation
+        :param skeletons: list of skeletons of the analysed frame
+        :param index: index of the analysed frame
+        """
+        skeletons = PoseFrame.from_skeletons(skeletons)
+        if (
+            self._layout is None
+            or skeletons.layout != self._layout
+            or index <= self._index
+        ):
+            # new or changed animals (or out of order results) start a new state
+            self.reset(skeletons, index)
+            return
+        self._predict_state(index - self._index)
+        self._index = index
+
+        measurement = skeletons.pose.reshape(-1).astype(float)
+        # missing bodyparts keep their prediction
+        valid = ~np.isnan(measurement)
+        # bodyparts seen for the first time start from their measurement
+        first = valid & ~self._seen
+        self._start(measurement, first)
+        valid &= ~first
+        residual = np.where(valid, measurement - self._position, 0.0)
+        innovation = self._p_pos + self._r
+        gain_pos = np.where(valid, self._p_pos / innovation, 0.0)
+        gain_vel = np.where(valid, self._p_cross / innovation, 0.0)
+        self._position = self._position + gain_pos * residual
+        self._velocity = self._velocity + gain_vel * residual
+        self._p_vel = self._p_vel - gain_vel * self._p_cross
+        self._p_pos, self._p_cross = (
+            (1 - gain_pos) * self._p_pos,
+            (1 - gain_pos) * self._p_cross,
+        )
+
+    def predict(self, index: int) -> PoseFrame:
+        """
+        Predict the skeletons for a frame without changing the state
+        :param index: index of the frame
+        :return: PoseFrame of predicted skeletons, empty if there is no state or the last pose estimation is too old
+        """
+        if self._layout is None or not 0 <= index - self._index <= self._horizon:
+            return PoseFrame.empty()
+        return self._to_skeletons(self._position + self._velocity * (index - self._index))
@@ -6,9 +6,17 @@ https://github.com/SchwarzNeuroconLab/DeepLabStream
 Licensed under GNU General Public License v3.0
 """
 
+import time
+from functools import partial
+
 from pypylon import pylon
 import cv2
 
+from utils.configloader import PARALLEL_CAPTURE, ALIGNMENT_TOLERANCE
+from utils.framebuffer import frame_pool
+from utils.generic import MissingFrameError
+from utils.grabber import DeviceClock, MultiDeviceGrabber
+
 
 class PylonManager:
     """
@@ -20,9 +28,21 @@ class PylonManager:
         self._factory = pylon.TlFactory.GetInstance()
         self._enabled_devices = {}
         self._resolution = None
-        self._converter = pylon.ImageFormatConverter()
-        self._converter.OutputPixelFormat = pylon.PixelType_BGR8packed
-        self._converter.OutputBitAlignment = pylon.OutputBitAlignment_MsbAligned
+        self._converter = self.create_converter()
+        # grabbing threads of all cameras, if PARALLEL_CAPTURE is used
+        self._grabber = None
+        self._clocks = {}
+        self._timestamps = {}
+
+    @staticmethod
+    def create_converter():
+        """
+        Converter to opencv bgr format, each grabbing thread needs its own
+        """
+        converter = pylon.ImageFormatConverter()
+        converter.OutputPixelFormat = pylon.PixelType_BGR8packed
+        converter.OutputBitAlignment = pylon.OutputBitAlignment_MsbAligned
+        return converter
 
     @property
     def _connected_devices(self) -> dict:
@@ -55,6 +75,9 @@ class PylonManager:
             self._factory.CreateDevice(self._connected_devices[device_serial])
         )
         self._enabled_devices[camera.DeviceInfo.GetSerialNumber()] = camera
+        self._clocks[camera.DeviceInfo.GetSerialNumber()] = DeviceClock(
+            self.get_tick_frequency(camera)
+        )
         # grabbing continuously (video) with minimal delay
         camera.StartGrabbing(pylon.GrabStrategy_LatestImageOnly)
 
@@ -71,6 +94,49 @@ class PylonManager:
         """
         return self._enabled_devices
 
+    @staticmethod
+    def get_tick_frequency(camera) -> float:
+        """
+        Frequency of the timestamps of a camera, GigE cameras report it, USB cameras count nanoseconds
+        """
+        try:
+            return float(camera.GevTimestampTickFrequency.GetValue())
+        except Exception:
+            return 1e9
+
+    @staticmethod
+    def grab(camera, converter, clock) -> tuple:
+        """
+        Wait for the next frame of a camera
+        :return: tuple of the time the frame was taken (from the camera timestamp) and the frame in opencv bgr format
+        """
+        grabbed_frame = camera.RetrieveResult(5000, pylon.TimeoutHandling_ThrowException)
+        arrival_time = time.time()
+        timestamp = (
+            clock.to_host(grabbed_frame.TimeStamp, arrival_time)
+            if grabbed_frame.TimeStamp
+            else arrival_time
+        )
+        # converting to opencv bgr format
+        img = converter.Convert(grabbed_frame).GetArray()
+        grabbed_frame.Release()
+        return timestamp, img
+
+    def start_grabber(self):
+        """
+        Start grabbing all enabled cameras in parallel
+        """
+        self._grabber = MultiDeviceGrabber(
+            {
+                camera_name: partial(
+                    self.grab, camera, self.create_converter(), self._clocks[camera_name]
+                )
+                for camera_name, camera in self._enabled_devices.items()
+            },
+            tolerance=ALIGNMENT_TOLERANCE / 1000,
+        )
+        self._grabber.start()
+
     def get_frames(self) -> tuple:
         """
         Collect frames for cameras and outputs it in 'color' dictionary
@@ -80,23 +146,51 @@ class PylonManager:
         color_frames = {}
         depth_maps = {}
         infra_frames = {}
-        for camera_name, camera in self._enabled_devices.items():
-            grabbed_frame = camera.RetrieveResult(
-                5000, pylon.TimeoutHandling_ThrowException
+        if PARALLEL_CAPTURE:
+            if self._grabber is None:
+                self.start_grabber()
+            frameset = self._grabber.get_frameset()
+            if frameset is None:
+                failure = self._grabber.get_failure()
+                raise MissingFrameError(
+                    "No frame was received from camera {}: {}".format(*failure)
+                    if failure is not None
+                    else "No frames were received from the cameras."
+                )
+        else:
+            frameset = {
+                camera_name: self.grab(camera, self._converter, self._clocks[camera_name])
+                for camera_name, camera in self._enabled_devices.items()
+            }
+        width, height = self._resolution
+        for camera_name, (timestamp, img) in frameset.items():
+            color_frames[camera_name] = cv2.resize(
+                img,
+                self._resolution,
+                dst=frame_pool.acquire((camera_name, "resize"), (height, width, 3)),
             )
-            # converting to opencv bgr format
-            image = self._converter.Convert(grabbed_frame)
-            img = image.GetArray()
-            color_frames[camera_name] = cv2.resize(img, self._resolution)
-            grabbed_frame.Release()
+            self._timestamps[camera_name] = timestamp
         return color_frames, depth_maps, infra_frames
 
+    def get_timestamps(self) -> dict:
+        """
+        Time the frames of the last get_frames() call were taken
+        :return: dictionary {camera: timestamp}
+        """
+        return dict(self._timestamps)
+
     def stop(self):
         """
         Stops cameras
         """
+        if self._grabber is not None:
+            self._grabber.stop()
         for camera_name, camera in self._enabled_devices.items():
             camera.StopGrabbing()
+        if self._grabber is not None:
+            self._grabber.join()
+            self._grabber.print_statistics()
+            self._grabber = None
         self._enabled_devices = {}
 
     def get_name(self) -> str:
@@ -6,7 +6,9 @@ https://github.com/SchwarzNeuroconLab/DeepLabStream
 Licensed under GNU General Public License v3.0
 """
 
+import time
 import warnings
+from functools import partial
 import numpy as np
 
 warnings.filterwarnings(
@@ -14,6 +16,10 @@ warnings.filterwarnings(
 )  # filter unwanted warnings
 import pyrealsense2 as prs2
 
+from utils.configloader import PARALLEL_CAPTURE, ALIGNMENT_TOLERANCE
+from utils.generic import MissingFrameError
+from utils.grabber import DeviceClock, MultiDeviceGrabber
+
 
 class RealSenseManager:
     """
@@ -33,6 +39,10 @@ class RealSenseManager:
         self._colorizer = prs2.colorizer()
         # Create alignment primitive with color as its target stream:
         self._align = prs2.align(prs2.stream.color)
+        # grabbing threads of all devices, if PARALLEL_CAPTURE is used
+        self._grabber = None
+        self._clocks = {}
+        self._timestamps = {}
 
     @staticmethod
     def realsense_environment() -> tuple:
@@ -107,6 +117,8 @@ class RealSenseManager:
         sensor.set_option(prs2.option.emitter_enabled, 0)
         # storing the enabled device in enabled devices dictionary
         self._enabled_devices[device_serial] = (pipeline, pipeline_profile)
+        # frame timestamps of the hardware clock are in ms
+        self._clocks[device_serial] = DeviceClock(1000)
 
     def enable_all_devices(self):
         """
@@ -129,10 +141,37 @@ class RealSenseManager:
         color_frames = {}
         depth_maps = {}
         infra_frames = {}
-        for serial, device in self._enabled_devices.items():
-            device_pipeline, device_profile = device
+        if PARALLEL_CAPTURE:
+            if self._grabber is None:
+                self._grabber = MultiDeviceGrabber(
+                    {
+                        serial: partial(self.grab, device[0], self._clocks[serial])
+                        for serial, device in self._enabled_devices.items()
+                    },
+                    tolerance=ALIGNMENT_TOLERANCE / 1000,
+                    # framesets are held in the frame pool of librealsense until they are dropped,
+                    # so only the newest frameset of each device is kept
+                    buffer_size=1,
+                )
+                self._grabber.start()
+            framesets = self._grabber.get_frameset()
+            if framesets is None:
+                failure = self._grabber.get_failure()
+                raise MissingFrameError(
+                    "No frame was received from device {}: {}".format(*failure)
+                    if failure is not None
+                    else "No frames were received from the devices."
+                )
+        else:
+            framesets = {
+                serial: self.grab(device[0], self._clocks[serial])
+                for serial, device in self._enabled_devices.items()
+            }
+
+        for serial, (timestamp, frameset) in framesets.items():
+            device_pipeline, device_profile = self._enabled_devices[serial]
             streams = device_profile.get_streams()
-            frameset = device_pipeline.wait_for_frames()
+            self._timestamps[serial] = timestamp
 
             # Alignment for depth stream
             # currently not used
@@ -149,6 +188,30 @@ class RealSenseManager:
 
         return color_frames, depth_maps, infra_frames
 
+    @staticmethod
+    def grab(device_pipeline, clock) -> tuple:
+        """
+        Wait for the next frameset of a device
+        :return: tuple of the time the frameset was taken (from the frame timestamp) and the frameset
+        """
+        frameset = device_pipeline.wait_for_frames()
+        arrival_time = time.time()
+        domain = frameset.get_frame_timestamp_domain()
+        if domain == prs2.timestamp_domain.hardware_clock:
+            timestamp = clock.to_host(frameset.get_timestamp(), arrival_time)
+        elif domain == prs2.timestamp_domain.system_time:
+            timestamp = frameset.get_timestamp() / 1000
+        else:
+            timestamp = arrival_time
+        return timestamp, frameset
+
+    def get_timestamps(self) -> dict:
+        """
+        Time the framesets of the last get_frames() call were taken
+        :return: dictionary {device: timestamp}
+        """
+        return dict(self._timestamps)
+
     def colorize_depth_frame(self, depth_frame: prs2.depth_frame) -> prs2.depth_frame:
         """
         Colorizes the depth frame
@@ -164,8 +227,14 @@ class RealSenseManager:
         """
         Stops every device and stream
         """
+        if self._grabber is not None:
+            self._grabber.stop()
         self._config.disable_all_streams()
         for serial, device in self._enabled_devices.items():
             device_pipeline, device_profile = device
             device_pipeline.stop()
+        if self._grabber is not None:
+            self._grabber.join()
+            self._grabber.print_statistics()
+            self._grabber = None
         self._enabled_devices = {}
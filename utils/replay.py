@@ -0,0 +1,100 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class PoseReplay:
+    """
+    Replays the skeletons of a DataOutput csv file written by DeepLabStream, starting over at the end of the file
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path to the DataOutput csv file
+        """
+        data = pd.read_csv(path, sep=";", header=[0, 1, 2], index_col=0)
+        animals = [
+            column for column in data.columns.unique(level=0) if column.startswith("Animal")
+        ]
+        if not animals:
+            raise ValueError(f"No skeletons found in {path}.")
+        # list of (animal, bodyparts, coordinates of shape (frames, bodyparts, 2)) to build the skeletons from
+        self._animals = []
+        for animal in animals:
+            bodyparts = list(data[animal].columns.unique(level=0))
+            coordinates = np.stack(
+                [data[animal][bp][["x", "y"]].to_numpy(dtype=float) for bp in bodyparts],
+                axis=1,
+            )
+            self._animals.append((bodyparts, coordinates))
+        self._length = len(data)
+        self._position = 0
+
+    def next_pose(self) -> list:
+        """
+        Skeletons of the next frame in the file
+        Animals without any bodypart in that frame are left out, as they were not in the data output
+        :return: list of skeletons
+        """
+        skeletons = []
+        for bodyparts, coordinates in self._animals:
+            frame_coordinates = coordinates[self._position]
+            if np.isnan(frame_coordinates).all():
+                continue
+            skeletons.append(
+                {bp: tuple(frame_coordinates[num]) for num, bp in enumerate(bodyparts)}
+            )
+        self._position = (self._position + 1) % self._length
+        return skeletons
+
+
+class RandomWalkPoses:
+    """
+    Generates synthetic skeletons, each animal walks randomly through the frame
+    with its bodyparts at fixed distances around its center
+    """
+
+    def __init__(
+        self,
+        animals_number: int,
+        bodyparts: tuple,
+        frame_shape: tuple,
+        step: float = 5.0,
+        seed: int = None,
+    ):
+        """
+        :param animals_number: number of animals
+        :param bodyparts: names of the bodyparts of each animal
+        :param frame_shape: shape of the frames (height, width, ...), animals stay inside the frame
+        :param step: standard deviation of the movement per frame in pixels
+        :param seed: (optional) seed for reproducible poses
+        """
+        self._rng = np.random.default_rng(seed)
+        self._bodyparts = bodyparts
+        self._size = np.array(frame_shape[1::-1], dtype=float)
+        self._step = step
+        self._centers = self._rng.uniform(0.2, 0.8, (animals_number, 2)) * self._size
+        self._offsets = self._rng.normal(0, 10, (animals_number, len(bodyparts), 2))
+
+    def next_pose(self) -> list:
+        """
+        Skeletons of the next frame
+        :return: list of skeletons
+        """
+        self._centers = np.clip(
+            self._centers + self._rng.normal(0, self._step, self._centers.shape),
+            0,
+            self._size - 1,
+        )
+        points = self._centers[:, np.newaxis] + self._offsets
+        return [
+            {bp: tuple(animal[num]) for num, bp in enumerate(self._bodyparts)}
+            for animal in points
+        ]
@@ -0,0 +1,349 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from utils.configloader import (
+    VIDEO_SOURCE,
+    SIMULATED_CAMERAS,
+    SIMULATION_PATTERN,
+    SIMULATION_BLOBS,
+    SIMULATION_CLIP_FRAMES,
+    SIMULATION_JITTER,
+)
+from utils.framebuffer import frame_pool
+from utils.generic import MissingFrameError
+
+
+class MovingBlobs:
+    """
+    Synthetic frames with circles bouncing through the frame
+    The positions only depend on the frame number, so dropped frames do not change the movement
+    """
+
+    def __init__(
+        self, resolution: tuple, blobs: int = 3, seed: int = None, key="blobs"
+    ):
+        """
+        :param resolution: (width, height) of the frames
+        :param blobs: number of circles
+        :param seed: (optional) seed for reproducible frames
+        :param key: key of the frame buffers in the frame pool
+        """
+        self._key = key
+        rng = np.random.default_rng(seed)
+        width, height = resolution
+        self._size = np.array([width, height], dtype=float)
+        self._radius = max(min(width, height) // 20, 2)
+        self._start = rng.uniform(0, 1, (blobs, 2)) * self._size
+        self._velocity = rng.uniform(-1, 1, (blobs, 2)) * self._size / 100
+        self._colors = [
+            tuple(int(channel) for channel in color)
+            for color in rng.integers(64, 256, (blobs, 3))
+        ]
+        self._background = np.full((height, width, 3), 32, dtype=np.uint8)
+
+    def positions(self, frame_number: int) -> np.ndarray:
+        """
+        Centers of all circles in shape (blobs, 2)
+        """
+        # triangle wave keeps the circles inside the frame
+        travelled = np.mod(self._start + self._velocity * frame_number, 2 * self._size)
+        return np.where(travelled > self._size, 2 * self._size - travelled, travelled)
+
+    def get_frame(self, frame_number: int) -> np.ndarray:
+        frame = frame_pool.acquire(self._key, self._background.shape)
+        np.copyto(frame, self._background)
+        for center, color in zip(self.positions(frame_number), self._colors):
+            cv2.circle(frame, (int(center[0]), int(center[1])), self._radius, color, -1)
+        cv2.putText(
+            frame,
+            str(frame_number),
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1,
+            (255, 255, 255),
+            2,
+        )
+        return frame
+
+
+class LoopedClip:
+    """
+    Frames of a video held in memory and repeated endlessly, so decoding does not limit the frame rate
+    """
+
+    def __init__(
+        self, path: str, resolution: tuple, max_frames: int = 300, key="clip"
+    ):
+        """
+        :param path: path to the video
+        :param resolution: (width, height) the frames are resized to
+        :param max_frames: number of frames from the start of the video to keep
+        :param key: key of the frame buffers in the frame pool
+        """
+        self._key = key
+        capture = cv2.VideoCapture(path)
+        self._frames = []
+        while len(self._frames) < max_frames:
+            ret, image = capture.read()
+            if not ret:
+                break
+            if image.shape[1::-1] != tuple(resolution):
+                image = cv2.resize(image, resolution)
+            self._frames.append(image)
+        capture.release()
+        if not self._frames:
+            raise ValueError(f"No frames could be read from {path}.")
+
+    def get_frame(self, frame_number: int) -> np.ndarray:
+        clip_frame = self._frames[frame_number % len(self._frames)]
+        frame = frame_pool.acquire(self._key, clip_frame.shape)
+        np.copyto(frame, clip_frame)
+        return frame
+
+
+class SimulatedCamera:
+    """
+    One simulated camera rendering its frames in a background thread, like the threaded grabbers of real cameras
+    Frame n is taken at start + n / framerate plus jitter. Like a real camera, the newest frame is delivered
+    and frames that were not collected in time are dropped
+    """
+
+    def __init__(
+        self,
+        source,
+        framerate: float,
+        jitter: float = 0.0,
+        seed: int = None,
+        timeout: float = 5.0,
+    ):
+        """
+        :param source: frame generator with get_frame(frame_number)
+        :param framerate: frames per second
+        :param jitter: standard deviation of the frame timing in seconds
+        :param seed: (optional) seed for reproducible jitter
+        :param timeout: time in seconds to wait for a frame before the camera is considered lost
+        """
+        self._source = source
+        self._period = 1 / framerate
+        self._jitter = jitter
+        self._rng = np.random.default_rng(seed)
+        self._timeout = timeout
+        self._start = None
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        # (timestamp, frame) of the newest frame that was not delivered yet
+        self._latest = None
+        self._grabbed = 0
+        self._delivered = 0
+
+    def _frame_time(self, frame_number: int) -> float:
+        jitter = 0.0
+        if self._jitter > 0:
+            # limited to half a period, so frames stay in order
+            jitter = float(
+                np.clip(
+                    self._rng.normal(0, self._jitter),
+                    -self._period / 2,
+                    self._period / 2,
+                )
+            )
+        return self._start + frame_number * self._period + jitter
+
+    def start(self):
+        self._start = time.time()
+        self._latest = None
+        self._grabbed = 0
+        self._delivered = 0
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name="simulated camera", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        frame_number, frame_time = 0, self._frame_time(0)
+        while self._running:
+            time.sleep(max(frame_time - time.time(), 0))
+            following_time = self._frame_time(frame_number + 1)
+            # frames that were due while the last one was rendered are not taken, like with a camera that is too slow
+            while following_time <= time.time():
+                frame_number += 1
+                frame_time = following_time
+                following_time = self._frame_time(frame_number + 1)
+            frame = self._source.get_frame(frame_number)
+            with self._condition:
+                if self._latest is not None:
+                    # nobody collected the previous frame in time
+                    frame_pool.release(self._latest[1])
+                self._latest = (frame_time, frame)
+                self._grabbed += 1
+                self._condition.notify_all()
+            frame_number, frame_time = frame_number + 1, following_time
+
+    def read(self) -> tuple:
+        """
+        Wait for a frame that was not delivered before
+        :return: timestamp of the frame and frame
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._latest is not None, timeout=self._timeout
+            ):
+                raise MissingFrameError("No frame was received from the simulated camera.")
+            timestamp, frame = self._latest
+            self._latest = None
+            self._delivered += 1
+        return timestamp, frame
+
+    def get_statistics(self) -> dict:
+        """
+        Number of frames taken by the camera and delivered to DLStream
+        """
+        with self._condition:
+            return dict(grabbed=self._grabbed, consumed=self._delivered)
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=self._timeout)
+            self._thread = None
+        if self._latest is not None:
+            frame_pool.release(self._latest[1])
+            self._latest = None
+
+
+class SimulatedCameraManager:
+    """
+    Camera manager class for synthetic cameras, to test DLStream without hardware
+    """
+
+    def __init__(
+        self,
+        cameras: int = SIMULATED_CAMERAS,
+        pattern: str = SIMULATION_PATTERN,
+        jitter: float = SIMULATION_JITTER,
+    ):
+        """
+        :param cameras: number of simulated cameras
+        :param pattern: "blobs" for moving circles or "clip" for a looped part of VIDEO_SOURCE
+        :param jitter: standard deviation of the frame timing in ms
+        """
+        if pattern not in ("blobs", "clip"):
+            raise ValueError(
+                f'Simulation pattern {pattern} is not available, use "blobs" or "clip".'
+            )
+        self._manager_name = "Simulation"
+        self._pattern = pattern
+        self._jitter = jitter / 1000
+        self._camera_names = ["Simulated {}".format(num) for num in range(cameras)]
+        self._resolution = None
+        self._framerate = None
+        self._enabled_devices = {}
+        self._timestamps = {}
+
+    def get_connected_devices(self) -> list:
+        """
+        Getter for simulated devices list
+        """
+        return list(self._camera_names)
+
+    def get_enabled_devices(self) -> dict:
+        """
+        Getter for enabled devices dictionary
+        """
+        return self._enabled_devices
+
+    def enable_stream(self, resolution, framerate, *args):
+        """
+        Enable stream with given parameters
+        All simulated cameras use the same resolution and framerate
+        """
+        self._resolution = tuple(resolution)
+        self._framerate = framerate
+
+    def _create_source(self, camera_num: int):
+        key = (self._camera_names[camera_num], "capture")
+        if self._pattern == "clip":
+            return LoopedClip(
+                VIDEO_SOURCE, self._resolution, SIMULATION_CLIP_FRAMES, key=key
+            )
+        return MovingBlobs(self._resolution, SIMULATION_BLOBS, seed=camera_num, key=key)
+
+    def enable_device(self, camera_name: str, *args):
+        """
+        Camera starter
+        """
+        camera = SimulatedCamera(
+            self._create_source(self._camera_names.index(camera_name)),
+            self._framerate,
+            self._jitter,
+        )
+        camera.start()
+        self._enabled_devices[camera_name] = camera
+
+    def enable_all_devices(self):
+        """
+        Starts all simulated cameras
+        """
+        for camera_name in self._camera_names:
+            self.enable_device(camera_name)
+
+    def get_frames(self) -> tuple:
+        """
+        Collect the next frame of every camera and outputs it in 'color' dictionary
+        The frames are rendered by the cameras in the background, so only the wait for the newest frame remains
+        ***depth and infrared are not simulated***
+        :return: tuple of three dictionaries: color, depth, infrared
+        """
+        color_frames = {}
+        depth_maps = {}
+        infra_frames = {}
+        for camera_name, camera in self._enabled_devices.items():
+            self._timestamps[camera_name], color_frames[camera_name] = camera.read()
+        return color_frames, depth_maps, infra_frames
+
+    def get_timestamps(self) -> dict:
+        """
+        Exact time each camera took the frames of the last get_frames() call
+        :return: dictionary {camera: timestamp}
+        """
+        return dict(self._timestamps)
+
+    def get_capture_statistics(self) -> dict:
+        """
+        Frames taken and delivered by each camera, the difference was dropped because the main loop was too slow
+        """
+        return {
+            camera_name: camera.get_statistics()
+            for camera_name, camera in self._enabled_devices.items()
+        }
+
+    def stop(self):
+        """
+        Stops all simulated cameras
+        """
+        for camera_name, statistics in self.get_capture_statistics().items():
+            print(
+                "Capture of {}: {grabbed} frames grabbed, {consumed} consumed".format(
+                    camera_name, **statistics
+                )
+            )
+        for camera in self._enabled_devices.values():
+            camera.stop()
+        self._enabled_devices = {}
+        self._timestamps = {}
+
+    def get_name(self) -> str:
+        return self._manager_name
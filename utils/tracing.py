@@ -0,0 +1,193 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import json
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# tracer of the running session, None if tracing is disabled
+_tracer = None
+
+
+def _to_us(seconds: float) -> float:
+    """
+    Chrome trace timestamps and durations are given in microseconds
+    """
+    return seconds * 1e6
+
+
+class FrameTracer:
+    """
+    Collects the timestamps of each processing stage of the frames
+    and exports them in the Chrome trace event format (open with chrome://tracing or https://ui.perfetto.dev)
+    All timestamps are taken with time.time(), so stages measured in the pose estimation processes can be compared
+    Only the newest max_events events are kept, so the memory use is bounded in long sessions
+    """
+
+    def __init__(self, max_events: int = None):
+        """
+        :param max_events: (optional) number of events kept, all events are kept if None
+        """
+        self._events = deque(maxlen=max_events)
+        # metadata events naming the tracks are kept apart, so they are not dropped
+        self._metadata = []
+        self._tracks = {}
+        self._added = 0
+
+    def _get_track(self, track: str) -> int:
+        """
+        Thread id used to display a track, named by a metadata event the first time it is used
+        """
+        if track not in self._tracks:
+            self._tracks[track] = len(self._tracks) + 1
+            self._metadata.append(
+                dict(
+                    name="thread_name",
+                    ph="M",
+                    pid=1,
+                    tid=self._tracks[track],
+                    args=dict(name=track),
+                )
+            )
+        return self._tracks[track]
+
+    def add_stage(self, name: str, start: float, end: float, track: str = "main loop", **args):
+        """
+        Add a stage of the main loop, stages on one track have to be nested or one after another
+        :param name: name of the stage
+        :param start: start time in seconds
+        :param end: end time in seconds
+        :param track: name of the track the stage is displayed on
+        :param args: additional information, e.g. camera and frame index
+        """
+        self._add(
+            dict(
+                name=name,
+                cat="stage",
+                ph="X",
+                ts=_to_us(start),
+                dur=_to_us(end - start),
+                pid=1,
+                tid=self._get_track(track),
+                args=args,
+            )
+        )
+
+    def add_span(self, name: str, span_id: str, start: float, end: float, **args):
+        """
+        Add a span that may overlap with others of the same name,
+        e.g. the inference of several frames running in parallel processes
+        :param name: name of the span
+        :param span_id: unique id of the span, e.g. camera and frame index
+        :param start: start time in seconds
+        :param end: end time in seconds
+        :param args: additional information, e.g. camera and frame index
+        """
+        for phase, stamp in (("b", start), ("e", end)):
+            self._add(
+                dict(
+                    name=name,
+                    cat="frame",
+                    ph=phase,
+                    id=span_id,
+                    ts=_to_us(stamp),
+                    pid=1,
+                    tid=self._get_track(name),
+                    args=args,
+                )
+            )
+
+    def _add(self, event: dict):
+        self._events.append(event)
+        self._added += 1
+
+    @property
+    def dropped(self) -> int:
+        """
+        Number of events that were dropped because max_events was reached
+        """
+        return self._added - len(self._events)
+
+    @contextmanager
+    def stage(self, name: str, track: str = "main loop", **args):
+        """
+        Measure the code inside the with block as a stage
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_stage(name, start, time.time(), track, **args)
+
+    def save(self, path: str):
+        """
+        Write all kept events to a Chrome trace JSON file
+        :param path: path of the file
+        """
+        with open(path, "w") as trace_file:
+            json.dump(
+                dict(
+                    traceEvents=self._metadata + list(self._events),
+                    displayTimeUnit="ms",
+                ),
+                trace_file,
+            )
+
+    def __len__(self) -> int:
+        return len(self._metadata) + len(self._events)
+
+
+def start_tracing(max_events: int = None):
+    """
+    Start a new tracing session, all following trace_stage and trace_span calls are recorded
+    :param max_events: (optional) number of events kept, older events are dropped
+    """
+    global _tracer
+    _tracer = FrameTracer(max_events)
+
+
+def stop_tracing(path: str = None):
+    """
+    Stop the tracing session
+    :param path: (optional) file the trace is saved to
+    """
+    global _tracer
+    if _tracer is not None and path is not None:
+        if _tracer.dropped:
+            print(
+                "{} early events were dropped from the trace (TRACE_EVENTS)".format(
+                    _tracer.dropped
+                )
+            )
+        _tracer.save(path)
+    _tracer = None
+
+
+def tracing_active() -> bool:
+    return _tracer is not None
+
+
+def trace_stage(name: str, track: str = "main loop", **args):
+    """
+    Context manager measuring a stage of the running tracing session, does nothing if tracing is disabled
+    Usage:
+        with trace_stage("capture", frame=index):
+            ...
+    """
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.stage(name, track, **args)
+
+
+def trace_span(name: str, span_id: str, start: float, end: float, **args):
+    """
+    Record a span with known start and end time in the running tracing session, does nothing if tracing is disabled
+    """
+    if _tracer is not None:
+        _tracer.add_span(name, span_id, start, end, **args)
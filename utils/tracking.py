@@ -0,0 +1,112 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from utils.poseframe import PoseFrame
+from utils.postprocessing import PoseStage
+
+
+def _valid_mean(values: np.ndarray, valid: np.ndarray, axis: int) -> np.ndarray:
+    """
+    Mean over the valid entries along axis, NaN where no entry is valid
+    """
+    count = valid.sum(axis=axis)
+    total = np.where(valid, values, 0.0).sum(axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+class IdentityTracker(PoseStage):
+    """
+    Online identity tracking for multi-animal pose estimation (maDLC, SLEAP), where the order of the
+    detected animals changes between frames
+    Every animal is matched to the identity it is closest to in the last frames by a linear assignment on
+    the distance of the centroids plus the mean distance of the bodyparts.
+    The output always contains animals_number skeletons in identity order, identities that were not detected
+    in the frame are NaN and handled by the missing handling afterwards
+    """
+
+    name = "identity tracking"
+    stateful = True
+
+    def __init__(self, animals_number: int, max_distance: float = 100.0):
+        """
+        :param animals_number: number of identities
+        :param max_distance: distance in pixels above which a detection is rather given to an identity
+            that was not seen yet than matched to a known one
+        """
+        self._animals_number = animals_number
+        self._max_distance = max_distance
+        self._layout = None
+        # last known position of every bodypart of every identity in shape (identities, bodyparts, 2)
+        self._positions = None
+        # identities that were detected at least once
+        self._seen = np.zeros(animals_number, dtype=bool)
+
+    def _get_costs(self, detections: np.ndarray) -> np.ndarray:
+        """
+        Cost of giving each detection to each identity
+        :param detections: coordinates in shape (detections, bodyparts, 2)
+        :return: cost matrix in shape (detections, identities)
+        """
+        detected = ~np.isnan(detections).any(axis=2)
+        known = ~np.isnan(self._positions).any(axis=2)
+        centroids = _valid_mean(detections, detected[..., np.newaxis], axis=1)
+        known_centroids = _valid_mean(self._positions, known[..., np.newaxis], axis=1)
+        centroid_distance = np.linalg.norm(
+            centroids[:, np.newaxis] - known_centroids[np.newaxis], axis=2
+        )
+        bodypart_distance = _valid_mean(
+            np.linalg.norm(
+                detections[:, np.newaxis] - self._positions[np.newaxis], axis=3
+            ),
+            detected[:, np.newaxis] & known[np.newaxis],
+            axis=2,
+        )
+        costs = centroid_distance + bodypart_distance
+        # identities without any common bodypart are the last choice
+        costs = np.where(np.isnan(costs), 1e6, costs)
+        # new identities are taken when no known identity is close enough
+        costs[:, ~self._seen] = self._max_distance
+        return costs
+
+    def __call__(self, pose_frame: PoseFrame) -> PoseFrame:
+        if not len(pose_frame):
+            return pose_frame
+        layout = pose_frame.layout[0]
+        if layout != self._layout:
+            self.reset()
+            self._layout = layout
+            self._positions = np.full(
+                (self._animals_number, len(layout), 2), np.nan, dtype=np.float32
+            )
+
+        data = pose_frame.data
+        # animals without any bodypart are not matched
+        data = data[~np.isnan(data[:, :, :2]).all(axis=(1, 2))]
+        tracked = np.full((self._animals_number, len(layout), 3), np.nan, dtype=np.float32)
+        if len(data):
+            detections, identities = linear_sum_assignment(
+                self._get_costs(data[:, :, :2])
+            )
+            tracked[identities] = data[detections]
+            # bodyparts that were not detected keep their last known position for the matching
+            self._positions[identities] = np.where(
+                np.isnan(data[detections, :, :2]),
+                self._positions[identities],
+                data[detections, :, :2],
+            )
+            self._seen[identities] = True
+        return PoseFrame(tracked, layout, pose_frame.timestamp)
+
+    def reset(self):
+        self._layout = None
+        self._positions = None
+        self._seen[:] = False
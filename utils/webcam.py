@@ -10,30 +10,93 @@ Licensed under GNU General Public License v3.0
 from utils.generic import GenericManager, MissingFrameError
 import time
 import base64
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
 import zmq
 
-from utils.configloader import RESOLUTION, FRAMERATE, PORT
+from utils.configloader import (
+    RESOLUTION,
+    PORT,
+    WEBCAM_TRANSPORT,
+    WEBCAM_DECODE_THREADS,
+    WEBCAM_CONFLATE,
+    WEBCAM_TIMEOUT,
+)
+from utils.framebuffer import frame_pool
+
+# header of the binary transport: frame id and capture time on the sender (seconds since epoch)
+# followed by the JPEG bytes in the same message, as CONFLATE does not support multipart messages
+FRAME_HEADER = struct.Struct("<Qd")
+# every JPEG starts with this marker, base64 text never contains these bytes
+JPEG_START = b"\xff\xd8"
+
+
+def pack_frame(frame_id: int, timestamp: float, jpeg) -> bytes:
+    """
+    Create a message of the binary transport
+    :param frame_id: increasing number of the frame
+    :param timestamp: capture time of the frame
+    :param jpeg: JPEG encoded frame, e.g. from cv2.imencode
+    """
+    return FRAME_HEADER.pack(frame_id, timestamp) + memoryview(jpeg).tobytes()
+
+
+def detect_transport(message) -> str:
+    """
+    Transport of a received message, binary messages have the JPEG start marker right after the header
+    :return: "binary" or "base64"
+    """
+    if message[FRAME_HEADER.size : FRAME_HEADER.size + len(JPEG_START)] == JPEG_START:
+        return "binary"
+    return "base64"
+
+
+def unpack_frame(message) -> tuple:
+    """
+    Split a message of the binary transport
+    :return: tuple of frame id, timestamp and the JPEG bytes as np.array
+    """
+    frame_id, timestamp = FRAME_HEADER.unpack_from(message)
+    return (
+        frame_id,
+        timestamp,
+        np.frombuffer(message, dtype=np.uint8, offset=FRAME_HEADER.size),
+    )
 
 
 class WebCamManager(GenericManager):
     def __init__(self):
         """
-        Binds the computer to a ip address and starts listening for incoming streams.
+        Listens for incoming streams on PORT once the stream is enabled.
         Adapted from StreamViewer.py https://github.com/CT83/SmoothStream
+        Frames are received in a background thread and decoded by a thread pool,
+        get_frames() returns the newest decoded frame
         """
         super().__init__()
-        self._context = zmq.Context()
-        self._footage_socket = self._context.socket(zmq.SUB)
-        self._footage_socket.bind("tcp://*:" + PORT)
-        self._footage_socket.setsockopt_string(zmq.SUBSCRIBE, np.unicode(""))
+        # socket and decoding threads are created in enable_stream, so the stream can be restarted after stop
+        self._context = None
+        self._footage_socket = None
+        self._decoder = None
 
         self._camera = None
         self._camera_name = "webcam"
-        self.initial_wait = False
-        self.last_frame_time = time.time()
+        self._receiver = None
+        self._running = False
+        # limits the frames in decoding, newer frames wait (or are conflated) on the socket
+        self._decode_slots = threading.Semaphore(WEBCAM_DECODE_THREADS)
+        self._condition = threading.Condition()
+        # newest decoded frame as (frame id, timestamp, image)
+        self._latest = None
+        self._first_id = None
+        self._delivered_id = None
+        self._delivered = 0
+        # received messages that could not be decoded, e.g. because of the wrong TRANSPORT
+        self._undecodable = 0
+        self._timestamps = {}
 
     @staticmethod
     def string_to_image(string):
@@ -42,12 +105,67 @@ class WebCamManager(GenericManager):
         """
 
         img = base64.b64decode(string)
-        npimg = np.fromstring(img, dtype=np.uint8)
+        npimg = np.frombuffer(img, dtype=np.uint8)
         return cv2.imdecode(npimg, 1)
 
+    def _receive(self):
+        """
+        Receiving messages while the stream is enabled, decoding is passed to the thread pool
+        """
+        received = 0
+        while self._running:
+            if not self._decode_slots.acquire(timeout=0.1):
+                continue
+            if not self._footage_socket.poll(100):
+                self._decode_slots.release()
+                continue
+            message = self._footage_socket.recv()
+            # frames of the legacy transport are numbered and timed on arrival
+            self._decoder.submit(self._decode, message, received, time.time())
+            received += 1
+
+    def _decode(self, message: bytes, received_id: int, received_time: float):
+        """
+        Decoding a message in the thread pool, cv2.imdecode releases the GIL so frames are decoded in parallel
+        """
+        try:
+            transport = (
+                detect_transport(message)
+                if WEBCAM_TRANSPORT == "auto"
+                else WEBCAM_TRANSPORT
+            )
+            try:
+                if transport == "base64":
+                    frame_id, timestamp = received_id, received_time
+                    image = self.string_to_image(message)
+                else:
+                    frame_id, timestamp, jpeg = unpack_frame(message)
+                    image = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+            except (ValueError, struct.error, cv2.error):
+                image = None
+            if image is None:
+                with self._condition:
+                    self._undecodable += 1
+                return
+            with self._condition:
+                # frames decoded out of order are only used if they are newer
+                if self._latest is None or frame_id > self._latest[0]:
+                    self._latest = frame_id, timestamp, image
+                    if self._first_id is None:
+                        self._first_id = frame_id
+                    self._condition.notify_all()
+        finally:
+            self._decode_slots.release()
+
+    def _has_new_frame(self) -> bool:
+        return self._latest is not None and (
+            self._delivered_id is None or self._latest[0] > self._delivered_id
+        )
+
     def get_frames(self) -> tuple:
         """
         Collect frames for camera and outputs it in 'color' dictionary
+        Waits for a frame that is newer than the last one
         ***depth and infrared are not used here***
         :return: tuple of three dictionaries: color, depth, infrared
         """
@@ -56,35 +174,101 @@ class WebCamManager(GenericManager):
         depth_maps = {}
         infra_frames = {}
 
-        if self._footage_socket:
-            ret = True
-        else:
-            ret = False
-        self.last_frame_time = time.time()
-        if ret:
-            # if not self.initial_wait:
-            #     cv2.waitKey(1000)
-            #     self.initial_wait = True
-            # receives frame from stream
-            image = self._footage_socket.recv_string()
-            # converts image from str to image format that cv can handle
-            image = self.string_to_image(image)
-            image = cv2.resize(image, RESOLUTION)
-            color_frames[self._camera_name] = image
-            running_time = time.time() - self.last_frame_time
-            if running_time <= 1 / FRAMERATE:
-                sleepy_time = int(np.ceil(1000 / FRAMERATE - running_time / 1000))
-                cv2.waitKey(sleepy_time)
-
-        else:
-            raise MissingFrameError(
-                "No frame was received from the webcam stream. Make sure that you started streaming on the host machine."
+        with self._condition:
+            if not self._condition.wait_for(self._has_new_frame, timeout=WEBCAM_TIMEOUT):
+                if self._undecodable:
+                    raise MissingFrameError(
+                        f"{self._undecodable} messages were received from the webcam stream, but could not be decoded. "
+                        f"Make sure that TRANSPORT in the advanced settings fits the sender (currently {WEBCAM_TRANSPORT})."
+                    )
+                raise MissingFrameError(
+                    "No frame was received from the webcam stream. Make sure that you started streaming on the host machine."
+                )
+            frame_id, timestamp, image = self._latest
+        self._delivered_id = frame_id
+        self._delivered += 1
+
+        if image.shape[1::-1] != tuple(RESOLUTION):
+            image = cv2.resize(
+                image,
+                RESOLUTION,
+                dst=frame_pool.acquire(
+                    (self._camera_name, "resize"), (RESOLUTION[1], RESOLUTION[0], 3)
+                ),
             )
+        color_frames[self._camera_name] = image
+        self._timestamps = {self._camera_name: timestamp}
 
         return color_frames, depth_maps, infra_frames
 
+    def get_timestamps(self) -> dict:
+        """
+        Capture time of the frames of the last get_frames() call, as sent by the streaming device
+        (arrival time for the base64 transport)
+        :return: dictionary {camera: timestamp}
+        """
+        return dict(self._timestamps)
+
     def enable_stream(self, resolution, framerate, *args):
         """
-        Not used for webcam streaming over network
+        Binds the socket and starts receiving, resolution and framerate are set on the streaming device
+        """
+        if self._receiver is not None:
+            return
+        self._context = zmq.Context()
+        self._footage_socket = self._context.socket(zmq.SUB)
+        if WEBCAM_CONFLATE:
+            # only the newest message is kept, has to be set before binding
+            self._footage_socket.setsockopt(zmq.CONFLATE, 1)
+        self._footage_socket.bind("tcp://*:" + PORT)
+        self._footage_socket.setsockopt(zmq.SUBSCRIBE, b"")
+        self._decoder = ThreadPoolExecutor(
+            max_workers=WEBCAM_DECODE_THREADS, thread_name_prefix="webcam decoder"
+        )
+        self._latest = None
+        self._first_id = None
+        self._delivered_id = None
+        self._delivered = 0
+        self._undecodable = 0
+        self._running = True
+        self._receiver = threading.Thread(
+            target=self._receive, name="webcam receiver", daemon=True
+        )
+        self._receiver.start()
+
+    def get_capture_statistics(self) -> dict:
+        """
+        Frames sent by the streaming device (by frame id) and consumed by DLStream
+        """
+        if self._first_id is None:
+            return {}
+        return {
+            self._camera_name: dict(
+                grabbed=self._delivered_id - self._first_id + 1,
+                consumed=self._delivered,
+            )
+        }
+
+    def stop(self):
         """
-        pass
+        Stops receiving and closes the socket, the stream can be enabled again afterwards
+        """
+        self._running = False
+        if self._receiver is not None:
+            self._receiver.join()
+            self._receiver = None
+        if self._decoder is not None:
+            self._decoder.shutdown(wait=True)
+            self._decoder = None
+        for camera_name, statistics in self.get_capture_statistics().items():
+            print(
+                "Capture of {}: {grabbed} frames grabbed, {consumed} consumed".format(
+                    camera_name, **statistics
+                )
+            )
+        if self._footage_socket is not None:
+            self._footage_socket.close(linger=0)
+            self._footage_socket = None
+            self._context.term()
+            self._context = None
+        self._enabled_devices = {}
@@ -0,0 +1,158 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+
+# maximum time a worker blocks on its queue before it wakes up to check its timers
+POLL_TIMEOUT = 0.01
+# time between two beats of the heartbeat thread of a worker
+BEAT_INTERVAL = 1.0
+# time a worker gets to finish its current item after the stop signal before it is terminated
+JOIN_TIMEOUT = 2.0
+# a worker that did not beat for this long is considered hung or dead
+HEARTBEAT_TIMEOUT = 5.0
+
+
+class StopSignal:
+    """
+    Sentinel that is put into a worker's input queue to ask it to shut down
+    """
+
+
+class WorkerShutdown(Exception):
+    """Custom exception raised by receive() when the worker received the stop signal"""
+
+
+class Heartbeat:
+    """
+    Shared timestamp that a worker process updates from a daemon thread
+    The thread keeps beating while the worker is busy with a long task (e.g. loading a model),
+    so the main process only sees the worker as dead if the process died or froze
+    """
+
+    def __init__(self):
+        self._last_beat = mp.Value("d", 0.0, lock=False)
+        self._thread = None
+
+    def __getstate__(self):
+        # the thread belongs to the process that started it
+        state = self.__dict__.copy()
+        state["_thread"] = None
+        return state
+
+    def beat(self):
+        self._last_beat.value = time.time()
+
+    def start(self, interval: float = BEAT_INTERVAL):
+        """
+        Start beating from a daemon thread of the calling process, does nothing if it already beats
+        :param interval: time in seconds between two beats
+        """
+        self.beat()
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        def beat_forever():
+            while True:
+                time.sleep(interval)
+                self.beat()
+
+        self._thread = threading.Thread(target=beat_forever, name="heartbeat", daemon=True)
+        self._thread.start()
+
+    def started(self) -> bool:
+        """
+        Whether the worker ever beat
+        """
+        return self._last_beat.value != 0.0
+
+    def age(self) -> float:
+        """
+        Time in seconds since the last beat, infinite if the worker never beat
+        """
+        last_beat = self._last_beat.value
+        if last_beat == 0.0:
+            return float("inf")
+        return time.time() - last_beat
+
+    def is_alive(self, timeout: float = HEARTBEAT_TIMEOUT) -> bool:
+        return self.age() <= timeout
+
+
+def receive(input_q: mp.Queue, heartbeat: Heartbeat = None, timeout: float = POLL_TIMEOUT):
+    """
+    Blocking get with timeout, used instead of polling queue.full() in a tight loop
+    :param input_q: queue to receive from
+    :param heartbeat: optional heartbeat that starts beating on the first call
+    :param timeout: maximum time to block in seconds
+    :return: received item or None if nothing arrived within the timeout
+    :raises WorkerShutdown: if the stop signal was received
+    """
+    if heartbeat is not None:
+        heartbeat.start()
+    try:
+        item = input_q.get(timeout=timeout)
+    except queue.Empty:
+        return None
+    if isinstance(item, StopSignal):
+        raise WorkerShutdown
+    return item
+
+
+def run_worker(
+    input_q: mp.Queue,
+    handle_item,
+    heartbeat: Heartbeat = None,
+    timeout: float = POLL_TIMEOUT,
+):
+    """
+    Event-driven worker loop that passes every received item to handle_item until the stop signal arrives
+    :param input_q: queue the items arrive in
+    :param handle_item: function taking one item, does the actual work
+    :param heartbeat: optional heartbeat that is updated while the loop runs
+    :param timeout: maximum time to block on the queue
+    """
+    try:
+        while True:
+            item = receive(input_q, heartbeat, timeout)
+            if item is not None:
+                handle_item(item)
+    except WorkerShutdown:
+        pass
+
+
+def stop_worker(process: mp.Process, input_queues: list, timeout: float = JOIN_TIMEOUT):
+    """
+    Shut a worker process down gracefully by sending the stop signal into its input queues
+    The process is only terminated if it does not finish within the timeout
+    :param process: worker process
+    :param input_queues: list of queues the worker might be blocking on
+    :param timeout: time in seconds to wait for the worker to finish
+    """
+    if process.pid is None:
+        # process was never started
+        return
+    if process.is_alive():
+        for input_q in input_queues:
+            # making room for the stop signal in bounded queues, pending input is not needed anymore
+            try:
+                input_q.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                input_q.put(StopSignal(), timeout=timeout)
+            except queue.Full:
+                pass
+        process.join(timeout)
+    if process.is_alive():
+        print(f"Process {process.name} did not stop in time, terminating it.")
+        process.terminate()
+        process.join(timeout)
@@ -0,0 +1,120 @@
+"""
+DeepLabStream
+© J.Schweihoff, M. Loshakov
+University Bonn Medical Faculty, Germany
+https://github.com/SchwarzNeuroconLab/DeepLabStream
+Licensed under GNU General Public License v3.0
+"""
+
+import time
+
+import click
+import cv2
+import zmq
+
+from utils.framebuffer import frame_pool
+from utils.webcam import pack_frame
+from utils.simulated import MovingBlobs
+
+
+def open_source(source: str, resolution: tuple):
+    """
+    Frame source for the sender
+    :param source: camera index, path to a video (repeated endlessly) or "synthetic" for moving circles
+    :param resolution: (width, height) of the sent frames
+    :return: function returning the next frame
+    """
+    if source == "synthetic":
+        blobs = MovingBlobs(resolution)
+        frame_number = 0
+
+        def read_synthetic():
+            nonlocal frame_number
+            frame_number += 1
+            return blobs.get_frame(frame_number)
+
+        return read_synthetic
+
+    capture = cv2.VideoCapture(int(source) if source.isdigit() else source)
+
+    def read_capture():
+        ret, image = capture.read()
+        if not ret:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, image = capture.read()
+            if not ret:
+                raise RuntimeError(f"No frame could be read from {source}.")
+        if image.shape[1::-1] != resolution:
+            image = cv2.resize(image, resolution)
+        return image
+
+    return read_capture
+
+
+@click.command()
+@click.option(
+    "--address",
+    default="tcp://localhost:5555",
+    help="address of DLStream, PORT in the settings",
+)
+@click.option(
+    "--source", default="synthetic", help='camera index, path to a video or "synthetic"'
+)
+@click.option("--width", default=960, help="width of the sent frames")
+@click.option("--height", default=540, help="height of the sent frames")
+@click.option("--fps", default=30.0, help="frames per second to send")
+@click.option("--quality", default=90, help="JPEG quality")
+@click.option(
+    "--frames", default=0, help="number of frames to send, 0 sends until interrupted"
+)
+def send_frames(address, source, width, height, fps, quality, frames):
+    """
+    Streams JPEG frames in the binary transport of the WebCamManager (STREAMING_SOURCE = ipwebcam)
+    Stand-in for a network camera to benchmark the transport locally
+    """
+    read_frame = open_source(source, (width, height))
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    # frames DLStream is too slow for are dropped on the sender as well
+    socket.setsockopt(zmq.CONFLATE, 1)
+    socket.connect(address)
+
+    period = 1 / fps
+    encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+    sent_bytes = 0
+    encode_time = 0.0
+    frame_id = 0
+    start_time = time.time()
+    try:
+        while not frames or frame_id < frames:
+            next_time = start_time + frame_id * period
+            time.sleep(max(next_time - time.time(), 0))
+            image = read_frame()
+            timestamp = time.time()
+            _, jpeg = cv2.imencode(".jpg", image, encode_params)
+            frame_pool.release(image)
+            encode_time += time.time() - timestamp
+            message = pack_frame(frame_id, timestamp, jpeg)
+            socket.send(message, copy=False)
+            sent_bytes += len(message)
+            frame_id += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        duration = time.time() - start_time
+        if frame_id:
+            print(
+                "Sent {} frames in {:.1f} s ({:.1f} fps), {:.0f} kB and {:.2f} ms encoding per frame".format(
+                    frame_id,
+                    duration,
+                    frame_id / duration,
+                    sent_bytes / frame_id / 1000,
+                    encode_time / frame_id * 1000,
+                )
+            )
+        socket.close(linger=1000)
+        context.term()
+
+
+if __name__ == "__main__":
+    send_frames()